@@ -224,7 +224,7 @@ def display(
             stack = stack.max_proj(*project_axes)
 
         # Switch axes to match napari expected order [x, y, round, channel, z]
-        reordered_array: np.ndarray = stack.xarray.transpose(
+        reordered_array: np.ndarray = stack._float32_xarray().transpose(
             Axes.Y.value,
             Axes.X.value,
             Axes.ROUND.value,
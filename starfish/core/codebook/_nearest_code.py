@@ -0,0 +1,126 @@
+from typing import Tuple
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors, VALID_METRICS
+
+# metrics that are computed with matrix products, rather than with sklearn.
+_BLAS_METRICS = {"euclidean", "sqeuclidean"}
+
+# ball trees only outperform an exhaustive search over the codes for codebooks with many thousands
+# of codes.  smaller codebooks are always searched exhaustively.
+_TREE_MIN_CODES = 10000
+
+# upper bound on the size of the (features x codes) distance matrix computed at once.  small blocks
+# stay resident in cache between the matrix product and the argmin.
+_BLOCK_BYTES = 2 ** 20
+
+
+class NearestCodeSearch:
+    """Exact nearest-code search over the linearized codes of a codebook.
+
+    For euclidean metrics, distances from each feature to every code are computed with blocked
+    matrix products, streaming over the features so that the memory used is bounded regardless of
+    the number of features.  Other metrics are delegated to sklearn's exhaustive search.  Only
+    codebooks large enough that a ball tree is faster are searched with a tree.  Features are
+    passed to sklearn in blocks as well, so that only one block is converted to float64 at a time.
+
+    Ties between equidistant codes are broken in favor of the code that appears first in the
+    codebook only when the distances are computed with matrix products, i.e., for euclidean
+    metrics and codebooks with fewer than 10000 codes.  Otherwise, the order of tied codes is
+    determined by sklearn.
+
+    Parameters
+    ----------
+    linear_codes : np.ndarray
+        array of shape (n_codes, n_channel * n_round) containing the linearized codes
+    metric : str
+        the sklearn metric string used to measure the distance between features and codes
+    """
+    def __init__(self, linear_codes: np.ndarray, metric: str) -> None:
+        self._linear_codes = np.asarray(linear_codes, dtype=np.float64)
+        self._metric = metric
+        self._nn = None
+        if metric not in _BLAS_METRICS or len(self._linear_codes) >= _TREE_MIN_CODES:
+            use_tree = (
+                len(self._linear_codes) >= _TREE_MIN_CODES
+                and metric in VALID_METRICS['ball_tree']
+            )
+            algorithm = 'ball_tree' if use_tree else 'brute'
+            self._nn = NearestNeighbors(
+                n_neighbors=1, algorithm=algorithm, metric=metric).fit(self._linear_codes)
+        else:
+            self._squared_code_norms = np.einsum(
+                'ij,ij->i', self._linear_codes, self._linear_codes)
+            self._scaled_codes_t = np.ascontiguousarray(-2 * self._linear_codes.T)
+
+    def query(
+            self, linear_features: np.ndarray, n_neighbors: int=1,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the nearest codes to each feature.
+
+        Parameters
+        ----------
+        linear_features : np.ndarray
+            array of shape (n_features, n_channel * n_round) containing the linearized features
+        n_neighbors : int
+            the number of nearest codes to find for each feature (default 1)
+
+        Returns
+        -------
+        np.ndarray :
+            array of shape (n_features, n_neighbors) of the distances from each feature to its
+            nearest codes, in increasing order
+        np.ndarray :
+            array of shape (n_features, n_neighbors) of the indices of the nearest codes to each
+            feature.  See the class documentation for how ties are broken.
+        """
+        if not 1 <= n_neighbors <= len(self._linear_codes):
+            raise ValueError(
+                f"n_neighbors must be between 1 and the number of codes "
+                f"({len(self._linear_codes)}), but is {n_neighbors}")
+
+        linear_features = np.asarray(linear_features)
+        n_features, n_dims = linear_features.shape
+        if self._nn is not None:
+            # sklearn bounds the memory of its own distance computations, but converts all of its
+            # input to float64 at once.
+            block_size = max(1, _BLOCK_BYTES // (8 * n_dims))
+        else:
+            block_size = max(1, _BLOCK_BYTES // (8 * max(len(self._linear_codes), n_dims)))
+
+        distances = np.empty((n_features, n_neighbors), dtype=np.float64)
+        indices = np.empty((n_features, n_neighbors), dtype=np.intp)
+        for start in range(0, n_features, block_size):
+            block = np.asarray(linear_features[start:start + block_size], dtype=np.float64)
+            block_distances, block_indices = self._query_block(block, n_neighbors)
+            distances[start:start + block_size] = block_distances
+            indices[start:start + block_size] = block_indices
+        return distances, indices
+
+    def _query_block(
+            self, block: np.ndarray, n_neighbors: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the nearest codes to each of a block of float64 features."""
+        if self._nn is not None:
+            return self._nn.kneighbors(block, n_neighbors=n_neighbors)
+
+        # the squared norm of the features does not change which code is nearest, so it is omitted
+        # here.
+        partial_distances = block @ self._scaled_codes_t
+        partial_distances += self._squared_code_norms
+        rows = np.arange(len(block))
+        indices = np.empty((len(block), n_neighbors), dtype=np.intp)
+        squared_distances = np.empty((len(block), n_neighbors), dtype=np.float64)
+        for neighbor in range(n_neighbors):
+            nearest = np.argmin(partial_distances, axis=1)
+            indices[:, neighbor] = nearest
+            partial_distances[rows, nearest] = np.inf
+
+            # recompute the distances to the selected codes directly, which avoids the
+            # cancellation error of the expanded form.
+            differences = block - self._linear_codes[nearest]
+            squared_distances[:, neighbor] = np.einsum('ij,ij->i', differences, differences)
+
+        if self._metric == "sqeuclidean":
+            return squared_distances, indices
+        return np.sqrt(squared_distances), indices
@@ -1,12 +1,11 @@
 import json
 import uuid
-from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+from typing import Any, cast, Dict, List, Optional, Sequence, Set, Tuple, Union
 
 import numpy as np
 import pandas as pd
 import xarray as xr
 from semantic_version import Version
-from sklearn.neighbors import NearestNeighbors
 from slicedimage.io import resolve_path_or_url
 
 from starfish.core.codebook._format import (
@@ -19,6 +18,7 @@ from starfish.core.config import StarfishConfig
 from starfish.core.intensity_table.intensity_table import IntensityTable
 from starfish.core.spacetx_format.util import CodebookValidator
 from starfish.core.types import Axes, Features, Number
+from ._nearest_code import NearestCodeSearch
 
 
 class Codebook(xr.DataArray):
@@ -57,6 +57,11 @@ class Codebook(xr.DataArray):
 
     """
 
+    # memoized state for decode_metric.  xarray only permits setting attributes that already
+    # exist, so these are declared on the class.
+    _decode_cache_fingerprint: Optional[Tuple[Tuple, np.ndarray, np.ndarray]] = None
+    _decode_cache: Dict[Tuple[int, str], Tuple["Codebook", NearestCodeSearch]] = {}
+
     @property
     def code_length(self) -> int:
         """return the length of codes in this codebook"""
@@ -454,11 +459,72 @@ class Codebook(xr.DataArray):
 
         return array, norm
 
+    @staticmethod
+    def _normalize_linear_features(
+            linear_features: np.ndarray, norm_order: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Unit normalize each row of an array of linearized features, as
+        :py:meth:`_normalize_features` does for a Codebook or IntensityTable.
+
+        Parameters
+        ----------
+        linear_features : np.ndarray
+            array of shape (n_features, n_channel * n_round) containing the features to normalize
+        norm_order : int
+            the norm to apply to each feature
+
+        Returns
+        -------
+        np.ndarray :
+            array of the normalized features
+        np.ndarray :
+            A 1 dimensional numpy array containing the feature norms
+
+        """
+        norm = np.linalg.norm(linear_features, ord=norm_order, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normalized = linear_features / norm[:, None]
+
+        # if a feature is all zero, the information should be spread across the channel
+        n = linear_features.shape[1]
+        partitioned_intensity = np.linalg.norm(np.full(n, fill_value=1 / n), ord=norm_order) / n
+        normalized[np.logical_not(np.isfinite(normalized))] = partitioned_intensity
+
+        return normalized, norm
+
+    def _normalized_code_search(
+            self, norm_order: int, metric: str,
+    ) -> Tuple["Codebook", NearestCodeSearch]:
+        """Return this codebook normalized by norm_order and a search structure over its codes for
+        metric.  Both are memoized per (norm_order, metric), and are rebuilt if the dimensions,
+        values, or targets of the codebook have changed since they were computed.
+        """
+        fingerprint = self._decode_cache_fingerprint
+        if (
+                fingerprint is None
+                or fingerprint[0] != self.dims
+                or not np.array_equal(fingerprint[1], self.values)
+                or not np.array_equal(fingerprint[2], self[Features.TARGET].values)
+        ):
+            self._decode_cache_fingerprint = (
+                self.dims, self.values.copy(), self[Features.TARGET].values.copy())
+            self._decode_cache = {}
+
+        key = (norm_order, metric)
+        if key not in self._decode_cache:
+            norm_codes, _ = self._normalize_features(self, norm_order=norm_order)
+            linear_codes = norm_codes.stack(traces=(Axes.CH.value, Axes.ROUND.value)).values
+            self._decode_cache[key] = (
+                cast(Codebook, norm_codes), NearestCodeSearch(linear_codes, metric))
+        return self._decode_cache[key]
+
     @staticmethod
     def _approximate_nearest_code(
             norm_codes: "Codebook", norm_intensities: xr.DataArray, metric: str,
+            search: Optional[NearestCodeSearch]=None, n_neighbors: int=1,
     ) -> Tuple[np.ndarray, np.ndarray]:
-        """find the nearest code for each feature using the ball_tree approximate NN algorithm
+        """find the nearest code for each feature.  Despite the name, the search is exact; see
+        :py:class:`NearestCodeSearch`.
 
         Parameters
         ----------
@@ -468,6 +534,11 @@ class Codebook(xr.DataArray):
             intensity table with each feature normalized to unit length (sum = 1)
         metric : str
             the sklearn metric string to pass to NearestNeighbors
+        search : Optional[NearestCodeSearch]
+            a search structure previously built over norm_codes for metric.  If not provided, one
+            is built.
+        n_neighbors : int
+            the number of nearest codes to find for each feature (default 1)
 
         Returns
         -------
@@ -476,21 +547,26 @@ class Codebook(xr.DataArray):
         np.ndarray : targets
             the gene that corresponds to each matched code
 
+        If n_neighbors is greater than 1, both arrays have a second dimension of length n_neighbors
+        which is ordered from the nearest code to the farthest.
+
         Notes
         -----
         This function does not verify that the intensities have been normalized.
 
         """
-        linear_codes = norm_codes.stack(traces=(Axes.CH.value, Axes.ROUND.value)).values
+        if search is None:
+            linear_codes = norm_codes.stack(traces=(Axes.CH.value, Axes.ROUND.value)).values
+            search = NearestCodeSearch(linear_codes, metric)
         linear_features = norm_intensities.stack(
             traces=(Axes.CH.value, Axes.ROUND.value)).values
 
-        # reshape into traces
-        nn = NearestNeighbors(n_neighbors=1, algorithm='ball_tree', metric=metric).fit(linear_codes)
-        metric_output, indices = nn.kneighbors(linear_features)
-        gene_ids = np.ravel(norm_codes.indexes[Features.TARGET].values[indices])
+        metric_output, indices = search.query(linear_features, n_neighbors=n_neighbors)
+        gene_ids = norm_codes.indexes[Features.TARGET].values[indices]
+        if n_neighbors == 1:
+            return metric_output[:, 0], gene_ids[:, 0]
 
-        return np.ravel(metric_output), gene_ids
+        return metric_output, gene_ids
 
     def _validate_decode_intensity_input_matches_codebook_shape(
             self,
@@ -505,7 +581,7 @@ class Codebook(xr.DataArray):
 
     def decode_metric(
             self, intensities: IntensityTable, max_distance: Number, min_intensity: Number,
-            norm_order: int, metric: str='euclidean'
+            norm_order: int, metric: str='euclidean', return_runner_up: bool=False,
     ) -> IntensityTable:
         """
         Assigns intensity patterns that have been extracted from an :py:class:`ImageStack` and
@@ -532,6 +608,11 @@ class Codebook(xr.DataArray):
             the scipy.linalg norm to apply to normalize codes and intensities
         metric : str
             the sklearn metric string to pass to NearestNeighbors
+        return_runner_up : bool
+            if True, the second nearest target of each feature and its distance are also recorded,
+            along with the margin by which the nearest target is closer, so that features can be
+            filtered by decoding confidence without decoding them again (default False).  The
+            codebook must contain at least two codes.
 
         Notes
         -----
@@ -544,25 +625,39 @@ class Codebook(xr.DataArray):
         -------
         IntensityTable :
             Intensity table containing normalized intensities, target assignments, distances to
-            the nearest code, and the filtering status of each feature.
+            the nearest code, and the filtering status of each feature.  If return_runner_up is
+            True, it also contains the runner-up target, its distance, and the distance margin of
+            each feature.
 
         """
 
         self._validate_decode_intensity_input_matches_codebook_shape(intensities)
+        if return_runner_up and self.sizes[Features.TARGET] < 2:
+            raise ValueError('A codebook must contain at least two codes to find runner-up targets')
 
         # add empty metadata fields and return
         if intensities.sizes[Features.AXIS] == 0:
             intensities[Features.TARGET] = (Features.AXIS, np.empty(0, dtype='U'))
             intensities[Features.DISTANCE] = (Features.AXIS, np.empty(0, dtype=float))
             intensities[Features.PASSES_THRESHOLDS] = (Features.AXIS, np.empty(0, dtype=bool))
+            if return_runner_up:
+                intensities[Features.RUNNER_UP_TARGET] = (Features.AXIS, np.empty(0, dtype='U'))
+                intensities[Features.RUNNER_UP_DISTANCE] = (
+                    Features.AXIS, np.empty(0, dtype=float))
+                intensities[Features.DISTANCE_MARGIN] = (Features.AXIS, np.empty(0, dtype=float))
             return intensities
 
-        # normalize both the intensities and the codebook
+        # normalize both the intensities and the codebook.  the normalized codebook is reused
+        # across calls.
         norm_intensities, norms = self._normalize_features(intensities, norm_order=norm_order)
-        norm_codes, _ = self._normalize_features(self, norm_order=norm_order)
+        norm_codes, search = self._normalized_code_search(norm_order, metric)
 
+        n_neighbors = 2 if return_runner_up else 1
         metric_outputs, targets = self._approximate_nearest_code(
-            norm_codes, norm_intensities, metric=metric)
+            norm_codes, norm_intensities, metric=metric, search=search, n_neighbors=n_neighbors)
+        if return_runner_up:
+            runner_up_metric_outputs, runner_up_targets = metric_outputs[:, 1], targets[:, 1]
+            metric_outputs, targets = metric_outputs[:, 0], targets[:, 0]
 
         # only targets with low distances and high intensities should be retained
         passes_filters = np.logical_and(
@@ -575,10 +670,59 @@ class Codebook(xr.DataArray):
         norm_intensities[Features.TARGET] = (Features.AXIS, targets)
         norm_intensities[Features.DISTANCE] = (Features.AXIS, metric_outputs)
         norm_intensities[Features.PASSES_THRESHOLDS] = (Features.AXIS, passes_filters)
+        if return_runner_up:
+            norm_intensities[Features.RUNNER_UP_TARGET] = (Features.AXIS, runner_up_targets)
+            norm_intensities[Features.RUNNER_UP_DISTANCE] = (
+                Features.AXIS, runner_up_metric_outputs)
+            norm_intensities[Features.DISTANCE_MARGIN] = (
+                Features.AXIS, runner_up_metric_outputs - metric_outputs)
 
         # norm_intensities is a DataArray, make it back into an IntensityTable
         return IntensityTable(norm_intensities)
 
+    def _decode_linear_features(
+            self, linear_features: np.ndarray, max_distance: Number, min_intensity: Number,
+            norm_order: int, metric: str='euclidean',
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Decode features as :py:meth:`decode_metric` does, but from an array of linearized
+        features rather than an IntensityTable.  This allows pixels to be decoded a block at a time
+        without constructing an IntensityTable for every pixel.
+
+        Parameters
+        ----------
+        linear_features : np.ndarray
+            array of shape (n_features, n_channel * n_round) containing the features to decode,
+            linearized in the same (channel, round) order as the codes
+        max_distance : Number
+            maximum distance between a feature and its closest code for which the coded target will
+            be assigned.
+        min_intensity : Number
+            minimum intensity for a feature to receive a target annotation
+        norm_order : int
+            the scipy.linalg norm to apply to normalize codes and intensities
+        metric : str
+            the sklearn metric string to pass to NearestNeighbors
+
+        Returns
+        -------
+        np.ndarray :
+            the normalized features
+        np.ndarray :
+            the distance from each feature to its nearest code
+        np.ndarray :
+            the index of the nearest code to each feature, along the target axis of the codebook
+        np.ndarray :
+            True for each feature that passes the distance and intensity filters
+
+        """
+        norm_features, norms = self._normalize_linear_features(linear_features, norm_order)
+        _, search = self._normalized_code_search(norm_order, metric)
+        distances, indices = search.query(norm_features)
+        distances, indices = distances[:, 0], indices[:, 0]
+
+        passes_filters = np.logical_and(norms >= min_intensity, distances <= max_distance)
+        return norm_features, distances, indices, passes_filters
+
     def decode_per_round_max(self, intensities: IntensityTable) -> IntensityTable:
         """
         Assigns intensity patterns that have been extracted from an :py:class:`ImageStack` and
@@ -613,30 +757,6 @@ class Codebook(xr.DataArray):
 
         """
 
-        def _view_row_as_element(array: np.ndarray) -> np.ndarray:
-            """view an entire code as a single element
-
-            This view allows vectors (codes) to be compared for equality without need for multiple
-            comparisons by casting the data in each code to a structured dtype that registers as
-            a single value
-
-            Parameters
-            ----------
-            array : np.ndarray
-                2-dimensional numpy array of shape (n_observations, (n_channel * n_round)) where
-                observations may be either features or codes.
-
-            Returns
-            -------
-            np.ndarray :
-                1-dimensional vector of shape n_observations
-
-            """
-            nrows, ncols = array.shape
-            dtype = {'names': ['f{}'.format(i) for i in range(ncols)],
-                     'formats': ncols * [array.dtype]}
-            return array.view(dtype)
-
         self._validate_decode_intensity_input_matches_codebook_shape(intensities)
 
         # add empty metadata fields and return
@@ -656,14 +776,24 @@ class Codebook(xr.DataArray):
         round_intensities = intensities.sum(Axes.CH.value)
         distance = 1 - (max_intensities / round_intensities).mean(Axes.ROUND.value)
 
-        a = _view_row_as_element(codes.values.reshape(self.shape[0], -1))
-        b = _view_row_as_element(max_channels.values.reshape(intensities.shape[0], -1))
+        # decode the intensities by matching the key of each feature's per-round maximum channels
+        # against the keys of the codes.
+        code_keys, feature_keys = self._per_round_max_keys(
+            codes.values.reshape(self.shape[0], -1),
+            max_channels.values.reshape(intensities.shape[0], -1),
+            self.sizes[Axes.CH.value],
+        )
+
+        # a stable sort keeps codes with identical keys in codebook order, so searching from the
+        # right finds the last such code.
+        code_order = np.argsort(code_keys, kind='stable')
+        sorted_code_keys = code_keys[code_order]
+        positions = np.searchsorted(sorted_code_keys, feature_keys, side='right') - 1
+        matches = positions >= 0
+        matches[matches] = sorted_code_keys[positions[matches]] == feature_keys[matches]
 
         targets = np.full(intensities.shape[0], fill_value=np.nan, dtype=object)
-
-        # decode the intensities
-        for i in np.arange(codes.shape[0]):
-            targets[np.where(a[i] == b)[0]] = codes[Features.TARGET][i]
+        targets[matches] = self[Features.TARGET].values[code_order[positions[matches]]]
 
         # a code passes filters if it decodes successfully
         passes_filters = ~pd.isnull(targets)
@@ -674,6 +804,47 @@ class Codebook(xr.DataArray):
 
         return intensities
 
+    @staticmethod
+    def _per_round_max_keys(
+            code_channels: np.ndarray, feature_channels: np.ndarray, n_channel: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Map each row of per-round maximum channels to a single integer key, such that two rows
+        have the same key if and only if they are equal.
+
+        Parameters
+        ----------
+        code_channels : np.ndarray
+            array of shape (n_codes, n_round) containing the maximum channel of each round of each
+            code
+        feature_channels : np.ndarray
+            array of shape (n_features, n_round) containing the maximum channel of each round of
+            each feature
+        n_channel : int
+            number of channels
+
+        Returns
+        -------
+        np.ndarray :
+            1-dimensional array of the keys of the codes
+        np.ndarray :
+            1-dimensional array of the keys of the features
+
+        """
+        n_round = code_channels.shape[1]
+        if n_round * np.log2(max(n_channel, 2)) < 63:
+            # pack the channels as the digits of a base n_channel number.
+            place_values = n_channel ** np.arange(n_round, dtype=np.int64)
+            return (
+                code_channels.astype(np.int64) @ place_values,
+                feature_channels.astype(np.int64) @ place_values,
+            )
+
+        # too many rounds to pack into an integer, so number the distinct rows instead.
+        _, keys = np.unique(
+            np.concatenate([code_channels, feature_channels]), axis=0, return_inverse=True)
+        keys = keys.ravel()
+        return keys[:len(code_channels)], keys[len(code_channels):]
+
     @classmethod
     def synthetic_one_hot_codebook(
             cls, n_round: int, n_channel: int, n_codes: int, target_names: Optional[Sequence]=None
@@ -3,8 +3,11 @@ Tests for codebook._approximate_nearest_code method
 """
 
 import numpy as np
+from sklearn.neighbors import NearestNeighbors
 
 from .test_metric_decode import codebook_factory, intensity_table_factory
+from .. import _nearest_code
+from .._nearest_code import NearestCodeSearch
 
 
 def test_simple_intensities_find_correct_nearest_code():
@@ -32,3 +35,45 @@ def test_simple_intensities_find_correct_nearest_code():
     )
 
     assert np.array_equal(gene_ids, ['GENE_A', 'GENE_B', 'GENE_A', 'GENE_A'])
+
+
+def test_nearest_code_search_matches_exhaustive_search():
+    """
+    Verify that the nearest codes and distances found by NearestCodeSearch match those found by an
+    exhaustive search with sklearn, for both the matrix product and the sklearn backed metrics, and
+    for both one and several neighbors.
+    """
+    np.random.seed(0)
+    linear_codes = np.random.rand(50, 12)
+    linear_features = np.random.rand(1000, 12)
+
+    for metric in ('euclidean', 'sqeuclidean', 'cityblock'):
+        for n_neighbors in (1, 3):
+            distances, indices = NearestCodeSearch(linear_codes, metric).query(
+                linear_features, n_neighbors=n_neighbors)
+
+            nn = NearestNeighbors(algorithm='brute', metric=metric).fit(linear_codes)
+            expected_distances, expected_indices = nn.kneighbors(
+                linear_features, n_neighbors=n_neighbors)
+            assert np.array_equal(indices, expected_indices)
+            assert np.allclose(distances, expected_distances)
+
+
+def test_nearest_code_search_in_blocks(monkeypatch):
+    """
+    Verify that searching float32 features in many small blocks finds the same nearest codes and
+    distances as searching them all at once.
+    """
+    np.random.seed(0)
+    linear_codes = np.random.rand(50, 12)
+    linear_features = np.random.rand(1000, 12).astype(np.float32)
+
+    for metric in ('euclidean', 'cityblock'):
+        expected_distances, expected_indices = NearestCodeSearch(linear_codes, metric).query(
+            linear_features, n_neighbors=2)
+        with monkeypatch.context() as context:
+            context.setattr(_nearest_code, "_BLOCK_BYTES", 8 * 50 * 7)
+            distances, indices = NearestCodeSearch(linear_codes, metric).query(
+                linear_features, n_neighbors=2)
+        assert np.array_equal(indices, expected_indices)
+        assert np.allclose(distances, expected_distances)
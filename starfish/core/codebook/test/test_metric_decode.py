@@ -120,3 +120,49 @@ def test_unmatched_intensities_and_codebook_table_sizes_throws_value_error():
     intensities = intensity_table_factory()
     with pytest.raises(ValueError):
         codebook.decode_metric(intensities, max_distance=0.5, min_intensity=1, norm_order=1)
+
+
+def test_metric_decode_reuses_normalized_codebook():
+    """
+    Decoding repeatedly with the same codebook reuses its normalized codes, which are recomputed
+    if the codebook is modified. Here the codes of GENE_A and GENE_B are swapped in place between
+    decodes, so the feature that first decodes to GENE_A should then decode to GENE_B.
+    """
+    intensities = intensity_table_factory()
+    codebook = codebook_factory()
+
+    decoded = codebook.decode_metric(intensities, max_distance=0.5, min_intensity=1, norm_order=1)
+    assert np.array_equal(decoded[Features.TARGET].values, ['GENE_A'])
+    norm_codes, search = codebook._normalized_code_search(norm_order=1, metric='euclidean')
+    assert codebook._normalized_code_search(norm_order=1, metric='euclidean')[1] is search
+
+    codebook.values[[0, 1]] = codebook.values[[1, 0]]
+    decoded = codebook.decode_metric(intensities, max_distance=0.5, min_intensity=1, norm_order=1)
+    assert np.array_equal(decoded[Features.TARGET].values, ['GENE_B'])
+    assert codebook._normalized_code_search(norm_order=1, metric='euclidean')[1] is not search
+
+
+def test_metric_decode_runner_up():
+    """
+    With two codes, the runner-up target of each feature is the code it was not assigned to. The
+    runner-up distance is never smaller than the distance to the assigned target, and the margin is
+    their difference.
+    """
+    data = np.array(
+        [[[0, 3],
+          [4, 0]],
+         [[30, 0],
+          [0, 40]]]
+    )
+    intensities = intensity_table_factory(data)
+    codebook = codebook_factory()
+
+    decoded = codebook.decode_metric(
+        intensities, max_distance=0.5, min_intensity=1, norm_order=1, return_runner_up=True)
+
+    assert np.array_equal(decoded[Features.TARGET].values, ['GENE_A', 'GENE_B'])
+    assert np.array_equal(decoded[Features.RUNNER_UP_TARGET].values, ['GENE_B', 'GENE_A'])
+    distances = decoded[Features.DISTANCE].values
+    runner_up_distances = decoded[Features.RUNNER_UP_DISTANCE].values
+    assert np.all(runner_up_distances >= distances)
+    assert np.allclose(decoded[Features.DISTANCE_MARGIN].values, runner_up_distances - distances)
@@ -152,3 +152,22 @@ def test_argmax_selects_the_last_equal_intensity_channel_and_decodes_consistentl
 
     decoded_intensities = codebook.decode_per_round_max(intensities)
     assert np.array_equal(decoded_intensities[Features.TARGET].values, ['nan', 'GENE_A'])
+
+
+@pytest.mark.parametrize("n_round", [4, 40])
+def test_features_matching_codes_decode_to_their_targets(n_round):
+    """
+    Features whose intensities equal a code should decode to that code's target.  40 rounds of 4
+    channels are too many to pack each pattern into a single integer, so that case exercises the
+    fallback that numbers the distinct patterns instead.
+    """
+    codebook = Codebook.synthetic_one_hot_codebook(n_round=n_round, n_channel=4, n_codes=20)
+    # decode each code twice, in a different order than the codebook.
+    order = np.concatenate([np.arange(20)[::-1], np.arange(20)])
+    intensities = intensity_table_factory(codebook.values[order].astype(float))
+
+    decoded_intensities = codebook.decode_per_round_max(intensities)
+    assert np.array_equal(
+        decoded_intensities[Features.TARGET].values,
+        codebook[Features.TARGET].values[order].astype('U'))
+    assert np.all(decoded_intensities[Features.PASSES_THRESHOLDS])
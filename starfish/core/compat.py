@@ -1,5 +1,11 @@
+from typing import NamedTuple, Tuple
+
+import numpy as np
 import skimage
 from packaging import version
+from scipy.ndimage import gaussian_filter, gaussian_laplace
+from skimage import img_as_float
+from skimage.feature import peak_local_max
 
 if version.parse(skimage.__version__) > version.parse("0.14.2"):
     import skimage.transform
@@ -39,8 +45,6 @@ else:
     IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
     """
 
-    import numpy as np
-
     def _match_cumulative_cdf(source, template):
         """
         Return modified source array so that the cumulative density function of
@@ -111,10 +115,6 @@ if version.parse(skimage.__version__) > version.parse("0.14.2"):
     blob_dog = skimage.feature.blob_dog
 else:
     from skimage.feature.blob import _prune_blobs
-    import numpy as np
-    from scipy.ndimage import gaussian_filter, gaussian_laplace
-    from skimage import img_as_float
-    from skimage.feature import peak_local_max
 
     def blob_dog(image, min_sigma=1, max_sigma=50, sigma_ratio=1.6, threshold=2.0,
                  overlap=.5, *, exclude_border=False):
@@ -405,3 +405,101 @@ else:
         lm = np.hstack([lm[:, :-1], sigmas_of_peaks])
 
         return _prune_blobs(lm, overlap)
+
+# BlobDetector's scale-space cache runs blob_log and blob_dog in two stages: computing the
+# scale-space cube of an image, and searching the cube for blobs.  The stages below reproduce the
+# blob detectors of scikit-image 0.15, including its private _prune_blobs, so they are only used
+# with the versions of scikit-image whose blob detectors they match.
+SCALE_SPACE_STAGES_SUPPORTED = (
+    version.parse("0.15") <= version.parse(skimage.__version__) < version.parse("0.16"))
+
+
+class ScaleSpace(NamedTuple):
+    """The scale-space cube of an image and the sigmas of the kernels that produced it."""
+    cube: np.ndarray
+    sigma_list: np.ndarray
+    scalar_sigma: bool
+
+
+def _broadcast_sigmas(image: np.ndarray, min_sigma, max_sigma) -> Tuple[np.ndarray, np.ndarray]:
+    # Gaussian filter requires that sequence-type sigmas have same dimensionality as image. This
+    # broadcasts scalar kernels
+    if np.isscalar(max_sigma):
+        max_sigma = np.full(image.ndim, max_sigma, dtype=float)
+    if np.isscalar(min_sigma):
+        min_sigma = np.full(image.ndim, min_sigma, dtype=float)
+    return np.asarray(min_sigma, dtype=float), np.asarray(max_sigma, dtype=float)
+
+
+def log_scale_space(
+        image: np.ndarray, min_sigma=1, max_sigma=50, num_sigma=10, log_scale=False
+) -> ScaleSpace:
+    """Compute the Laplacian of Gaussian scale-space cube that skimage.feature.blob_log searches
+    for blobs."""
+    image = img_as_float(image)
+    scalar_sigma = np.isscalar(max_sigma) and np.isscalar(min_sigma)
+    min_sigma, max_sigma = _broadcast_sigmas(image, min_sigma, max_sigma)
+
+    if log_scale:
+        start, stop = np.log10(min_sigma)[:, None], np.log10(max_sigma)[:, None]
+        space = np.concatenate([start, stop, np.full_like(start, num_sigma)], axis=1)
+        sigma_list = np.stack([np.logspace(*s) for s in space], axis=1)
+    else:
+        scale = np.linspace(0, 1, num_sigma)[:, None]
+        sigma_list = scale * (max_sigma - min_sigma) + min_sigma
+
+    # average s**2 provides scale invariance
+    gl_images = [-gaussian_laplace(image, s) * s ** 2 for s in np.mean(sigma_list, axis=1)]
+    return ScaleSpace(np.stack(gl_images, axis=-1), sigma_list, scalar_sigma)
+
+
+def dog_scale_space(
+        image: np.ndarray, min_sigma=1, max_sigma=50, sigma_ratio=1.6
+) -> ScaleSpace:
+    """Compute the Difference of Gaussian scale-space cube that skimage.feature.blob_dog searches
+    for blobs."""
+    image = img_as_float(image)
+    scalar_sigma = np.isscalar(max_sigma) and np.isscalar(min_sigma)
+    min_sigma, max_sigma = _broadcast_sigmas(image, min_sigma, max_sigma)
+
+    # k such that min_sigma*(sigma_ratio**k) > max_sigma
+    k = int(np.mean(np.log(max_sigma / min_sigma) / np.log(sigma_ratio) + 1))
+    sigma_list = np.array([min_sigma * (sigma_ratio ** i) for i in range(k + 1)])
+    gaussian_images = [gaussian_filter(image, s) for s in sigma_list]
+
+    # multiplying with average standard deviation provides scale invariance
+    dog_images = [
+        (gaussian_images[i] - gaussian_images[i + 1]) * np.mean(sigma_list[i]) for i in range(k)]
+    return ScaleSpace(np.stack(dog_images, axis=-1), sigma_list, scalar_sigma)
+
+
+def blobs_from_scale_space(
+        scale_space: ScaleSpace, threshold: float, overlap: float, exclude_border=False
+) -> np.ndarray:
+    """Find the blobs in a scale-space cube, returning an array with the same layout as
+    skimage.feature.blob_log and skimage.feature.blob_dog.  Only available if
+    SCALE_SPACE_STAGES_SUPPORTED is True."""
+    if not SCALE_SPACE_STAGES_SUPPORTED:
+        raise RuntimeError(
+            f"scale-space blob detection is not supported with scikit-image "
+            f"{skimage.__version__}")
+    from skimage.feature.blob import _prune_blobs
+
+    cube, sigma_list, scalar_sigma = scale_space
+    local_maxima = peak_local_max(
+        cube, threshold_abs=threshold, footprint=np.ones((3,) * cube.ndim), threshold_rel=0.0,
+        exclude_border=exclude_border)
+
+    # Catch no peaks
+    if local_maxima.size == 0:
+        return np.empty((0, 3))
+
+    # translate the final column of local_maxima, which contains the index of the sigma that
+    # produced the maximum intensity value, into the sigma
+    lm = local_maxima.astype(np.float64)
+    sigmas_of_peaks = sigma_list[local_maxima[:, -1]]
+    if scalar_sigma:
+        sigmas_of_peaks = sigmas_of_peaks[:, 0:1]
+    lm = np.hstack([lm[:, :-1], sigmas_of_peaks])
+
+    return _prune_blobs(lm, overlap)
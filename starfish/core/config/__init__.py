@@ -66,6 +66,23 @@ class StarfishConfig(object):
         Whether or not loaded json should be validated.
     verbose : bool
         Controls output like from tqdm
+    max_resident_tiles : int
+        Maximum number of decoded tiles a lazily loaded ImageStack keeps in memory.
+    loader_threads : Optional[int]
+        Number of threads used to decode tiles when loading an ImageStack.  If None, a default
+        based on the number of CPUs is used.
+    imagestack_backing : str
+        The kind of buffer that backs ImageStack data so that it can be shared with worker
+        processes.  Either "multiprocessing" or "memmap".
+    memmap_directory : Optional[str]
+        Directory in which memory-mapped ImageStack buffers are created.  If None, the default
+        temporary directory is used.
+    persistent_pool : bool
+        Whether worker processes are kept alive and reused across calls that support it, until
+        :py:func:`starfish.core.multiprocessing.pool.shutdown_shared_pool` is called.  ImageStack
+        operations only reuse the workers when the ImageStack backing is ``memmap``.
+    pool_processes : Optional[int]
+        Number of worker processes in the persistent pool.  If None, the number of CPUs is used.
 
     Examples
     --------
@@ -89,7 +106,17 @@ class StarfishConfig(object):
         >>>     "validation": {
         >>>         "strict": false
         >>>     },
-        >>>     "verbose": true
+        >>>     "verbose": true,
+        >>>     "imagestack": {
+        >>>         "max_resident_tiles": 64,
+        >>>         "loader_threads": null,
+        >>>         "backing": "multiprocessing",
+        >>>         "memmap_directory": null
+        >>>     },
+        >>>     "multiprocessing": {
+        >>>         "persistent_pool": false,
+        >>>         "processes": null
+        >>>     }
         >>> }
 
     Example of a ~/.starfish.config file to disable caching:
@@ -118,6 +145,12 @@ class StarfishConfig(object):
              - ["slicedimage"]["caching"]["size_limit"]  (default: None; 0 disables caching)
              - ["validation"]["strict"]                  (default: False)
              - ["verbose"]                               (default: True)
+             - ["imagestack"]["max_resident_tiles"]      (default: 64)
+             - ["imagestack"]["loader_threads"]          (default: None; number of CPUs)
+             - ["imagestack"]["backing"]                 (default: multiprocessing)
+             - ["imagestack"]["memmap_directory"]        (default: None; temporary directory)
+             - ["multiprocessing"]["persistent_pool"]    (default: False)
+             - ["multiprocessing"]["processes"]          (default: None; number of CPUs)
 
             Note: all keys can also be set by and environment variable constructed from the
             key parts and prefixed with STARFISH, e.g. STARFISH_VALIDATION_STRICT.
@@ -141,6 +174,30 @@ class StarfishConfig(object):
         self._verbose = self._config_obj.lookup(
             ("verbose",), self.flag("STARFISH_VERBOSE", "true"), remove=True)
 
+        self._max_resident_tiles = self._config_obj.lookup(
+            ("imagestack", "max_resident_tiles"),
+            self.integer("STARFISH_IMAGESTACK_MAX_RESIDENT_TILES", 64), remove=True)
+
+        self._loader_threads = self._config_obj.lookup(
+            ("imagestack", "loader_threads"),
+            self.integer("STARFISH_IMAGESTACK_LOADER_THREADS"), remove=True)
+
+        self._imagestack_backing = self._config_obj.lookup(
+            ("imagestack", "backing"),
+            self.string("STARFISH_IMAGESTACK_BACKING", "multiprocessing"), remove=True)
+
+        self._memmap_directory = self._config_obj.lookup(
+            ("imagestack", "memmap_directory"),
+            self.string("STARFISH_IMAGESTACK_MEMMAP_DIRECTORY"), remove=True)
+
+        self._persistent_pool = self._config_obj.lookup(
+            ("multiprocessing", "persistent_pool"),
+            self.flag("STARFISH_MULTIPROCESSING_PERSISTENT_POOL", "false"), remove=True)
+
+        self._pool_processes = self._config_obj.lookup(
+            ("multiprocessing", "processes"),
+            self.integer("STARFISH_MULTIPROCESSING_PROCESSES"), remove=True)
+
         if self._config_obj.data:
             warnings.warn(f"unknown configuration: {self._config_obj.data}")
         if self._env_keys:
@@ -183,6 +240,28 @@ class StarfishConfig(object):
             value = value.lower()
             return value in ("true", "1", "yes", "y", "on", "active", "enabled")
 
+    def integer(self, name, default_value=None):
+
+        if name in os.environ:
+            value = os.environ[name]
+            self._env_keys.remove(name)
+        else:
+            value = default_value
+
+        if value is None:
+            return None
+        return int(value)
+
+    def string(self, name, default_value=None):
+
+        if name in os.environ:
+            value = os.environ[name]
+            self._env_keys.remove(name)
+        else:
+            value = default_value
+
+        return value
+
     @property
     def slicedimage(self):
         return dict(self._slicedimage)
@@ -194,3 +273,27 @@ class StarfishConfig(object):
     @property
     def verbose(self):
         return self._verbose
+
+    @property
+    def max_resident_tiles(self):
+        return self._max_resident_tiles
+
+    @property
+    def loader_threads(self):
+        return self._loader_threads
+
+    @property
+    def imagestack_backing(self):
+        return self._imagestack_backing
+
+    @property
+    def memmap_directory(self):
+        return self._memmap_directory
+
+    @property
+    def persistent_pool(self):
+        return self._persistent_pool
+
+    @property
+    def pool_processes(self):
+        return self._pool_processes
@@ -1,4 +1,5 @@
 import json
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import (
     Any,
     Callable,
@@ -11,9 +12,12 @@ from typing import (
     Optional,
     Sequence,
     Set,
+    Tuple,
+    TypeVar,
     Union
 )
 
+import numpy as np
 from semantic_version import Version
 from slicedimage import Collection as collec
 from slicedimage import TileSet
@@ -22,13 +26,17 @@ from slicedimage.urlpath import pathjoin
 
 from starfish.core.codebook.codebook import Codebook
 from starfish.core.config import StarfishConfig
+from starfish.core.imagestack._mp_dataarray import MEMMAP_BACKING
 from starfish.core.imagestack.imagestack import ImageStack
 from starfish.core.imagestack.parser.crop import CropParameters
+from starfish.core.multiprocessing.pool import Pool, single_process_pools
 from starfish.core.spacetx_format import validate_sptx
 from .version import MAX_SUPPORTED_VERSION, MIN_SUPPORTED_VERSION
 
 _SINGLETON = object()
 
+FovResult = TypeVar("FovResult")
+
 
 class FieldOfView:
     """
@@ -116,6 +124,8 @@ class FieldOfView:
                   zplanes: Optional[Collection[int]] = None,
                   x: Optional[Union[int, slice]] = None,
                   y: Optional[Union[int, slice]] = None,
+                  lazy: bool = False,
+                  storage_dtype=np.float32,
                   ) -> ImageStack:
         """
         Load into memory the first Imagestack representation of an aligned image group. If crop
@@ -140,6 +150,12 @@ class FieldOfView:
         y : Optional[Union[int, slice]]
             The y-range in the x-y tile that is loaded into the ImageStack.  If this is not set,
             then the entire x-y tile is loaded into the ImageStack.
+        lazy : bool
+            If True, tiles are not decoded until they are accessed.  See
+            :py:meth:`~starfish.imagestack.imagestack.ImageStack.from_tileset`.
+        storage_dtype :
+            The dtype the image data is stored in.  One of float32, float16 or uint16 (default =
+            float32).
 
         Returns
         -------
@@ -152,7 +168,8 @@ class FieldOfView:
                                "FieldOfView.get_images() and  provide sets of selected axes "
                                "instead")
         stack_iterator = self.get_images(item=item, rounds=rounds,
-                                         chs=chs, zplanes=zplanes, x=x, y=y)
+                                         chs=chs, zplanes=zplanes, x=x, y=y, lazy=lazy,
+                                         storage_dtype=storage_dtype)
         return next(stack_iterator)
 
     def get_images(self, item: str,
@@ -161,6 +178,8 @@ class FieldOfView:
                    zplanes: Optional[Collection[int]] = None,
                    x: Optional[Union[int, slice]] = None,
                    y: Optional[Union[int, slice]] = None,
+                   lazy: bool = False,
+                   storage_dtype=np.float32,
                    ) -> Iterator[ImageStack]:
         """
         Load into memory the an iterator of aligned Imagestacks for the given tileset and selected
@@ -185,6 +204,12 @@ class FieldOfView:
         y : Optional[Union[int, slice]]
             The y-range in the x-y tile that is loaded into the ImageStack/s.  If this is not set,
             then the entire x-y tile is loaded into the ImageStack.
+        lazy : bool
+            If True, tiles are not decoded until they are accessed.  See
+            :py:meth:`~starfish.imagestack.imagestack.ImageStack.from_tileset`.
+        storage_dtype :
+            The dtype the image data is stored in.  One of float32, float16 or uint16 (default =
+            float32).
 
         Returns
         -------
@@ -199,23 +224,34 @@ class FieldOfView:
                                                              zplanes=zplanes,
                                                              x=x, y=y)
         aligned_stack_iterator = AlignedImageStackIterator(tileset=self._images[item],
-                                                           aligned_groups=aligned_groups)
+                                                           aligned_groups=aligned_groups,
+                                                           lazy=lazy,
+                                                           storage_dtype=storage_dtype)
         return aligned_stack_iterator
 
 
 class AlignedImageStackIterator(Iterator[ImageStack]):
     """Iterator class of AlignedImageStacks."""
-    def __init__(self, tileset: TileSet, aligned_groups: List[CropParameters]):
+    def __init__(
+            self,
+            tileset: TileSet,
+            aligned_groups: List[CropParameters],
+            lazy: bool = False,
+            storage_dtype=np.float32,
+    ):
         self.size = len(aligned_groups)
         self.aligned_groups = iter(aligned_groups)
         self.tileset = tileset
+        self.lazy = lazy
+        self.storage_dtype = storage_dtype
 
     def __len__(self) -> int:
         return self.size
 
     def __next__(self) -> ImageStack:
         aligned_group = next(self.aligned_groups)
-        stack = ImageStack.from_tileset(self.tileset, aligned_group)
+        stack = ImageStack.from_tileset(
+            self.tileset, aligned_group, lazy=self.lazy, storage_dtype=self.storage_dtype)
         return stack
 
 
@@ -436,6 +472,86 @@ class Experiment:
         """
         return self.fovs(filter_fn=lambda fov: fov.name in names)
 
+    def process_fovs(
+            self,
+            process_fov: Callable[[FieldOfView], FovResult],
+            max_concurrent_fovs: int=2,
+            filter_fn: Callable[[FieldOfView], bool]=lambda _: True,
+    ) -> Iterator[Tuple[str, FovResult]]:
+        """
+        Stream the FOVs in this experiment through process_fov, and yield the results as each FOV
+        finishes.  At most max_concurrent_fovs FOVs are processed at once, which bounds the number
+        of ImageStacks resident in memory regardless of the number of FOVs in the experiment.  The
+        experiment does not retain any reference to the images loaded by process_fov, or to its
+        results once they have been yielded.
+
+        FOVs are only processed concurrently if the persistent pool is enabled
+        (``multiprocessing.persistent_pool``) and the ImageStack backing is ``memmap``.  In that
+        case, FOVs are processed on threads, and ImageStack operations in all the FOVs share the
+        workers of the persistent pool, which is started before the first FOV.  Forking worker
+        processes from those threads can deadlock, so any other pool created by process_fov runs
+        its tasks on the FOV's thread, as if n_processes=1.
+
+        Otherwise, the FOVs are processed one at a time on the calling thread, where each can start
+        worker processes of its own.  Threads without worker processes run code that holds the GIL
+        one at a time, so processing FOVs concurrently that way would forgo the worker processes
+        without gaining parallelism in return.
+
+        Parameters
+        ----------
+        process_fov : Callable[[FieldOfView], FovResult]
+            Function that loads and processes the images of a FOV, and returns its result (for
+            example, an :py:class:`~starfish.intensity_table.intensity_table.IntensityTable`).
+        max_concurrent_fovs : int
+            The maximum number of FOVs to process at once, if FOVs can be processed concurrently.
+            (default 2)
+        filter_fn : Callable[[FieldOfView], bool]
+            Filter to apply to the list of FOVs.  Only FOVs that pass the filter are processed.
+
+        Yields
+        ------
+        Tuple[str, FovResult] :
+            The name of each FOV and the result of process_fov, in the order that the FOVs finish.
+            If process_fov raises an exception, it is raised when that FOV's result would have been
+            yielded.
+        """
+        if max_concurrent_fovs < 1:
+            raise ValueError("max_concurrent_fovs must be at least 1")
+
+        config = StarfishConfig()
+        fovs = iter(self.fovs(filter_fn=filter_fn))
+        if not (config.persistent_pool and config.imagestack_backing == MEMMAP_BACKING):
+            for fov in fovs:
+                yield fov.name, process_fov(fov)
+            return
+
+        def process_fov_on_thread(fov: FieldOfView) -> FovResult:
+            with single_process_pools():
+                return process_fov(fov)
+
+        # start the persistent pool before the FOV threads are started.
+        Pool.shared()
+
+        with ThreadPoolExecutor(max_workers=max_concurrent_fovs) as executor:
+            pending: MutableMapping[Future, str] = dict()
+            try:
+                while True:
+                    # keep at most max_concurrent_fovs FOVs in flight.
+                    for fov in fovs:
+                        pending[executor.submit(process_fov_on_thread, fov)] = fov.name
+                        if len(pending) >= max_concurrent_fovs:
+                            break
+                    if len(pending) == 0:
+                        return
+
+                    done, _ = wait(pending.keys(), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+            finally:
+                # if the consumer stops early or an FOV fails, do not start any more FOVs.
+                for future in pending:
+                    future.cancel()
+
     def __getitem__(self, item):
         fovs = self.fovs_by_name(item)
         if len(fovs) == 0:
@@ -1,9 +1,13 @@
+import threading
+import time
 from typing import Tuple
 
 import numpy as np
 from slicedimage import Tile, TileSet
 
 import starfish.data
+from starfish.core.config import environ
+from starfish.core.multiprocessing.pool import Pool, shutdown_shared_pool
 from starfish.core.test.factories import SyntheticData
 from starfish.types import Axes, Coordinates
 from ..experiment import Experiment, FieldOfView
@@ -126,3 +130,87 @@ def test_fov_un_aligned_tileset():
     # Assert that the number of coordinate groups == NUM_ROUNDS
     assert len(primary_images) == NUM_ROUND
     assert len(nuclei_images) == NUM_ROUND
+
+
+def test_process_fovs():
+    """Verify that every FOV is processed exactly once, and that no more than max_concurrent_fovs
+    FOVs are processed at once."""
+    codebook = SyntheticData().codebook()
+    tilesets = {"primary": get_aligned_tileset()}
+    fovs = [FieldOfView(f"fov_{ix:03d}", tilesets) for ix in range(6)]
+    experiment = Experiment(fovs, codebook, {})
+
+    lock = threading.Lock()
+    in_flight = [0]
+    max_in_flight = [0]
+
+    def process_fov(fov: FieldOfView) -> float:
+        with lock:
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        image = fov.get_image(FieldOfView.PRIMARY_IMAGES)
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        return float(image.xarray.sum())
+
+    with environ(
+            IMAGESTACK_BACKING="memmap",
+            MULTIPROCESSING_PERSISTENT_POOL="true",
+            MULTIPROCESSING_PROCESSES="2"):
+        try:
+            results = dict(experiment.process_fovs(process_fov, max_concurrent_fovs=2))
+            assert sorted(results.keys()) == [fov.name for fov in experiment.fovs()]
+            assert all(result == 0 for result in results.values())
+            assert max_in_flight[0] <= 2
+
+            filtered = dict(experiment.process_fovs(
+                process_fov, filter_fn=lambda fov: fov.name == "fov_002"))
+            assert list(filtered.keys()) == ["fov_002"]
+        finally:
+            shutdown_shared_pool()
+
+
+def test_process_fovs_serially_without_persistent_pool():
+    """Verify that without the persistent pool and memmap backing, FOVs are processed one at a
+    time on the calling thread, and pools created while processing a FOV start worker processes."""
+    codebook = SyntheticData().codebook()
+    tilesets = {"primary": get_aligned_tileset()}
+    fovs = [FieldOfView(f"fov_{ix:03d}", tilesets) for ix in range(3)]
+    experiment = Experiment(fovs, codebook, {})
+
+    def process_fov(fov: FieldOfView) -> Tuple[int, bool]:
+        with Pool(processes=2) as pool:
+            forked = pool.pool is not None
+        return threading.get_ident(), forked
+
+    results = dict(experiment.process_fovs(process_fov, max_concurrent_fovs=2))
+    assert sorted(results.keys()) == [fov.name for fov in experiment.fovs()]
+    assert all(ident == threading.get_ident() for ident, _ in results.values())
+    assert all(forked for _, forked in results.values())
+
+
+def test_process_fovs_does_not_fork_from_fov_threads():
+    """Verify that pools created while processing a FOV do not start worker processes, and that
+    the persistent pool is started before the FOVs are processed and shared by all of them."""
+    codebook = SyntheticData().codebook()
+    tilesets = {"primary": get_aligned_tileset()}
+    fovs = [FieldOfView(f"fov_{ix:03d}", tilesets) for ix in range(4)]
+    experiment = Experiment(fovs, codebook, {})
+
+    def process_fov(fov: FieldOfView) -> Tuple[bool, int]:
+        with Pool(processes=2) as pool:
+            forked = pool.pool is not None
+        return forked, id(Pool.shared().pool)
+
+    with environ(
+            IMAGESTACK_BACKING="memmap",
+            MULTIPROCESSING_PERSISTENT_POOL="true",
+            MULTIPROCESSING_PROCESSES="2"):
+        try:
+            results = dict(experiment.process_fovs(process_fov, max_concurrent_fovs=2))
+            assert not any(forked for forked, _ in results.values())
+            assert set(pool_id for _, pool_id in results.values()) == {
+                id(Pool.shared().pool)}
+        finally:
+            shutdown_shared_pool()
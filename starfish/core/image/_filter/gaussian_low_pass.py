@@ -1,12 +1,12 @@
 from functools import partial
-from typing import Callable, Optional, Tuple, Union
+from typing import Callable, Mapping, Optional, Tuple, Union
 
 import numpy as np
 import xarray as xr
 from skimage.filters import gaussian
 
 from starfish.core.imagestack.imagestack import ImageStack
-from starfish.core.types import Clip, Number
+from starfish.core.types import Axes, Clip, Number
 from starfish.core.util import click
 from starfish.core.util.dtype import preserve_float_range
 from ._base import FilterAlgorithmBase
@@ -53,6 +53,13 @@ class GaussianLowPass(FilterAlgorithmBase):
 
     _DEFAULT_TESTING_PARAMETERS = {"sigma": 1}
 
+    @property
+    def _halo(self) -> Mapping[Axes, int]:
+        """The distance over which the filter combines pixels along Y and X.  This matches the
+        truncation of the kernel used by :py:func:`scipy.ndimage.gaussian_filter`."""
+        sigma_y, sigma_x = self.sigma[-2:]
+        return {Axes.Y: int(4.0 * sigma_y + 0.5), Axes.X: int(4.0 * sigma_x + 0.5)}
+
     @staticmethod
     def _low_pass(
             image: Union[xr.DataArray, np.ndarray],
@@ -94,6 +101,7 @@ class GaussianLowPass(FilterAlgorithmBase):
             in_place: bool = False,
             verbose: bool = False,
             n_processes: Optional[int] = None,
+            block_shape: Optional[Mapping[Axes, int]] = None,
             *args,
     ) -> ImageStack:
         """Perform filtering of an image stack
@@ -109,6 +117,10 @@ class GaussianLowPass(FilterAlgorithmBase):
         n_processes : Optional[int]
             Number of parallel processes to devote to applying the filter. If None, defaults to
             the result of os.cpu_count(). (default None)
+        block_shape : Optional[Mapping[Axes, int]]
+            If provided, each plane is split along Axes.Y and Axes.X into blocks of at most this
+            size, which are filtered in parallel.  Blocks are extended by the radius of the filter,
+            so the result does not depend on the block shape. (default None)
 
         Returns
         -------
@@ -122,7 +134,7 @@ class GaussianLowPass(FilterAlgorithmBase):
         result = stack.apply(
             low_pass,
             group_by=group_by, verbose=verbose, in_place=in_place, n_processes=n_processes,
-            clip_method=self.clip_method
+            clip_method=self.clip_method, block_shape=block_shape, halo=self._halo,
         )
         return result
 
@@ -47,7 +47,7 @@ class MatchHistograms(FilterAlgorithmBase):
         sort_key = enum.harmonize(self.group_by)
 
         # stack up the array
-        stacked = data.xarray.stack(chunk_key=chunk_key)
+        stacked = data._float32_xarray().stack(chunk_key=chunk_key)
         stacked = stacked.stack(sort_key=sort_key)
 
         sorted_stacked = stacked.groupby("sort_key").apply(np.sort)
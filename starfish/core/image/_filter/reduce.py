@@ -88,7 +88,8 @@ class Reduce(FilterAlgorithmBase):
         """
 
         # Apply the reducing function
-        reduced = stack._data.reduce(self.func, dim=[Axes(dim).value for dim in self.dims])
+        reduced = stack._float32_xarray().reduce(
+            self.func, dim=[Axes(dim).value for dim in self.dims])
 
         # Add the reduced dims back and align with the original stack
         reduced = reduced.expand_dims(tuple(Axes(dim).value for dim in self.dims))
@@ -1,12 +1,12 @@
 from functools import partial
-from typing import Optional, Union
+from typing import Mapping, Optional, Union
 
 import numpy as np
 import xarray as xr
 from scipy.signal import convolve, fftconvolve
 
 from starfish.core.imagestack.imagestack import ImageStack
-from starfish.core.types import Clip, Number
+from starfish.core.types import Axes, Clip, Number
 from starfish.core.util import click
 from ._base import FilterAlgorithmBase
 from .util import (
@@ -84,6 +84,13 @@ class DeconvolvePSF(FilterAlgorithmBase):
 
     _DEFAULT_TESTING_PARAMETERS = {"num_iter": 2, "sigma": 1}
 
+    @property
+    def _halo(self) -> Mapping[Axes, int]:
+        """The distance over which the filter combines pixels along Y and X.  Each iteration
+        convolves with the point spread function twice."""
+        halo = 2 * (self.kernel_size // 2) * self.num_iter
+        return {Axes.Y: halo, Axes.X: halo}
+
     # Here be dragons. This algorithm had a bug, but the results looked nice. Now we've "fixed" it
     # and the results look bad. #548 addresses this problem.
     @staticmethod
@@ -149,6 +156,7 @@ class DeconvolvePSF(FilterAlgorithmBase):
             in_place: bool = False,
             verbose=False,
             n_processes: Optional[int] = None,
+            block_shape: Optional[Mapping[Axes, int]] = None,
             *args,
     ) -> ImageStack:
         """Perform filtering of an image stack
@@ -164,6 +172,10 @@ class DeconvolvePSF(FilterAlgorithmBase):
         n_processes : Optional[int]
             Number of parallel processes to devote to applying the filter. If None, defaults to
             the result of os.cpu_count(). (default None)
+        block_shape : Optional[Mapping[Axes, int]]
+            If provided, each plane is split along Axes.Y and Axes.X into blocks of at most this
+            size, which are filtered in parallel.  Blocks are extended by the radius of the filter,
+            so the result does not depend on the block shape. (default None)
 
         Returns
         -------
@@ -183,6 +195,8 @@ class DeconvolvePSF(FilterAlgorithmBase):
             verbose=verbose,
             n_processes=n_processes,
             in_place=in_place,
+            block_shape=block_shape,
+            halo=self._halo,
         )
         return result
 
@@ -3,9 +3,15 @@ from typing import Tuple, Union
 import numpy as np
 import pytest
 
-from starfish.core.image._filter import gaussian_high_pass, mean_high_pass
+from starfish.core.image._filter import (
+    gaussian_high_pass,
+    gaussian_low_pass,
+    mean_high_pass,
+    richardson_lucy_deconvolution,
+    white_tophat,
+)
 from starfish.core.imagestack.imagestack import ImageStack
-from starfish.core.types import Clip, Number
+from starfish.core.types import Axes, Clip, Number
 
 
 def random_data_image_stack_factory():
@@ -40,3 +46,17 @@ def test_mean_high_pass(size: Union[Number, Tuple[Number]], is_volume: bool) ->
     mhp = mean_high_pass.MeanHighPass(size=size, is_volume=is_volume, clip_method=Clip.CLIP)
     result = mhp.run(image_stack)
     assert np.sum(result.xarray) < sum_before
+
+
+@pytest.mark.parametrize('filter_', [
+    gaussian_low_pass.GaussianLowPass(sigma=1),
+    white_tophat.WhiteTophat(masking_radius=2),
+    richardson_lucy_deconvolution.DeconvolvePSF(num_iter=2, sigma=1),
+])
+def test_filter_in_blocks(filter_) -> None:
+    """filtering in blocks should produce the same result as filtering whole planes."""
+    data = np.random.uniform(0, 1, 2 * 60 * 50).reshape(1, 2, 1, 60, 50).astype(np.float32)
+    image_stack = ImageStack.from_numpy(data)
+    expected = filter_.run(image_stack, n_processes=1)
+    result = filter_.run(image_stack, n_processes=1, block_shape={Axes.Y: 16, Axes.X: 16})
+    assert np.allclose(result.xarray.values, expected.xarray.values, atol=1e-6)
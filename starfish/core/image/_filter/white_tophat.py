@@ -1,11 +1,11 @@
-from typing import Optional, Union
+from typing import Mapping, Optional, Union
 
 import numpy as np
 import xarray as xr
 from skimage.morphology import ball, disk, white_tophat
 
 from starfish.core.imagestack.imagestack import ImageStack
-from starfish.core.types import Clip
+from starfish.core.types import Axes, Clip
 from starfish.core.util import click
 from ._base import FilterAlgorithmBase
 from .util import determine_axes_to_group_by
@@ -52,6 +52,12 @@ class WhiteTophat(FilterAlgorithmBase):
 
     _DEFAULT_TESTING_PARAMETERS = {"masking_radius": 3}
 
+    @property
+    def _halo(self) -> Mapping[Axes, int]:
+        """The distance over which the filter combines pixels along Y and X.  The opening is an
+        erosion followed by a dilation, each of which reach masking_radius pixels."""
+        return {Axes.Y: 2 * self.masking_radius, Axes.X: 2 * self.masking_radius}
+
     def _white_tophat(self, image: Union[xr.DataArray, np.ndarray]) -> np.ndarray:
         if self.is_volume:
             structuring_element = ball(self.masking_radius)
@@ -65,6 +71,7 @@ class WhiteTophat(FilterAlgorithmBase):
             in_place: bool = False,
             verbose: bool = False,
             n_processes: Optional[int] = None,
+            block_shape: Optional[Mapping[Axes, int]] = None,
             *args,
     ) -> ImageStack:
         """Perform filtering of an image stack
@@ -80,6 +87,10 @@ class WhiteTophat(FilterAlgorithmBase):
         n_processes : Optional[int]
             Number of parallel processes to devote to applying the filter. If None, defaults to
             the result of os.cpu_count(). (default None)
+        block_shape : Optional[Mapping[Axes, int]]
+            If provided, each plane is split along Axes.Y and Axes.X into blocks of at most this
+            size, which are filtered in parallel.  Blocks are extended by the radius of the filter,
+            so the result does not depend on the block shape. (default None)
 
         Returns
         -------
@@ -92,7 +103,7 @@ class WhiteTophat(FilterAlgorithmBase):
         result = stack.apply(
             self._white_tophat,
             group_by=group_by, verbose=verbose, in_place=in_place, n_processes=n_processes,
-            clip_method=self.clip_method
+            clip_method=self.clip_method, block_shape=block_shape, halo=self._halo,
         )
         return result
 
@@ -55,9 +55,9 @@ class Translation(LearnTransformBase):
         """
 
         transforms = TransformsList()
-        reference_image = np.squeeze(self.reference_stack.xarray)
+        reference_image = np.squeeze(self.reference_stack._float32_xarray())
         for a in stack.axis_labels(self.axes):
-            target_image = np.squeeze(stack.sel({self.axes: a}).xarray)
+            target_image = np.squeeze(stack.sel({self.axes: a})._float32_xarray())
             if len(target_image.shape) != 2:
                 raise ValueError(
                     f"Only axes: {self.axes.value} can have a length > 1, "
@@ -1,15 +1,67 @@
 import functools
+import os
+import tempfile
 import warnings
+import weakref
 from collections import OrderedDict
 from multiprocessing import Array as mp_array  # type: ignore
-from typing import Callable, Sequence, Tuple
+from typing import Callable, NamedTuple, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import xarray as xr
 from xarray import Variable
 
+from starfish.core.config import StarfishConfig
 from starfish.core.types import Number
 
+MULTIPROCESSING_BACKING = "multiprocessing"
+MEMMAP_BACKING = "memmap"
+BACKINGS = (MULTIPROCESSING_BACKING, MEMMAP_BACKING)
+
+
+class MemmapHandle(NamedTuple):
+    """Picklable reference to a :py:class:`MemmapBuffer`.  Unlike a multiprocessing.Array, this can
+    be sent to worker processes at any time, and the workers attach to the buffer by its path."""
+    path: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    def attach(self) -> np.ndarray:
+        """Returns a numpy array that maps the buffer.  The mapping is not cached, and is released
+        once the array is no longer referenced, so a worker process that outlives the task does
+        not keep the memory of a released buffer mapped."""
+        return np.memmap(self.path, dtype=self.dtype, mode="r+", shape=self.shape)
+
+
+class MemmapBuffer:
+    """A file-backed buffer that can be mapped by any process that knows its path.  The file is
+    created in `directory` (or the default temporary directory if None) and is removed when this
+    object is garbage collected.  Pointing `directory` at a memory-backed filesystem, such as
+    /dev/shm, makes this equivalent to named POSIX shared memory.
+    """
+    def __init__(
+            self, shape: Sequence[int], dtype, directory: Optional[str]=None) -> None:
+        shape = tuple(int(dim) for dim in shape)
+        fd, path = tempfile.mkstemp(prefix="starfish-", suffix=".dat", dir=directory)
+        try:
+            # the file is sparse, so this does not write the contents of the buffer.
+            os.ftruncate(fd, max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+        finally:
+            os.close(fd)
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+        self.handle = MemmapHandle(path, shape, np.dtype(dtype).str)
+        self.array: np.ndarray = np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+Backing = Union[mp_array, MemmapBuffer]
+
 
 class MPDataArray:
     """Wrapper class for xarray.  It provides limited delegation to simplify ImageStack, but code
@@ -17,26 +69,50 @@ class MPDataArray:
     special method names (e.g., __eq__) do not delegate correctly.
 
     This is necessary for us to stack an xarray on top of a numpy array that is stacked on top of a
-    multiprocessing.Array object.  When we want to pass the xarray to worker processes using
-    Python's multiprocessing module, we need to pass the underlying multiprocessing.Array object
-    instead of the xarray or the numpy array.  However, there is no way to extract the
-    multiprocessing.Array object back out of the numpy array or the xarray.  Therefore, we need to
-    explicitly maintain a reference to it and keep the two items together.
+    buffer that can be shared between processes.  When we want to pass the xarray to worker
+    processes using Python's multiprocessing module, we need to pass the underlying buffer instead
+    of the xarray or the numpy array.  However, there is no way to extract the buffer back out of
+    the numpy array or the xarray.  Therefore, we need to explicitly maintain a reference to it and
+    keep the two items together.
+
+    The buffer is either a multiprocessing.Array, which can only be handed to worker processes when
+    the pool is created, or a :py:class:`MemmapBuffer`, which workers can attach to by name at any
+    time.  The kind of buffer is selected by the ``imagestack.backing`` configuration value.
     """
-    def __init__(self, data: xr.DataArray, backing_mp_array: mp_array) -> None:
+    def __init__(self, data: xr.DataArray, backing: Backing) -> None:
         self._data = data
-        self._backing_mp_array = backing_mp_array
+        self._backing = backing
 
     @classmethod
     def from_shape_and_dtype(
-            cls, shape: Sequence[int], dtype, initial_value: Number=None, *args, **kwargs
+            cls, shape: Sequence[int], dtype, initial_value: Number=None, *args,
+            backing_type: Optional[str]=None, **kwargs
     ) -> "MPDataArray":
-        np_array, backing_mp_array = np_array_backed_by_mp_array(shape, dtype)
+        """Allocates an MPDataArray.  The contents of the array are not guaranteed to be
+        initialized unless `initial_value` is provided.  If backing_type is None, the type of buffer
+        is read from the ``imagestack.backing`` configuration value."""
+        np_array, backing = np_array_backed_by_shared_buffer(shape, dtype, backing_type)
         if initial_value is not None and initial_value != 0:
             np_array.fill(initial_value)
         xarray = xr.DataArray(np_array, *args, **kwargs)
         xarray.copy = functools.partial(replacement_copy, xarray.copy)
-        return MPDataArray(xarray, backing_mp_array)
+        return MPDataArray(xarray, backing)
+
+    @property
+    def backing_type(self) -> str:
+        """The type of buffer backing this array, either MULTIPROCESSING_BACKING or
+        MEMMAP_BACKING."""
+        if isinstance(self._backing, MemmapBuffer):
+            return MEMMAP_BACKING
+        return MULTIPROCESSING_BACKING
+
+    @property
+    def memmap_handle(self) -> Optional[MemmapHandle]:
+        """If this array is backed by a :py:class:`MemmapBuffer`, returns the handle that worker
+        processes can use to attach to it.  Otherwise, returns None."""
+        if isinstance(self._backing, MemmapBuffer):
+            return self._backing.handle
+        return None
 
     @property
     def data(self) -> xr.DataArray:
@@ -52,14 +128,43 @@ class MPDataArray:
         self._data[key] = value
 
     def __deepcopy__(self, memodict={}):
-        xarray_copy, backing_mp_array_copy = xr_deepcopy(self._data)
-        return MPDataArray(xarray_copy, backing_mp_array_copy)
+        xarray_copy, backing_copy = xr_deepcopy(self._data, self.backing_type)
+        return MPDataArray(xarray_copy, backing_copy)
+
+
+def np_array_backed_by_shared_buffer(
+        shape: Sequence[int], dtype, backing_type: Optional[str]=None,
+) -> Tuple[np.ndarray, Backing]:
+    """Returns a np_array backed by a buffer that can be shared with worker processes.  If
+    backing_type is None, the type of buffer is read from the ``imagestack.backing`` configuration
+    value."""
+    if backing_type is None:
+        backing_type = StarfishConfig().imagestack_backing
+    if backing_type == MULTIPROCESSING_BACKING:
+        return np_array_backed_by_mp_array(shape, dtype)
+    elif backing_type == MEMMAP_BACKING:
+        return np_array_backed_by_memmap(shape, dtype, StarfishConfig().memmap_directory)
+    raise ValueError(f"backing must be one of {BACKINGS}, not {backing_type}")
+
+
+def np_array_backed_by_memmap(
+        shape: Sequence[int], dtype, directory: Optional[str]=None,
+) -> Tuple[np.ndarray, MemmapBuffer]:
+    """Returns a np_array backed by a :py:class:`MemmapBuffer`."""
+    buffer = MemmapBuffer(shape, dtype, directory)
+    return buffer.array, buffer
 
 
 def np_array_backed_by_mp_array(
         shape: Sequence[int], dtype) -> Tuple[np.ndarray, mp_array]:
     """Returns a np_array backed by a multiproceessing.Array buffer."""
-    ctype_type = np.ctypeslib.as_ctypes(np.empty((1,), dtype=np.dtype(dtype))).__class__
+    try:
+        ctype_type = np.ctypeslib.as_ctypes(np.empty((1,), dtype=np.dtype(dtype))).__class__
+    except NotImplementedError:
+        # ctypes has no equivalent for some dtypes (e.g., float16).  Those arrays are backed by an
+        # unsigned integer buffer of the same item size.
+        buffer_dtype = np.dtype(f"u{np.dtype(dtype).itemsize}")
+        ctype_type = np.ctypeslib.as_ctypes(np.empty((1,), dtype=buffer_dtype)).__class__
     length = int(np.product(shape))  # the cast to int is required by multiprocessing.Array.
     backing_array = mp_array(ctype_type, length)
     unshaped_np_array = np.frombuffer(backing_array.get_obj(), dtype)
@@ -68,12 +173,14 @@ def np_array_backed_by_mp_array(
     return shaped_np_array, backing_array
 
 
-def xr_deepcopy(source: xr.DataArray) -> Tuple[xr.DataArray, mp_array]:
+def xr_deepcopy(
+        source: xr.DataArray, backing_type: str=MULTIPROCESSING_BACKING,
+) -> Tuple[xr.DataArray, Backing]:
     """Replacement for xr.DataArray's deepcopy method.  Returns a deep copy of the input xarray
-    backed by a multiprocessing.Array buffer.
+    backed by a buffer of type `backing_type` that can be shared with worker processes.
     """
-    shaped_np_array, backing_array = np_array_backed_by_mp_array(
-        source.variable.shape, source.variable.dtype)
+    shaped_np_array, backing_array = np_array_backed_by_shared_buffer(
+        source.variable.shape, source.variable.dtype, backing_type)
 
     shaped_np_array[:] = source.variable.data
 
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from typing import Mapping, Optional, Sequence, Set
+
+import numpy as np
+from skimage import img_as_float32
+
+from starfish.core.imagestack.parser import TileCollectionData, TileKey
+from starfish.core.types import Coordinates, Number
+from starfish.core.util.dtype import convert_to_storage_dtype
+
+
+class TileCache:
+    """Decodes tiles from a :py:class:`TileCollectionData` on first access and keeps the most
+    recently used ones resident.  This backs lazily loaded ImageStacks, which read tiles through
+    this cache until they are materialized.
+
+    Parameters
+    ----------
+    tile_data : TileCollectionData
+        The source of the tiles.
+    starting_coordinates : Mapping[Coordinates, Sequence[Number]]
+        The physical coordinates of the first tile.  Every decoded tile is verified to be aligned
+        to these coordinates.
+    max_resident_tiles : int
+        The maximum number of decoded tiles to keep in memory.  When this is exceeded, the least
+        recently used tile is discarded.
+    storage_dtype :
+        The dtype the ImageStack stores its data in.  Decoded tiles are rounded to this dtype, so
+        that they have the same values before and after the ImageStack is materialized.
+    """
+    def __init__(
+            self,
+            tile_data: TileCollectionData,
+            starting_coordinates: Mapping[Coordinates, Sequence[Number]],
+            max_resident_tiles: int,
+            storage_dtype=np.float32,
+    ) -> None:
+        if max_resident_tiles < 1:
+            raise ValueError("max_resident_tiles must be at least 1")
+        self._tile_data = tile_data
+        self._starting_coordinates = starting_coordinates
+        self._max_resident_tiles = max_resident_tiles
+        self._storage_dtype = np.dtype(storage_dtype)
+        self._resident: "OrderedDict[TileKey, np.ndarray]" = OrderedDict()
+        self.tile_dtypes: Set[np.dtype] = set()
+
+    def __len__(self) -> int:
+        return len(self._resident)
+
+    def get(self, r: int, ch: int, z: int) -> np.ndarray:
+        """Return the float32 data for the tile at (r, ch, z), decoding it if it is not resident.
+        The returned array should be treated as read-only as it may be shared with later callers.
+        """
+        tilekey = TileKey(round=r, ch=ch, zplane=z)
+        data = self._resident.pop(tilekey, None)
+        if data is None:
+            data = self.decode(r, ch, z)
+
+        self._resident[tilekey] = data
+        while len(self._resident) > self._max_resident_tiles:
+            self._resident.popitem(last=False)
+
+        return data
+
+    def resident(self, r: int, ch: int, z: int) -> Optional[np.ndarray]:
+        """Return the float32 data for the tile at (r, ch, z) if it is resident, without updating
+        its recency."""
+        return self._resident.get(TileKey(round=r, ch=ch, zplane=z), None)
+
+    def decode(self, r: int, ch: int, z: int) -> np.ndarray:
+        """Decode the tile at (r, ch, z) and return its float32 data, without adding it to the set
+        of resident tiles.  Unlike :py:meth:`get`, this may be called from multiple threads."""
+        tile = self._tile_data.get_tile(r=r, ch=ch, z=z)
+        data = tile.numpy_array
+        self.tile_dtypes.add(data.dtype)
+
+        if not (
+                np.array_equal(
+                    self._starting_coordinates[Coordinates.X], tile.coordinates[Coordinates.X])
+                and np.array_equal(
+                    self._starting_coordinates[Coordinates.Y], tile.coordinates[Coordinates.Y])
+        ):
+            raise ValueError("Tiles must be aligned")
+
+        return img_as_float32(convert_to_storage_dtype(data, self._storage_dtype))
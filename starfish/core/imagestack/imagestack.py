@@ -1,6 +1,8 @@
 import collections
+import threading
 import warnings
-from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy, deepcopy
 from functools import partial
 from itertools import product
 from json import loads
@@ -53,8 +55,13 @@ from starfish.core.types import (
     STARFISH_EXTRAS_KEY
 )
 from starfish.core.util import logging
-from starfish.core.util.dtype import preserve_float_range
-from ._mp_dataarray import MPDataArray
+from starfish.core.util.dtype import (
+    convert_to_storage_dtype,
+    preserve_float_range,
+    STORAGE_DTYPES,
+)
+from ._mp_dataarray import MemmapHandle, MPDataArray, xr_deepcopy
+from ._tile_cache import TileCache
 from .dataorder import AXES_DATA, N_AXES
 
 
@@ -67,6 +74,18 @@ class ImageStack:
     are stored as coordinates on the :py:class:`xarray.DataArray`. ImageStacks can only be
     initialized with aligned Tilesets.
 
+    ImageStacks loaded with ``lazy=True`` do not decode any tiles at construction.  Tiles are
+    decoded when :py:meth:`get_slice` touches them and are held in a least-recently-used cache, and
+    :py:meth:`sel` and :py:meth:`isel` return lazily loaded ImageStacks over the selected tiles.
+    Any operation that requires the entire image tensor, such as :py:attr:`xarray`,
+    :py:meth:`apply` or :py:meth:`transform`, loads all the tiles of the ImageStack.
+
+    By default, ImageStacks store their data as float32.  An ImageStack can instead be constructed
+    with a ``storage_dtype`` of uint16 or float16 to halve its memory footprint.  Such ImageStacks
+    still present float32 data in the range [0, 1] through :py:meth:`get_slice`,
+    :py:meth:`apply` and :py:meth:`transform`, converting one chunk at a time, but
+    :py:attr:`xarray` exposes the data in its storage dtype.  Spot detection, filters that read the
+    whole stack, registration and display convert the data to float32 before using it.
 
     Loads configuration from StarfishConfig.
 
@@ -89,6 +108,8 @@ class ImageStack:
     def __init__(
             self,
             tile_data: TileCollectionData,
+            lazy: bool=False,
+            storage_dtype=np.float32,
     ) -> None:
         axes_sizes = {
             Axes.ROUND: len(set(tilekey.round for tilekey in tile_data.keys())),
@@ -96,7 +117,14 @@ class ImageStack:
             Axes.ZPLANE: len(set(tilekey.z for tilekey in tile_data.keys())),
         }
 
+        storage_dtype = np.dtype(storage_dtype)
+        if storage_dtype not in STORAGE_DTYPES:
+            raise TypeError(f"ImageStack data cannot be stored as {storage_dtype}")
+
         self._tile_data = tile_data
+        self._mp_data: Optional[MPDataArray] = None
+        self._tile_cache: Optional[TileCache] = None
+        self._lazy_layout: Optional[xr.DataArray] = None
 
         # check for existing log info
         if STARFISH_EXTRAS_KEY in tile_data.extras and LOG in tile_data.extras[STARFISH_EXTRAS_KEY]:
@@ -129,14 +157,26 @@ class ImageStack:
         data_shape.extend([tile_data.tile_shape[Axes.Y], tile_data.tile_shape[Axes.X]])
         data_dimensions.extend([Axes.Y.value, Axes.X.value])
 
-        # now that we know the tile data type (kind and size), we can allocate the data array.
-        self._data = MPDataArray.from_shape_and_dtype(
-            shape=data_shape,
-            dtype=np.float32,
-            initial_value=0,
-            dims=data_dimensions,
-            coords=data_tick_marks,
-        )
+        layout: Union[xr.DataArray, MPDataArray]
+        if lazy:
+            # a lazily loaded stack only records its layout.  the zero-strided array costs no
+            # memory regardless of the shape of the stack.
+            self._lazy_layout = xr.DataArray(
+                np.broadcast_to(storage_dtype.type(0), data_shape),
+                dims=data_dimensions,
+                coords=data_tick_marks,
+            )
+            layout = self._lazy_layout
+        else:
+            # now that we know the tile data type (kind and size), we can allocate the data array.
+            self._data = MPDataArray.from_shape_and_dtype(
+                shape=data_shape,
+                dtype=storage_dtype,
+                initial_value=0,
+                dims=data_dimensions,
+                coords=data_tick_marks,
+            )
+            layout = self._data
 
         all_selectors = list(self._iter_axes({Axes.ROUND, Axes.CH, Axes.ZPLANE}))
         first_selector = all_selectors[0]
@@ -145,40 +185,135 @@ class ImageStack:
                                   z=first_selector[Axes.ZPLANE])
 
         # Set up coordinates
-        self._data[Coordinates.X.value] = xr.DataArray(
+        layout[Coordinates.X.value] = xr.DataArray(
             tile.coordinates[Coordinates.X], dims=Axes.X.value)
-        self._data[Coordinates.Y.value] = xr.DataArray(
+        layout[Coordinates.Y.value] = xr.DataArray(
             tile.coordinates[Coordinates.Y], dims=Axes.Y.value)
         # Fill with nan for now, then replace with calculated midpoints
-        self._data[Coordinates.Z.value] = xr.DataArray(
-            np.full(self.xarray.sizes[Axes.ZPLANE.value], np.nan),
+        layout[Coordinates.Z.value] = xr.DataArray(
+            np.full(layout.sizes[Axes.ZPLANE.value], np.nan),
             dims=Axes.ZPLANE.value)
 
         # Get coords on first tile, then verify all subsequent tiles are aligned
         starting_coords = tile.coordinates
 
-        tile_dtypes = set()
-        for selector in tqdm(all_selectors):
+        if lazy:
+            self._tile_cache = TileCache(
+                tile_data, starting_coords, StarfishConfig().max_resident_tiles, storage_dtype)
+
+            # the z coordinate is per zplane, so it is sufficient to consult one tile per zplane.
+            for zplane in self.axis_labels(Axes.ZPLANE):
+                tile = tile_data.get_tile(
+                    r=first_selector[Axes.ROUND], ch=first_selector[Axes.CH], z=zplane)
+                if Coordinates.Z in tile.coordinates:
+                    assert len(tile.coordinates[Coordinates.Z]) == 1
+                    layout[Coordinates.Z.value].loc[zplane] = tile.coordinates[Coordinates.Z][0]
+            return
+
+        def load_tile(
+                selector: Mapping[Axes, int]
+        ) -> Tuple[np.dtype, Mapping[Coordinates, Sequence[Number]]]:
             tile = tile_data.get_tile(
                 r=selector[Axes.ROUND], ch=selector[Axes.CH], z=selector[Axes.ZPLANE])
             data = tile.numpy_array
-            tile_dtypes.add(data.dtype)
+            storage_data = convert_to_storage_dtype(data, storage_dtype)
+            with set_slice_lock:
+                self.set_slice(selector=selector, data=storage_data)
+            return data.dtype, tile.coordinates
 
-            data = img_as_float32(data)
-            self.set_slice(selector=selector, data=data)
+        set_slice_lock = threading.Lock()
+        tile_dtypes = set()
+        loaded_tiles = self._load_tiles(load_tile, all_selectors)
+        for selector, (tile_dtype, tile_coordinates) in zip(all_selectors, loaded_tiles):
+            tile_dtypes.add(tile_dtype)
 
             if not (
                     np.array_equal(
-                        starting_coords[Coordinates.X], tile.coordinates[Coordinates.X])
+                        starting_coords[Coordinates.X], tile_coordinates[Coordinates.X])
                     and np.array_equal(
-                        starting_coords[Coordinates.Y], tile.coordinates[Coordinates.Y])
+                        starting_coords[Coordinates.Y], tile_coordinates[Coordinates.Y])
             ):
                 raise ValueError(f"Tiles must be aligned")
-            if Coordinates.Z in tile.coordinates:
-                assert len(tile.coordinates[Coordinates.Z]) == 1
+            if Coordinates.Z in tile_coordinates:
+                assert len(tile_coordinates[Coordinates.Z]) == 1
                 self._data[Coordinates.Z.value].loc[selector[Axes.ZPLANE]] = \
-                    tile.coordinates[Coordinates.Z][0]
+                    tile_coordinates[Coordinates.Z][0]
+
+        self._validate_tile_dtypes(tile_dtypes)
+
+    @property
+    def _data(self) -> MPDataArray:
+        """The data backing this ImageStack.  If the ImageStack was lazily loaded, accessing this
+        loads all of its tiles."""
+        if self._tile_cache is not None:
+            self._materialize()
+        assert self._mp_data is not None
+        return self._mp_data
+
+    @_data.setter
+    def _data(self, data: MPDataArray) -> None:
+        self._mp_data = data
+
+    @property
+    def _layout(self) -> xr.DataArray:
+        """An :py:class:`xarray.DataArray` with the dimensions and coordinates of this ImageStack.
+        Unlike :py:attr:`xarray`, this does not force a lazily loaded ImageStack to load its
+        tiles."""
+        if self._lazy_layout is not None:
+            return self._lazy_layout
+        return self.xarray
+
+    @property
+    def is_lazy(self) -> bool:
+        """True if this ImageStack was lazily loaded and has not yet loaded all of its tiles."""
+        return self._tile_cache is not None
+
+    def _materialize(self) -> None:
+        """Allocate the shared data array for a lazily loaded ImageStack and fill it with all of
+        its tiles.  Tiles that are already resident in the tile cache are not decoded again."""
+        tile_cache, layout = self._tile_cache, self._lazy_layout
+        assert tile_cache is not None and layout is not None
+        # bind the narrowed tile cache for the load_tile closure.
+        resident_tiles: TileCache = tile_cache
+        self._tile_cache = None
+        self._lazy_layout = None
+
+        self._data = MPDataArray.from_shape_and_dtype(
+            shape=layout.shape,
+            dtype=layout.dtype,
+            initial_value=0,
+            dims=layout.dims,
+            coords=layout.coords,
+        )
 
+        def load_tile(selector: Mapping[Axes, int]) -> None:
+            r, ch, z = selector[Axes.ROUND], selector[Axes.CH], selector[Axes.ZPLANE]
+            data = resident_tiles.resident(r=r, ch=ch, z=z)
+            if data is None:
+                data = resident_tiles.decode(r=r, ch=ch, z=z)
+            with set_slice_lock:
+                self.set_slice(selector=selector, data=data)
+
+        set_slice_lock = threading.Lock()
+        self._load_tiles(load_tile, list(self._iter_axes({Axes.ROUND, Axes.CH, Axes.ZPLANE})))
+        self._validate_tile_dtypes(tile_cache.tile_dtypes)
+
+    @staticmethod
+    def _load_tiles(
+            load_tile: Callable[[Mapping[Axes, int]], Any],
+            selectors: Sequence[Mapping[Axes, int]],
+    ) -> List[Any]:
+        """Call load_tile for every selector on a pool of threads, and return the results in the
+        order of the selectors.  Decoding tiles is dominated by code that releases the GIL, so
+        threads suffice.  Label-based indexing into xarray is not thread-safe, so load_tile must
+        serialize its writes to the data array.  The number of threads is set by the
+        ``loader_threads`` configuration value."""
+        with ThreadPoolExecutor(max_workers=StarfishConfig().loader_threads) as executor:
+            return list(tqdm(executor.map(load_tile, selectors), total=len(selectors)))
+
+    @staticmethod
+    def _validate_tile_dtypes(tile_dtypes: Set[np.dtype]) -> None:
+        """verify that all the tiles loaded into an ImageStack have a consistent dtype"""
         tile_dtype_kinds = set(tile_dtype.kind for tile_dtype in tile_dtypes)
         tile_dtype_sizes = set(tile_dtype.itemsize for tile_dtype in tile_dtypes)
         if len(tile_dtype_kinds) != 1:
@@ -187,21 +322,23 @@ class ImageStack:
             warnings.warn("Not all tiles have the same precision data", DataFormatWarning)
 
     @staticmethod
-    def _validate_data_dtype_and_range(data: Union[np.ndarray, xr.DataArray]) -> None:
-        """verify that data is of dtype float32 and in range [0, 1]"""
-        if data.dtype != np.float32:
+    def _validate_data_dtype_and_range(
+            data: Union[np.ndarray, xr.DataArray], dtype=np.float32) -> None:
+        """verify that data is of the given dtype (default float32) and, if the dtype is a float
+        type, in range [0, 1]"""
+        if data.dtype != dtype:
             raise TypeError(
-                f"ImageStack data must be of type float32, not {data.dtype}. Please convert data "
-                f"using skimage.img_as_float32 prior to calling set_slice."
+                f"ImageStack data must be of type {np.dtype(dtype)}, not {data.dtype}. Please "
+                f"convert data using skimage.img_as_float32 prior to calling set_slice."
             )
-        if np.min(data) < 0 or np.max(data) > 1:
+        if data.dtype.kind == 'f' and (np.min(data) < 0 or np.max(data) > 1):
             raise ValueError(
                 f"ImageStack data must be of type float32 and in the range [0, 1]. Please convert "
                 f"data using skimage.img_as_float32 prior to calling set_slice."
             )
 
     def __repr__(self):
-        shape = ', '.join(f'{k}: {v}' for k, v in self._data.sizes.items())
+        shape = ', '.join(f'{k}: {v}' for k, v in self._layout.sizes.items())
         return f"<starfish.ImageStack ({shape})>"
 
     @classmethod
@@ -209,6 +346,8 @@ class ImageStack:
             cls,
             tileset: TileSet,
             crop_parameters: Optional[CropParameters]=None,
+            lazy: bool=False,
+            storage_dtype=np.float32,
     ) -> "ImageStack":
         """
         Parse a :py:class:`slicedimage.TileSet` into an ImageStack.
@@ -219,6 +358,13 @@ class ImageStack:
             The tileset to parse.
         crop_parameters : Optional[CropParameters]
 
+        lazy : bool
+            If True, tiles are not decoded until they are accessed.  Decoded tiles are kept in a
+            cache bounded by the ``max_resident_tiles`` configuration value until an operation
+            requires the entire image tensor (default = False).
+        storage_dtype :
+            The dtype the data is stored in.  One of float32, float16 or uint16 (default =
+            float32).
 
         Returns
         -------
@@ -228,10 +374,17 @@ class ImageStack:
         tile_data: TileCollectionData = TileSetData(tileset)
         if crop_parameters is not None:
             tile_data = CroppedTileCollectionData(tile_data, crop_parameters)
-        return cls(tile_data)
+        return cls(tile_data, lazy=lazy, storage_dtype=storage_dtype)
 
     @classmethod
-    def from_url(cls, url: str, baseurl: Optional[str], aligned_group: int = 0):
+    def from_url(
+            cls,
+            url: str,
+            baseurl: Optional[str],
+            aligned_group: int = 0,
+            lazy: bool = False,
+            storage_dtype=np.float32,
+    ):
         """
         Constructs an ImageStack object from a URL and a base URL.
 
@@ -252,6 +405,11 @@ class ImageStack:
         aligned_group: int
             Which aligned tile group to load into the Imagestack, only applies if the
             tileset is unaligned. Default 0 (the first group)
+        lazy : bool
+            If True, tiles are not decoded until they are accessed (default = False).
+        storage_dtype :
+            The dtype the data is stored in.  One of float32, float16 or uint16 (default =
+            float32).
 
         Returns
         -------
@@ -262,10 +420,17 @@ class ImageStack:
         tileset = Reader.parse_doc(url, baseurl, backend_config=config.slicedimage)
         coordinate_groups = CropParameters.parse_aligned_groups(tileset)
         crop_params = coordinate_groups[aligned_group]
-        return cls.from_tileset(tileset, crop_parameters=crop_params)
+        return cls.from_tileset(
+            tileset, crop_parameters=crop_params, lazy=lazy, storage_dtype=storage_dtype)
 
     @classmethod
-    def from_path_or_url(cls, url_or_path: str, aligned_group: int = 0) -> "ImageStack":
+    def from_path_or_url(
+            cls,
+            url_or_path: str,
+            aligned_group: int = 0,
+            lazy: bool = False,
+            storage_dtype=np.float32,
+    ) -> "ImageStack":
         """
         Constructs an ImageStack object from an absolute URL or a filesystem path.
 
@@ -281,11 +446,17 @@ class ImageStack:
         aligned_group: int
             Which aligned tile group to load into the Imagestack, only applies if the
             tileset is unaligned. Default 0 (the first group)
+        lazy : bool
+            If True, tiles are not decoded until they are accessed (default = False).
+        storage_dtype :
+            The dtype the data is stored in.  One of float32, float16 or uint16 (default =
+            float32).
         """
         config = StarfishConfig()
         _, relativeurl, baseurl = resolve_path_or_url(url_or_path,
                                                       backend_config=config.slicedimage)
-        return cls.from_url(relativeurl, baseurl, aligned_group)
+        return cls.from_url(
+            relativeurl, baseurl, aligned_group, lazy=lazy, storage_dtype=storage_dtype)
 
     @classmethod
     def from_numpy(
@@ -293,6 +464,7 @@ class ImageStack:
             array: np.ndarray,
             index_labels: Optional[Mapping[Axes, Sequence[int]]]=None,
             coordinates: Optional[Mapping[Coordinates, Sequence[Number]]]=None,
+            storage_dtype=np.float32,
     ) -> "ImageStack":
         """Create an ImageStack from a 5d numpy array with shape (n_round, n_ch, n_z, y, x)
 
@@ -306,6 +478,9 @@ class ImageStack:
         coordinates : Optional[Mapping[Coordinates, Sequence[Number]]]
             Map from Coordinates to a sequence of coordinate values.  If this is not provided, then
             the ImageStack gets fake coordinates.
+        storage_dtype :
+            The dtype the data is stored in.  One of float32, float16 or uint16 (default =
+            float32).
 
         Returns
         -------
@@ -316,10 +491,11 @@ class ImageStack:
         if len(array.shape) != 5:
             raise ValueError('a 5-d tensor with shape (n_round, n_ch, n_z, y, x) must be provided.')
         try:
-            cls._validate_data_dtype_and_range(array)
+            cls._validate_data_dtype_and_range(array, storage_dtype)
         except TypeError:
-            warnings.warn(f"ImageStack detected as {array.dtype}. Converting to float32...")
-            array = img_as_float32(array)
+            warnings.warn(
+                f"ImageStack detected as {array.dtype}. Converting to {np.dtype(storage_dtype)}...")
+            array = convert_to_storage_dtype(array, storage_dtype)
 
         n_round, n_ch, n_z, height, width = array.shape
 
@@ -340,13 +516,22 @@ class ImageStack:
             assert len(coordinates[Coordinates.Z]) == n_z
 
         tile_data = NumpyData(array, index_labels, coordinates)
-        return cls(tile_data)
+        return cls(tile_data, storage_dtype=storage_dtype)
 
     @property
     def xarray(self) -> xr.DataArray:
         """Retrieves the image data as an :py:class:`xarray.DataArray`"""
         return self._data.data
 
+    def _float32_xarray(self) -> xr.DataArray:
+        """Retrieves the image data as an :py:class:`xarray.DataArray` of float32 in [0, 1], as
+        :py:meth:`get_slice` presents it.  For ImageStacks stored as float32, this is
+        :py:attr:`xarray` itself; otherwise, it is a converted copy."""
+        data = self.xarray
+        if data.dtype == np.float32 or data.dtype not in STORAGE_DTYPES:
+            return data
+        return xr.DataArray(img_as_float32(data.values), dims=data.dims, coords=data.coords)
+
     def sel(self, indexers: Mapping[Axes, Union[int, tuple]]):
         """Given a dictionary mapping the index name to either a value or a range represented as a
         tuple, return an Imagestack with each dimension indexed accordingly
@@ -379,10 +564,10 @@ class ImageStack:
         ImageStack :
             a new image stack indexed by given value or range.
         """
-        stack = deepcopy(self)
         selector = indexing_utils.convert_to_selector(indexers)
-        stack._data._data = indexing_utils.index_keep_dimensions(self.xarray, selector)
-        return stack
+        if self.is_lazy:
+            return self._lazy_crop(selector, by_pos=False)
+        return self._crop(selector, by_pos=False)
 
     def isel(self, indexers: Mapping[Axes, Union[int, tuple]]):
         """Given a dictionary mapping the index name to either a value or a range represented as a
@@ -415,9 +600,51 @@ class ImageStack:
         ImageStack :
             a new image stack indexed by given value or range.
         """
-        stack = deepcopy(self)
         selector = indexing_utils.convert_to_selector(indexers)
-        stack._data._data = indexing_utils.index_keep_dimensions(self.xarray, selector, by_pos=True)
+        if self.is_lazy:
+            return self._lazy_crop(selector, by_pos=True)
+        return self._crop(selector, by_pos=True)
+
+    def _crop(self, selector: Mapping[str, Union[int, slice]], by_pos: bool) -> "ImageStack":
+        """Index a loaded ImageStack by returning a copy of it whose data is the selected region.
+        The region is copied into a buffer of its own size, as worker processes reshape the buffer
+        backing an ImageStack to the shape of its data."""
+        stack = deepcopy(self)
+        cropped = indexing_utils.index_keep_dimensions(self.xarray, selector, by_pos=by_pos)
+        stack._data = MPDataArray(*xr_deepcopy(cropped, self._data.backing_type))
+        return stack
+
+    def _lazy_crop(
+            self, selector: Mapping[str, Union[int, slice]], by_pos: bool) -> "ImageStack":
+        """Index a lazily loaded ImageStack by returning a lazily loaded ImageStack that is backed
+        by a cropped view of this ImageStack's tiles.  No tiles are decoded."""
+        layout = indexing_utils.index_keep_dimensions(self._layout, selector, by_pos=by_pos)
+
+        tile_slices: MutableMapping[Axes, slice] = dict()
+        for axis in (Axes.Y, Axes.X):
+            # Y and X have no tick marks, so indexing an array of positions along the axis
+            # recovers the range of pixels that were selected.
+            positions = xr.DataArray(np.arange(self._layout.sizes[axis.value]), dims=axis.value)
+            if by_pos:
+                positions = positions.isel({axis.value: selector[axis.value]})
+            else:
+                positions = positions.sel({axis.value: selector[axis.value]})
+            positions = np.atleast_1d(positions.values)
+            tile_slices[axis] = slice(int(positions.min()), int(positions.max()) + 1)
+
+        crop_parameters = CropParameters(
+            permitted_rounds=[int(val) for val in layout.coords[Axes.ROUND.value].values],
+            permitted_chs=[int(val) for val in layout.coords[Axes.CH.value].values],
+            permitted_zplanes=[int(val) for val in layout.coords[Axes.ZPLANE.value].values],
+            x_slice=tile_slices[Axes.X],
+            y_slice=tile_slices[Axes.Y],
+        )
+        stack = ImageStack(
+            CroppedTileCollectionData(self._tile_data, crop_parameters),
+            lazy=True,
+            storage_dtype=self._layout.dtype,
+        )
+        stack._log = deepcopy(self._log)
         return stack
 
     def sel_by_physical_coords(
@@ -437,7 +664,7 @@ class ImageStack:
         ImageStack :
             a new image stack indexed by given value or range.
         """
-        new_indexers = indexing_utils.convert_coords_to_indices(self.xarray, indexers)
+        new_indexers = indexing_utils.convert_coords_to_indices(self._layout, indexers)
         return self.isel(new_indexers)
 
     def get_slice(
@@ -500,9 +727,15 @@ class ImageStack:
         """
         formatted_indexers = indexing_utils.convert_to_selector(selector)
         _, axes = self._build_slice_list(selector)
-        result = self._data.sel(formatted_indexers).values
+        if self.is_lazy:
+            result = self._lazy_get_slice(formatted_indexers)
+        else:
+            result = self._data.sel(formatted_indexers).values
 
-        if result.dtype != np.float32:
+        if result.dtype in STORAGE_DTYPES:
+            # ImageStacks that store their data in a native dtype present it as float32.
+            result = img_as_float32(result)
+        elif result.dtype != np.float32:
             warnings.warn(
                 f"Non-float32 dtype: {result.dtype} detected. Data has likely been set using "
                 f"private attributes of ImageStack. ImageStack only supports float data in the "
@@ -511,6 +744,52 @@ class ImageStack:
 
         return result, axes
 
+    def _lazy_get_slice(self, formatted_indexers: Mapping[str, Union[int, slice]]) -> np.ndarray:
+        """Assemble a slice of a lazily loaded ImageStack from its tile cache, decoding only the
+        tiles that the slice covers."""
+        assert self._tile_cache is not None
+        layout = self._layout.sel(formatted_indexers)
+        result = np.empty(layout.shape, dtype=np.float32)
+
+        tile_axes = (Axes.ROUND, Axes.CH, Axes.ZPLANE)
+        labels = [np.atleast_1d(layout.coords[axis.value].values) for axis in tile_axes]
+        for positions in product(*(range(len(axis_labels)) for axis_labels in labels)):
+            r, ch, z = (
+                int(axis_labels[position]) for axis_labels, position in zip(labels, positions))
+            # axes selected with a scalar are no longer present in the result.
+            index = tuple(
+                position
+                for axis, position in zip(tile_axes, positions)
+                if axis.value in layout.dims
+            )
+            result[index] = self._tile_cache.get(r=r, ch=ch, z=z)
+
+        return result
+
+    def _lazy_chunk(self, slice_list: Tuple[Union[int, slice], ...]) -> xr.DataArray:
+        """Assemble the chunk of a lazily loaded ImageStack at the positions in slice_list from its
+        tile cache, decoding only the tiles that the chunk covers.  slice_list indexes the axes of
+        the ImageStack in order, and may optionally include slices for Y and X."""
+        assert self._tile_cache is not None
+        layout = self._layout[slice_list]
+        yx_index = tuple(slice_list[N_AXES:])
+        result = np.empty(layout.shape, dtype=np.float32)
+
+        tile_axes = (Axes.ROUND, Axes.CH, Axes.ZPLANE)
+        labels = [np.atleast_1d(layout.coords[axis.value].values) for axis in tile_axes]
+        for positions in product(*(range(len(axis_labels)) for axis_labels in labels)):
+            r, ch, z = (
+                int(axis_labels[position]) for axis_labels, position in zip(labels, positions))
+            # axes selected with a scalar are no longer present in the result.
+            index = tuple(
+                position
+                for axis, position in zip(tile_axes, positions)
+                if axis.value in layout.dims
+            )
+            result[index] = self._tile_cache.get(r=r, ch=ch, z=z)[yx_index]
+
+        return layout.copy(data=result)
+
     def set_slice(
             self,
             selector: Mapping[Axes, Union[int, slice]],
@@ -535,7 +814,8 @@ class ImageStack:
         data : np.ndarray
             a 2- to 5-D numpy array containing the source data for the operation whose last two axes
             must be in (Y, X) order. If data larger than 2-D is provided, axes must be set to
-            specify the order of the additional axes (see below).
+            specify the order of the additional axes (see below).  The data must be float32 in the
+            range [0, 1], or of the storage dtype of this ImageStack.
         axes : Optional[Sequence[Axes]]
             The order of the axes for the source data, excluding (Y, X). Optional ONLY if data is
             a (Y, X) 2-d tile.
@@ -591,7 +871,12 @@ class ImageStack:
             >>> stack.set_slice({Axes.ZPLANE: 5, Axes.CH: slice(2, 4)}, new_data)
         """
 
-        self._validate_data_dtype_and_range(data)
+        storage_dtype = self._layout.dtype
+        if data.dtype == storage_dtype:
+            self._validate_data_dtype_and_range(data, storage_dtype)
+        else:
+            self._validate_data_dtype_and_range(data)
+            data = convert_to_storage_dtype(data, storage_dtype)
 
         slice_list, expected_axes = self._build_slice_list(selector)
 
@@ -676,6 +961,8 @@ class ImageStack:
             verbose: bool=False,
             n_processes: Optional[int]=None,
             clip_method: Union[str, Clip]=Clip.CLIP,
+            block_shape: Optional[Mapping[Axes, int]]=None,
+            halo: Optional[Mapping[Axes, int]]=None,
             **kwargs
     ) -> "ImageStack":
         """Split the image along a set of axes and apply a function across all the components.  This
@@ -714,6 +1001,16 @@ class ImageStack:
               value calculated over each slice, where slice shapes are determined by the group_by
               parameters
 
+        block_shape : Optional[Mapping[Axes, int]]
+            If provided, each component is further split along Y and X into blocks of at most this
+            size, which are processed in parallel.  Axes that are not specified are not split.  This
+            allows a single large component to be spread across processes.  Cannot be combined with
+            Clip.SCALE_BY_CHUNK.  (default None)
+        halo : Optional[Mapping[Axes, int]]
+            When splitting components into blocks, func is applied to each block extended by this
+            many pixels along Y and X, and only the interior of the result is kept.  If the halo is
+            at least the radius over which func combines pixels, the result is the same as applying
+            func to the entire component.  (default None, no halo)
 
         Returns
         -------
@@ -725,6 +1022,9 @@ class ImageStack:
         ------
         TypeError :
              If no Clip method given.
+        ValueError :
+             If block_shape is combined with Clip.SCALE_BY_CHUNK, or block_shape or halo refer to
+             axes other than Y and X.
 
         """
         # default grouping is by (x, y) tile
@@ -733,47 +1033,99 @@ class ImageStack:
 
         if not isinstance(clip_method, (str, Clip)):
             raise TypeError("must pass a Clip method. See starfish.types.Clip for valid options")
+        if clip_method == Clip.SCALE_BY_IMAGE and self._layout.dtype != np.float32:
+            raise ValueError(
+                f"Clip.SCALE_BY_IMAGE requires float32 storage, but this ImageStack stores its "
+                f"data as {self._layout.dtype}")
 
-        if not in_place:
-            # create a copy of the ImageStack, call apply on that stack with in_place=True
-            image_stack = deepcopy(self)
-            return image_stack.apply(
-                func=func,
-                group_by=group_by, in_place=True, verbose=verbose, n_processes=n_processes,
-                clip_method=clip_method,
-                **kwargs
-            )
+        if block_shape is not None and clip_method == Clip.SCALE_BY_CHUNK:
+            raise ValueError("Clip.SCALE_BY_CHUNK cannot be used when splitting into blocks")
 
-        # wrapper adds a target `data` parameter where the results from func will be stored
-        # data are clipped or scaled by chunk using preserve_float_range if clip_method != 2
-        bound_func = partial(ImageStack._in_place_apply, func, clip_method=clip_method)
+        # results are written to a newly allocated stack rather than to a copy of this one, which
+        # would be entirely overwritten.  blocks read the halos of their neighbors, so they can
+        # never be written in place.  a lazily loaded stack is only loaded if it is written to.
+        if in_place and self.is_lazy:
+            self._materialize()
+        output = self if in_place and block_shape is None else self._allocate_output()
 
-        # execute the processing workflow
-        self.transform(
-            func=bound_func,
+        # wrapper adds a target `output` parameter where the results from func will be stored
+        # data are clipped or scaled by chunk using preserve_float_range if clip_method != 2
+        bound_func = partial(ImageStack._apply_chunk, func, clip_method)
+        outputs: List[MPDataArray] = []
+        if output is not self:
+            outputs.append(output._data)
+
+        # execute the processing workflow.  bound_func converts the chunks of ImageStacks with
+        # native-dtype storage itself, as it writes its results back to the chunk.
+        self._transform(
+            func=partial(bound_func, **kwargs),
             group_by=group_by,
             verbose=verbose,
             n_processes=n_processes,
-            **kwargs)
+            convert_chunks=False,
+            outputs=outputs,
+            block_shape=block_shape,
+            halo=halo)
 
         # scale based on values of whole image
         if clip_method == Clip.SCALE_BY_IMAGE:
-            self._data.data.values = preserve_float_range(self._data.data.values, rescale=True)
-
-        return self
+            output._data.data.values = preserve_float_range(
+                output._data.data.values, rescale=True)
+
+        if in_place and output is not self:
+            self._data.data.values[...] = output._data.data.values
+            return self
+
+        return output
+
+    def _allocate_output(self) -> "ImageStack":
+        """Returns a copy of this ImageStack whose data array is allocated, but not initialized.
+        The tile data is shared with this ImageStack rather than copied.  The layout of the data is
+        read without loading a lazily loaded ImageStack."""
+        layout = self._layout
+        output = copy(self)
+        output._tile_cache = None
+        output._lazy_layout = None
+        output._log = deepcopy(self._log)
+        output._data = MPDataArray.from_shape_and_dtype(
+            shape=layout.shape,
+            dtype=layout.dtype,
+            dims=layout.dims,
+            coords=collections.OrderedDict(
+                (name, coord.copy(deep=True)) for name, coord in layout.coords.items()),
+            backing_type=None if self.is_lazy else self._data.backing_type,
+        )
+        return output
 
     @staticmethod
-    def _in_place_apply(
-        apply_func: Callable[..., Union[xr.DataArray, np.ndarray]], data: np.ndarray,
-        clip_method: Union[str, Clip], **kwargs
+    def _apply_chunk(
+        apply_func: Callable[..., Union[xr.DataArray, np.ndarray]],
+        clip_method: Union[str, Clip],
+        data: xr.DataArray,
+        output: Optional[xr.DataArray]=None,
+        interior: Optional[Tuple[Any, ...]]=None,
+        **kwargs
     ) -> None:
-        result = apply_func(data, **kwargs)
+        """Applies apply_func to a chunk of an ImageStack and writes the result into the
+        corresponding chunk of `output`.  If output is None, the result is written back to
+        `data`.  If interior is provided, only that region of the result is written to output."""
+        if output is None:
+            output = data
+        if data.dtype == np.float32:
+            result = apply_func(data, **kwargs)
+        else:
+            result = apply_func(data.copy(data=img_as_float32(data.values)), **kwargs)
+        if interior is not None:
+            result = np.asarray(result)[interior]
+
         if clip_method == Clip.CLIP:
-            data[:] = preserve_float_range(result, rescale=False)
+            result = preserve_float_range(result, rescale=False)
         elif clip_method == Clip.SCALE_BY_CHUNK:
-            data[:] = preserve_float_range(result, rescale=True)
-        else:
-            data[:] = result
+            result = preserve_float_range(result, rescale=True)
+
+        if output.dtype != np.float32:
+            result = convert_to_storage_dtype(np.asarray(result), output.dtype)
+        output[:] = result
 
     def transform(
             self,
@@ -789,7 +1141,8 @@ class ImageStack:
         ----------
         func : Callable
             Function to apply. must expect a first argument which is a numpy array (see group_by)
-            but may return any object type.
+            but may return any object type.  The array is float32 regardless of the storage dtype
+            of the ImageStack.
         group_by : Set[Axes]
             Axes to split the data along.  For instance, splitting a 2D array (axes: X, Y; size:
             3, 4) by X results in 3 arrays of size 4.  (default {Axes.ROUND, Axes.CH,
@@ -807,60 +1160,223 @@ class ImageStack:
         List[Any] :
             The results of applying func to stored image data
         """
+        return self._transform(
+            func=partial(func, **kwargs),
+            group_by=group_by,
+            verbose=verbose,
+            n_processes=n_processes,
+            convert_chunks=True)
+
+    def _transform(
+            self,
+            func: Callable,
+            group_by: Optional[Set[Axes]],
+            verbose: bool,
+            n_processes: Optional[int],
+            convert_chunks: bool,
+            outputs: Sequence[MPDataArray]=(),
+            block_shape: Optional[Mapping[Axes, int]]=None,
+            halo: Optional[Mapping[Axes, int]]=None,
+    ) -> List[Any]:
+        """Implementation of :py:meth:`transform`.  If `convert_chunks` is True, chunks of
+        ImageStacks with native-dtype storage are converted to float32 before they are passed to
+        func.  The corresponding chunks of each of `outputs`, which must have the same layout as
+        this ImageStack, are passed to func as additional arguments.
+
+        If `block_shape` is provided, each chunk is further split into blocks along Y and X.  func
+        is passed each block extended by `halo`, the interior of the block in each of `outputs`,
+        and an `interior` keyword argument that locates the interior within the extended block.
+        One result is returned for each block."""
         # default grouping is by (x, y) tile
         if group_by is None:
             group_by = {Axes.ROUND, Axes.CH, Axes.ZPLANE}
 
         selectors = list(self._iter_axes(group_by))
-        slice_lists = [self._build_slice_list(index)[0]
-                       for index in selectors]
 
-        selectors_and_slice_lists = zip(selectors, slice_lists)
-        if verbose and StarfishConfig().verbose:
-            selectors_and_slice_lists = tqdm(selectors_and_slice_lists)
+        # selectors are in terms of axis labels.  translate them to positions so the workers can
+        # index the buffers directly.
+        label_positions = {
+            axis: {label: position for position, label in enumerate(self.axis_labels(axis))}
+            for axis in group_by
+        }
+        slice_lists = [
+            self._build_slice_list({
+                axis: label_positions[axis][label] for axis, label in selector.items()})[0]
+            for selector in selectors
+        ]
 
+        # each task is the slice list for the source and for each of the outputs, and any keyword
+        # arguments specific to the task.
+        tasks: List[Tuple[List[Tuple[Union[int, slice], ...]], Mapping[str, Any]]] = []
+        task_selectors: List[Mapping[Axes, int]] = []
+        if block_shape is None:
+            for selector, slice_list in zip(selectors, slice_lists):
+                tasks.append(([slice_list] * (1 + len(outputs)), {}))
+                task_selectors.append(selector)
+        else:
+            blocks = self._spatial_blocks(block_shape, halo or {})
+            for selector, slice_list in zip(selectors, slice_lists):
+                for extended_block, interior_block, interior in blocks:
+                    tasks.append((
+                        [self._with_yx_slices(slice_list, extended_block)]
+                        + [self._with_yx_slices(slice_list, interior_block)] * len(outputs),
+                        {"interior": interior}))
+                    task_selectors.append(selector)
+
+        layout = self._layout
         coordinates = {
-            dim: self.xarray.coords[dim]
-            for dim in self.xarray.coords.dims
+            dim: layout.coords[dim]
+            for dim in layout.coords.dims
         }
 
+        # the chunks of a lazily loaded ImageStack are read from its tile cache as the tasks are
+        # dispatched, and sent along with them.  otherwise, the workers read the chunks from the
+        # shared data buffer.
+        is_lazy = self.is_lazy
+
+        # memory-mapped buffers are attached by name in the workers, so the pool does not need to
+        # be handed the buffers when it is created.
+        buffers = list(outputs) if is_lazy else [self._data] + list(outputs)
+        memmap_handles: Optional[List[MemmapHandle]] = []
+        for buffer in buffers:
+            memmap_handle = buffer.memmap_handle
+            if memmap_handle is None or memmap_handles is None:
+                memmap_handles = None
+            else:
+                memmap_handles.append(memmap_handle)
         mp_applyfunc: Callable = partial(
-            self._processing_workflow, partial(func, **kwargs), self.xarray.dims, coordinates)
-
-        with Pool(
+            self._processing_workflow,
+            func, layout.dims, coordinates, convert_chunks, memmap_handles)
+
+        # only memory-mapped buffers can be used by the persistent pool, whose workers are started
+        # before the buffers exist.  buffers backed by multiprocessing arrays must be inherited by
+        # workers started for this call.
+        if memmap_handles is not None:
+            pool = Pool.shared(processes=n_processes)
+        else:
+            pool = Pool(
                 processes=n_processes,
                 initializer=SharedMemory.initializer,
-                initargs=((self._data._backing_mp_array,
-                           self._data._data.shape,
-                           self._data._data.dtype),)) as pool:
-            results = pool.imap(mp_applyfunc, selectors_and_slice_lists)
+                initargs=([(buffer._backing, buffer._data.shape, buffer._data.dtype)
+                           for buffer in buffers],))
+        # dispatch the chunks in batches, so the per-task overhead is paid once per batch.  this
+        # follows the chunk size heuristic of multiprocessing.Pool.map.
+        batch_size = max(1, len(tasks) // (pool.processes * 4))
+
+        def batches() -> Iterator[List[Tuple[Any, ...]]]:
+            for start in range(0, len(tasks), batch_size):
+                yield [
+                    (slice_lists, task_kwargs,
+                     self._lazy_chunk(slice_lists[0]) if is_lazy else None)
+                    for slice_lists, task_kwargs in tasks[start:start + batch_size]
+                ]
+
+        with pool:
+            results: List[Any] = []
+            with tqdm(
+                    total=len(tasks),
+                    disable=not (verbose and StarfishConfig().verbose)) as progress:
+                for batch_results in pool.imap(mp_applyfunc, batches()):
+                    results.extend(batch_results)
+                    progress.update(len(batch_results))
 
             # Note: results is [None, ...] if executing an in-place workflow
             # Note: this return must be inside the context manager or the Pool will deadlock
-            return list(zip(results, selectors))
+            return list(zip(results, task_selectors))
+
+    def _spatial_blocks(
+            self, block_shape: Mapping[Axes, int], halo: Mapping[Axes, int],
+    ) -> List[Tuple[Tuple[slice, slice], Tuple[slice, slice], Tuple[Any, ...]]]:
+        """Split the Y and X axes into blocks of at most `block_shape`.  For each block, returns the
+        (y, x) slices of the block extended by `halo` and clipped to the image, the (y, x) slices
+        of the block itself, and the index that extracts the block from the extended block."""
+        for axis in set(block_shape.keys()) | set(halo.keys()):
+            if axis not in (Axes.Y, Axes.X):
+                raise ValueError(f"blocks can only be formed along Y and X, not {axis}")
+
+        axis_ranges = []
+        for axis in (Axes.Y, Axes.X):
+            size = self._layout.sizes[axis.value]
+            step = block_shape.get(axis, size)
+            if step < 1:
+                raise ValueError(f"block_shape must be positive along {axis}")
+            margin = halo.get(axis, 0)
+            axis_ranges.append([
+                (slice(max(start - margin, 0), min(start + step + margin, size)),
+                 slice(start, min(start + step, size)))
+                for start in range(0, size, step)
+            ])
+
+        blocks: List[Tuple[Tuple[slice, slice], Tuple[slice, slice], Tuple[Any, ...]]] = []
+        for (y_extended, y_block), (x_extended, x_block) in product(*axis_ranges):
+            interior = (
+                Ellipsis,
+                slice(y_block.start - y_extended.start, y_block.stop - y_extended.start),
+                slice(x_block.start - x_extended.start, x_block.stop - x_extended.start),
+            )
+            blocks.append(((y_extended, x_extended), (y_block, x_block), interior))
+        return blocks
+
+    @staticmethod
+    def _with_yx_slices(
+            slice_list: Tuple[Union[int, slice], ...], yx_slices: Tuple[slice, slice],
+    ) -> Tuple[Union[int, slice], ...]:
+        """Returns slice_list, which indexes the non-spatial axes, extended with the slices for the
+        Y and X axes."""
+        return tuple(slice_list) + tuple(yx_slices)
 
     @staticmethod
     def _processing_workflow(
             worker_callable: Callable[[np.ndarray], Any],
             xarray_dims: Sequence[str],
             xarray_coordinates: Mapping[str, np.ndarray],
-            selector_and_slice_list: Tuple[Mapping[Axes, int],
-                                           Tuple[Union[int, slice], ...]],
-    ):
-        # build the numpy array from the shared memory object
-        backing_mp_array, shape, dtype = SharedMemory.get_payload()
-        unshaped_numpy_array = np.frombuffer(backing_mp_array.get_obj(), dtype=dtype)
-
-        # build and then slice the xarray to get the piece needed for this worker
-        data_array = xr.DataArray(
-            data=unshaped_numpy_array.reshape(shape),
-            dims=xarray_dims,
-            coords=xarray_coordinates,
-        )
-        sliced = data_array.sel(selector_and_slice_list[0])
+            convert_chunks: bool,
+            memmap_handles: Optional[Sequence[MemmapHandle]],
+            tasks: Sequence[Tuple[
+                Sequence[Tuple[Union[int, slice], ...]], Mapping[str, Any], Optional[xr.DataArray]
+            ]],
+    ) -> List[Any]:
+        # build the numpy arrays from the shared memory objects.  unless the tasks carry the chunks
+        # of the source data, the first is the source data, and the rest are outputs.
+        if memmap_handles is not None:
+            numpy_arrays = [memmap_handle.attach() for memmap_handle in memmap_handles]
+        else:
+            numpy_arrays = [
+                np.frombuffer(backing_mp_array.get_obj(), dtype=dtype).reshape(shape)
+                for backing_mp_array, shape, dtype in SharedMemory.get_payload()
+            ]
+
+        # build the xarrays once for the batch, and then slice them to get each piece needed for
+        # this worker
+        data_arrays = [
+            xr.DataArray(
+                data=numpy_array,
+                dims=xarray_dims,
+                coords=xarray_coordinates,
+            )
+            for numpy_array in numpy_arrays
+        ]
 
-        # pass worker_callable a view into the backing array, which will be overwritten
-        return worker_callable(sliced)  # type: ignore
+        results = []
+        for slice_lists, task_kwargs, source_chunk in tasks:
+            if source_chunk is None:
+                sliced_arrays = [
+                    data_array[slice_list]
+                    for data_array, slice_list in zip(data_arrays, slice_lists)
+                ]
+            else:
+                sliced_arrays = [source_chunk] + [
+                    data_array[slice_list]
+                    for data_array, slice_list in zip(data_arrays, slice_lists[1:])
+                ]
+            sliced = sliced_arrays[0]
+            if convert_chunks and sliced.dtype != np.float32:
+                sliced = sliced.copy(data=img_as_float32(sliced.values))
+
+            # pass worker_callable views into the backing arrays, which will be overwritten
+            results.append(
+                worker_callable(sliced, *sliced_arrays[1:], **task_kwargs))  # type: ignore
+        return results
 
     @property
     def tile_metadata(self) -> pd.DataFrame:
@@ -957,7 +1473,7 @@ class ImageStack:
         Tuple[int, int, int, int, int] :
             The size of the image tensor
         """
-        return self._data.shape
+        return self._layout.shape  # type: ignore
 
     @property
     def shape(self) -> collections.OrderedDict:
@@ -974,41 +1490,41 @@ class ImageStack:
         # has a bug where this # breaks horribly.  Can't find a bug id to link to, but see
         # https://stackoverflow.com/questions/41207128/how-do-i-specify-ordereddict-k-v-types-for-\
         # mypy-type-annotation
-        result: collections.OrderedDict[Any, str] = collections.OrderedDict()
+        result: collections.OrderedDict[Any, int] = collections.OrderedDict()
         for name, data in AXES_DATA.items():
-            result[name] = self._data.shape[data.order]
-        result['y'] = self._data.shape[-2]
-        result['x'] = self._data.shape[-1]
+            result[name] = self._layout.shape[data.order]
+        result['y'] = self._layout.shape[-2]
+        result['x'] = self._layout.shape[-1]
 
         return result
 
     @property
     def num_rounds(self):
         """Return the number of rounds in the ImageStack"""
-        return self.xarray.sizes[Axes.ROUND]
+        return self._layout.sizes[Axes.ROUND]
 
     @property
     def num_chs(self):
         """Return the number of channels in the ImageStack"""
-        return self.xarray.sizes[Axes.CH]
+        return self._layout.sizes[Axes.CH]
 
     @property
     def num_zplanes(self):
         """Return the number of z_planes in the ImageStack"""
-        return self.xarray.sizes[Axes.ZPLANE]
+        return self._layout.sizes[Axes.ZPLANE]
 
     def axis_labels(self, axis: Axes) -> Sequence[int]:
         """Given an axis, return the sorted unique values for that axis in this ImageStack.  For
         instance, ``imagestack.axis_labels(Axes.ROUND)`` returns all the round ids in this
         imagestack."""
 
-        return [int(val) for val in self.xarray.coords[axis.value].values]
+        return [int(val) for val in self._layout.coords[axis.value].values]
 
     @property
     def tile_shape(self):
         """Return the shape of each tile in the ImageStack. All
         Tiles have the same shape."""
-        return self.xarray.sizes[Axes.Y], self.xarray.sizes[Axes.X]
+        return self._layout.sizes[Axes.Y], self._layout.sizes[Axes.X]
 
     def to_multipage_tiff(self, filepath: str) -> None:
         """save the ImageStack as a FIJI-compatible multi-page TIFF file
@@ -1085,15 +1601,15 @@ class ImageStack:
             }
 
             coordinates: MutableMapping[Coordinates, Union[Tuple[Number, Number], Number]] = dict()
-            x_coordinates = (float(self.xarray[Coordinates.X.value][0]),
-                             float(self.xarray[Coordinates.X.value][-1]))
-            y_coordinates = (float(self.xarray[Coordinates.Y.value][0]),
-                             float(self.xarray[Coordinates.Y.value][-1]))
+            x_coordinates = (float(self._layout[Coordinates.X.value][0]),
+                             float(self._layout[Coordinates.X.value][-1]))
+            y_coordinates = (float(self._layout[Coordinates.Y.value][0]),
+                             float(self._layout[Coordinates.Y.value][-1]))
             coordinates[Coordinates.X] = x_coordinates
             coordinates[Coordinates.Y] = y_coordinates
-            if Coordinates.Z in self.xarray.coords:
+            if Coordinates.Z in self._layout.coords:
                 # set the z coord to the calculated value from the associated z plane
-                z_coordinates = float(self.xarray[Coordinates.Z.value][zplane])
+                z_coordinates = float(self._layout[Coordinates.Z.value][zplane])
                 coordinates[Coordinates.Z] = z_coordinates
 
             tile = Tile(
@@ -1161,9 +1677,14 @@ class ImageStack:
                 physical_coords[coord] = [np.average(self._data.coords[coord.value])]
             else:
                 physical_coords[coord] = max_projection.coords[coord.value]
-        max_proj_stack = ImageStack.from_numpy(max_projection.values, coordinates=physical_coords)
+        max_proj_stack = ImageStack.from_numpy(
+            max_projection.values, coordinates=physical_coords, storage_dtype=self._layout.dtype)
         return max_proj_stack
 
     def _squeezed_numpy(self, *dims: Axes):
-        """return this ImageStack's data as a squeezed numpy array"""
-        return self.xarray.squeeze(tuple(dim.value for dim in dims)).values
+        """return this ImageStack's data as a squeezed numpy array, presented as float32 like
+        :py:meth:`get_slice`"""
+        result = self.xarray.squeeze(tuple(dim.value for dim in dims)).values
+        if result.dtype in STORAGE_DTYPES:
+            result = img_as_float32(result)
+        return result
@@ -1,7 +1,7 @@
 """
 This module parses and retains the extras metadata attached to TileSet extras.
 """
-from typing import Collection, Mapping, MutableMapping, Sequence, Tuple
+from typing import Collection, Mapping, MutableMapping, Optional, Sequence, Tuple
 
 import numpy as np
 from slicedimage import Tile, TileSet
@@ -18,6 +18,9 @@ class SlicedImageTile(TileData):
     :py:class:`slicedimage.Tile` is that this class does cache the image data upon load.  It is
     therefore incumbent on the consumers of these objects to discard them as soon as it is
     reasonable to do so to free up memory.
+
+    If the shape of the tile is known ahead of time, it can be provided as `expected_tile_shape`.
+    This allows the coordinates of the tile to be calculated without loading the image data.
     """
     def __init__(
             self,
@@ -25,11 +28,13 @@ class SlicedImageTile(TileData):
             r: int,
             ch: int,
             zplane: int,
+            expected_tile_shape: Optional[Mapping[Axes, int]]=None,
     ) -> None:
         self._wrapped_tile = wrapped_tile
         self._r = r
         self._ch = ch
         self._zplane = zplane
+        self._expected_tile_shape = expected_tile_shape
         self._numpy_array: np.ndarray = None
 
     def _load(self):
@@ -54,9 +59,10 @@ class SlicedImageTile(TileData):
     def coordinates(self) -> Mapping[Coordinates, Sequence[Number]]:
         xrange = self._wrapped_tile.coordinates[Coordinates.X]
         yrange = self._wrapped_tile.coordinates[Coordinates.Y]
+        tile_shape = self._expected_tile_shape or self.tile_shape
         return_coords = {
-            Coordinates.X: np.linspace(xrange[0], xrange[1], self.tile_shape[Axes.X]),
-            Coordinates.Y: np.linspace(yrange[0], yrange[1], self.tile_shape[Axes.Y]),
+            Coordinates.X: np.linspace(xrange[0], xrange[1], tile_shape[Axes.X]),
+            Coordinates.Y: np.linspace(yrange[0], yrange[1], tile_shape[Axes.Y]),
         }
 
         if Coordinates.Z in self._wrapped_tile.coordinates:
@@ -116,12 +122,14 @@ class TileSetData(TileCollectionData):
         return SlicedImageTile(
             self.tiles[tilekey],
             tilekey.round, tilekey.ch, tilekey.z,
+            self._tile_shape,
         )
 
     def get_tile(self, r: int, ch: int, z: int) -> TileData:
         return SlicedImageTile(
             self.tiles[TileKey(round=r, ch=ch, zplane=z)],
             r, ch, z,
+            self._tile_shape,
         )
 
 
@@ -90,7 +90,9 @@ def imagestack_factory(
         xrange: Tuple[Number, Number],
         yrange: Tuple[Number, Number],
         zrange: Tuple[Number, Number],
-        crop_parameters: Optional[CropParameters] = None) -> ImageStack:
+        crop_parameters: Optional[CropParameters] = None,
+        lazy: bool = False,
+        storage_dtype=np.float32) -> ImageStack:
     """Given a type that implements the :py:class:`LocationAwareFetchedTile` contract, produce an
     imagestack with those tiles, and apply coordinates such that the 5D tensor has coordinates
     that range from `xrange[0]:xrange[1]`, `yrange[0]:yrange[1]`, `zrange[0]:zrange[1]`.
@@ -117,6 +119,10 @@ def imagestack_factory(
         The starting and ending z physical coordinates for the tile.
     crop_parameters : Optional[CropParameters]
         The crop parameters to apply during ImageStack construction.
+    lazy : bool
+        If True, the ImageStack is lazily loaded.
+    storage_dtype :
+        The dtype the ImageStack stores its data in.
     """
     original_tile_fetcher = tile_fetcher_factory(
         fetched_tile_cls, True,
@@ -135,4 +141,5 @@ def imagestack_factory(
     )
     tileset = list(collection.all_tilesets())[0][1]
 
-    return ImageStack.from_tileset(tileset, crop_parameters)
+    return ImageStack.from_tileset(
+        tileset, crop_parameters, lazy=lazy, storage_dtype=storage_dtype)
@@ -63,7 +63,9 @@ def unique_tiles_imagestack(
         zplane_labels: Sequence[int],
         tile_height: int,
         tile_width: int,
-        crop_parameters: Optional[CropParameters] = None) -> ImageStack:
+        crop_parameters: Optional[CropParameters] = None,
+        lazy: bool = False,
+        storage_dtype=np.float32) -> ImageStack:
     """Build an imagestack with unique values per tile.
     """
     return imagestack_factory(
@@ -77,4 +79,6 @@ def unique_tiles_imagestack(
         Y_COORDS,
         Z_COORDS,
         crop_parameters,
+        lazy,
+        storage_dtype,
     )
@@ -1,8 +1,11 @@
 import copy
 
 import numpy as np
+import pytest
 import xarray as xr
+from scipy.ndimage import gaussian_filter
 
+from starfish.core.config import environ
 from starfish.core.test.factories import SyntheticData
 from starfish.core.types import Axes, Clip
 from .factories import synthetic_stack
@@ -50,6 +53,49 @@ def test_apply_in_place():
     assert np.all(image.xarray == original.xarray / 2)
 
 
+def test_apply_out_of_place():
+    """
+    test that apply writes its results to a new stack with the same coordinates and log, and leaves
+    the original data untouched
+    """
+    stack = synthetic_stack()
+    output = stack.apply(divide, value=2)
+    assert output is not stack
+    assert (stack.xarray == 1).all()
+    assert (output.xarray == 0.5).all()
+    assert not np.shares_memory(stack.xarray.values, output.xarray.values)
+    for coord in stack.xarray.coords:
+        assert np.array_equal(stack.xarray[coord], output.xarray[coord])
+    assert output.log == stack.log
+
+
+def test_apply_out_of_place_memmap():
+    """test that apply writes its results to a new memory-mapped stack"""
+    with environ(IMAGESTACK_BACKING="memmap"):
+        stack = synthetic_stack()
+    output = stack.apply(divide, value=2)
+    assert output._data.memmap_handle is not None
+    assert output._data.memmap_handle != stack._data.memmap_handle
+    assert (stack.xarray == 1).all()
+    assert (output.xarray == 0.5).all()
+
+
+@pytest.mark.parametrize("backing", ["multiprocessing", "memmap"])
+@pytest.mark.parametrize("n_processes", [1, None])
+def test_apply_to_selected_stack(backing, n_processes):
+    """test that apply can be called on a stack that was indexed with sel or isel"""
+    with environ(IMAGESTACK_BACKING=backing):
+        stack = synthetic_stack()
+    for selected in (stack.sel({Axes.ROUND: 0}), stack.isel({Axes.CH: (1, None)})):
+        output = selected.apply(divide, value=2, n_processes=n_processes)
+        assert output.xarray.shape == selected.xarray.shape
+        assert (output.xarray == 0.5).all()
+
+        selected.apply(divide, value=4, in_place=True, n_processes=n_processes)
+        assert (selected.xarray == 0.25).all()
+    assert (stack.xarray == 1).all()
+
+
 def test_apply_single_process():
     """test that apply correctly applies a simple function across 2d tiles of a Stack"""
     stack = synthetic_stack()
@@ -101,3 +147,37 @@ def test_apply_clipping_methods():
         res.sel({Axes.ROUND: 1, Axes.CH: 1}).xarray,
         imagestack.sel({Axes.ROUND: 1, Axes.CH: 1}).xarray
     )
+
+
+def blur(array, sigma):
+    return gaussian_filter(array, sigma=sigma, mode="nearest")
+
+
+@pytest.mark.parametrize("in_place", [True, False])
+@pytest.mark.parametrize("group_by", [
+    {Axes.ROUND, Axes.CH, Axes.ZPLANE},
+    {Axes.ROUND, Axes.CH},
+])
+def test_apply_blocks(in_place, group_by):
+    """test that applying a function in blocks with a sufficient halo matches applying it to each
+    component whole"""
+    data = np.random.rand(2, 2, 2, 45, 37).astype(np.float32)
+    stack = ImageStack.from_numpy(data)
+    expected = stack.apply(blur, sigma=1, group_by=group_by, n_processes=1)
+
+    result = stack.apply(
+        blur, sigma=1, group_by=group_by, in_place=in_place, n_processes=2,
+        block_shape={Axes.Y: 16, Axes.X: 10}, halo={Axes.Y: 4, Axes.X: 4},
+    )
+    assert (result is stack) == in_place
+    assert np.allclose(result.xarray.values, expected.xarray.values)
+
+
+def test_apply_blocks_invalid():
+    """test that blocks cannot be combined with per-chunk scaling or formed on non-spatial axes"""
+    stack = synthetic_stack()
+    with pytest.raises(ValueError):
+        stack.apply(
+            divide, value=2, block_shape={Axes.X: 2}, clip_method=Clip.SCALE_BY_CHUNK)
+    with pytest.raises(ValueError):
+        stack.apply(divide, value=2, block_shape={Axes.ZPLANE: 1})
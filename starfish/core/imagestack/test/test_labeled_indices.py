@@ -173,3 +173,23 @@ def test_labeled_indices_apply():
                     {Axes.ROUND: round_, Axes.CH: ch, Axes.ZPLANE: zplane},
                     expected_data(round_, ch, zplane) * 0.5,
                 )
+
+
+def _tile_sum(tile):
+    return float(tile.values.sum())
+
+
+def test_labeled_indices_transform():
+    """Build an imagestack with labeled indices (i.e., indices that do not start at 0 or are not
+    sequential non-negative integers).  Verify that transform passes each selector the tile with
+    the matching labels, whether or not the tiles are dispatched in batches.
+    """
+    stack = setup_imagestack()
+
+    for n_processes in (1, 2):
+        results = stack.transform(_tile_sum, n_processes=n_processes)
+        assert len(results) == NUM_ROUND * NUM_CH * NUM_ZPLANE
+        for tile_sum, selector in results:
+            expected = expected_data(
+                selector[Axes.ROUND], selector[Axes.CH], selector[Axes.ZPLANE])
+            assert np.isclose(tile_sum, expected.sum())
@@ -0,0 +1,172 @@
+"""
+These tests center around creating an ImageStack that defers decoding its tiles until they are
+accessed.
+"""
+import numpy as np
+import pytest
+
+from starfish.core.config import environ
+from starfish.core.types import Axes, Coordinates
+from starfish.core.util.dtype import STORAGE_DTYPES
+from .factories.unique_tiles import unique_data, unique_tiles_imagestack
+from .imagestack_test_utils import verify_stack_data
+from ..imagestack import ImageStack
+
+NUM_ROUND = 3
+NUM_CH = 4
+NUM_ZPLANE = 2
+
+ROUND_LABELS = list(range(NUM_ROUND))
+CH_LABELS = list(range(NUM_CH))
+ZPLANE_LABELS = list(range(NUM_ZPLANE))
+HEIGHT = 40
+WIDTH = 60
+
+
+def expected_data(round_: int, ch: int, zplane: int):
+    return unique_data(round_, ch, zplane, NUM_ROUND, NUM_CH, NUM_ZPLANE, HEIGHT, WIDTH)
+
+
+def setup_imagestack(lazy: bool, storage_dtype=np.float32) -> ImageStack:
+    return unique_tiles_imagestack(
+        ROUND_LABELS, CH_LABELS, ZPLANE_LABELS, HEIGHT, WIDTH, lazy=lazy,
+        storage_dtype=storage_dtype)
+
+
+def test_lazy_metadata():
+    """Verify that a lazily loaded ImageStack reports the same layout as an eagerly loaded one
+    without decoding any tiles."""
+    eager = setup_imagestack(lazy=False)
+    lazy = setup_imagestack(lazy=True)
+
+    assert lazy.is_lazy
+    assert not eager.is_lazy
+    assert lazy.raw_shape == eager.raw_shape
+    assert lazy.shape == eager.shape
+    for axis in (Axes.ROUND, Axes.CH, Axes.ZPLANE):
+        assert lazy.axis_labels(axis) == eager.axis_labels(axis)
+    assert len(lazy._tile_cache) == 0
+
+
+def test_lazy_get_slice():
+    """Verify that get_slice on a lazily loaded ImageStack returns the correct data and only
+    decodes the tiles that are touched."""
+    stack = setup_imagestack(lazy=True)
+
+    verify_stack_data(
+        stack,
+        {Axes.ROUND: 1, Axes.CH: 2, Axes.ZPLANE: 0},
+        expected_data(1, 2, 0),
+    )
+    assert len(stack._tile_cache) == 1
+
+    data, axes = stack.get_slice({Axes.ROUND: 2, Axes.ZPLANE: 1})
+    assert axes == [Axes.CH]
+    for ch in CH_LABELS:
+        assert np.array_equal(data[ch], expected_data(2, ch, 1))
+    assert stack.is_lazy
+
+
+@pytest.mark.parametrize("storage_dtype", STORAGE_DTYPES)
+def test_lazy_storage_dtype(storage_dtype):
+    """Verify that a lazily loaded ImageStack presents the same values as an eagerly loaded one,
+    both before and after it is materialized, regardless of its storage dtype."""
+    eager = setup_imagestack(lazy=False, storage_dtype=storage_dtype)
+    lazy = setup_imagestack(lazy=True, storage_dtype=storage_dtype)
+
+    selector = {Axes.ROUND: 1, Axes.CH: 1, Axes.ZPLANE: 0}
+    assert np.array_equal(lazy.get_slice(selector)[0], eager.get_slice(selector)[0])
+    lazy_values, _ = lazy.get_slice({})
+    assert lazy.is_lazy
+
+    assert lazy.xarray.dtype == storage_dtype
+    assert not lazy.is_lazy
+    assert np.array_equal(lazy_values, eager.get_slice({})[0])
+    assert np.array_equal(lazy.get_slice(selector)[0], eager.get_slice(selector)[0])
+
+
+def test_lazy_resident_tiles_bounded():
+    """Verify that the number of decoded tiles kept in memory is bounded by the configuration."""
+    with environ(IMAGESTACK_MAX_RESIDENT_TILES="2"):
+        stack = setup_imagestack(lazy=True)
+
+    for round_ in ROUND_LABELS:
+        verify_stack_data(
+            stack,
+            {Axes.ROUND: round_, Axes.CH: 0, Axes.ZPLANE: 0},
+            expected_data(round_, 0, 0),
+        )
+    assert len(stack._tile_cache) == 2
+
+
+def test_lazy_sel():
+    """Verify that indexing a lazily loaded ImageStack produces a lazily loaded ImageStack with the
+    same data and coordinates as indexing an eagerly loaded ImageStack."""
+    eager = setup_imagestack(lazy=False)
+    lazy = setup_imagestack(lazy=True)
+
+    indexers = {Axes.ROUND: (1, None), Axes.CH: 3, Axes.Y: (5, 20), Axes.X: 7}
+    eager_selected = eager.sel(indexers)
+    lazy_selected = lazy.sel(indexers)
+    assert lazy_selected.is_lazy
+    assert lazy.is_lazy
+    assert lazy_selected.raw_shape == eager_selected.raw_shape
+
+    positional_indexers = {Axes.ZPLANE: 1, Axes.Y: (None, 10)}
+    eager_iselected = eager.isel(positional_indexers)
+    lazy_iselected = lazy.isel(positional_indexers)
+    assert lazy_iselected.raw_shape == eager_iselected.raw_shape
+
+    for eager_stack, lazy_stack in (
+            (eager_selected, lazy_selected), (eager_iselected, lazy_iselected)):
+        assert np.array_equal(lazy_stack.xarray.values, eager_stack.xarray.values)
+        for coord in (Coordinates.X, Coordinates.Y, Coordinates.Z):
+            assert np.allclose(
+                lazy_stack.xarray[coord.value], eager_stack.xarray[coord.value])
+
+
+def test_lazy_materialize():
+    """Verify that operations requiring the entire image tensor load all the tiles."""
+    eager = setup_imagestack(lazy=False)
+    lazy = setup_imagestack(lazy=True)
+
+    # touch one tile first so that materialization mixes resident and newly decoded tiles.
+    lazy.get_slice({Axes.ROUND: 0, Axes.CH: 0, Axes.ZPLANE: 0})
+
+    result = lazy.apply(lambda tile: tile / 2, n_processes=1)
+    assert lazy.is_lazy
+    assert not result.is_lazy
+    assert np.allclose(result.xarray.values, eager.xarray.values / 2)
+
+    assert np.array_equal(lazy.xarray.values, eager.xarray.values)
+    assert not lazy.is_lazy
+    for coord in (Coordinates.X, Coordinates.Y, Coordinates.Z):
+        assert np.allclose(lazy.xarray[coord.value], eager.xarray[coord.value])
+
+
+def test_parallel_load():
+    """Verify that decoding tiles on multiple threads produces the same data as decoding them on a
+    single thread, both when loading eagerly and when materializing a lazily loaded ImageStack."""
+    with environ(IMAGESTACK_LOADER_THREADS="1"):
+        expected = setup_imagestack(lazy=False)
+    with environ(IMAGESTACK_LOADER_THREADS="4"):
+        eager = setup_imagestack(lazy=False)
+        lazy = setup_imagestack(lazy=True)
+        lazy_values = lazy.xarray.values
+
+    assert np.array_equal(eager.xarray.values, expected.xarray.values)
+    assert np.array_equal(lazy_values, expected.xarray.values)
+    assert np.allclose(
+        eager.xarray[Coordinates.Z.value], expected.xarray[Coordinates.Z.value])
+
+
+def test_lazy_apply_in_blocks():
+    """Verify that applying a function in spatial blocks to a lazily loaded ImageStack reads the
+    blocks through the tile cache without loading the ImageStack."""
+    eager = setup_imagestack(lazy=False)
+    lazy = setup_imagestack(lazy=True)
+
+    result = lazy.apply(
+        lambda tile: tile / 2, n_processes=1, block_shape={Axes.Y: 15, Axes.X: 25})
+    assert lazy.is_lazy
+    assert np.allclose(result.xarray.values, eager.xarray.values / 2)
@@ -0,0 +1,96 @@
+"""
+These tests verify that ImageStacks can store their data in a dtype other than float32, while still
+presenting float32 data to consumers.
+"""
+import numpy as np
+import pytest
+from skimage import img_as_float32, img_as_uint
+
+from starfish.core.types import Axes, Clip
+from ..imagestack import ImageStack
+
+NUM_ROUND = 2
+NUM_CH = 3
+NUM_ZPLANE = 2
+HEIGHT = 10
+WIDTH = 12
+
+
+def uint16_data() -> np.ndarray:
+    return np.random.randint(
+        0, np.iinfo(np.uint16).max, size=(NUM_ROUND, NUM_CH, NUM_ZPLANE, HEIGHT, WIDTH),
+        dtype=np.uint16)
+
+
+@pytest.mark.parametrize("storage_dtype", [np.uint16, np.float16])
+def test_storage_dtype(storage_dtype):
+    """Verify that the data is stored in the requested dtype and presented as float32."""
+    data = uint16_data()
+    stack = ImageStack.from_numpy(data, storage_dtype=storage_dtype)
+    assert stack.xarray.dtype == storage_dtype
+
+    tile, _ = stack.get_slice({Axes.ROUND: 1, Axes.CH: 2, Axes.ZPLANE: 0})
+    assert tile.dtype == np.float32
+    assert np.allclose(tile, img_as_float32(data[1, 2, 0]), atol=1e-3)
+
+
+def test_uint16_storage_is_lossless():
+    """Loading uint16 data into uint16 storage should not modify the data."""
+    data = uint16_data()
+    stack = ImageStack.from_numpy(data, storage_dtype=np.uint16)
+    assert np.array_equal(stack.xarray.values, data)
+
+
+def test_set_slice():
+    """Verify that set_slice accepts float32 data and data of the storage dtype."""
+    stack = ImageStack.from_numpy(uint16_data(), storage_dtype=np.uint16)
+
+    float_tile = np.full((HEIGHT, WIDTH), 0.5, dtype=np.float32)
+    stack.set_slice({Axes.ROUND: 0, Axes.CH: 0, Axes.ZPLANE: 0}, float_tile)
+    assert np.all(stack.xarray[0, 0, 0].values == img_as_uint(float_tile))
+
+    uint_tile = np.full((HEIGHT, WIDTH), 7, dtype=np.uint16)
+    stack.set_slice({Axes.ROUND: 0, Axes.CH: 0, Axes.ZPLANE: 1}, uint_tile)
+    assert np.all(stack.xarray[0, 0, 1].values == 7)
+
+    with pytest.raises(TypeError):
+        stack.set_slice(
+            {Axes.ROUND: 0, Axes.CH: 0, Axes.ZPLANE: 1}, uint_tile.astype(np.uint8))
+
+
+def divide(array, value):
+    assert array.dtype == np.float32
+    return array / value
+
+
+def test_apply():
+    """Verify that apply passes float32 chunks to the function and stores the results in the
+    storage dtype."""
+    data = uint16_data()
+    stack = ImageStack.from_numpy(data, storage_dtype=np.uint16)
+    expected = img_as_float32(data) / 2
+
+    output = stack.apply(divide, value=2, n_processes=1)
+    assert output.xarray.dtype == np.uint16
+    assert np.allclose(img_as_float32(output.xarray.values), expected, atol=1e-4)
+
+    stack.apply(divide, value=2, in_place=True, group_by={Axes.ROUND, Axes.CH})
+    assert stack.xarray.dtype == np.uint16
+    assert np.allclose(img_as_float32(stack.xarray.values), expected, atol=1e-4)
+
+    with pytest.raises(ValueError):
+        stack.apply(divide, value=2, clip_method=Clip.SCALE_BY_IMAGE)
+
+
+def test_transform():
+    """Verify that transform passes float32 chunks to the function."""
+    data = uint16_data()
+    stack = ImageStack.from_numpy(data, storage_dtype=np.uint16)
+
+    results = stack.transform(lambda array: array.dtype, n_processes=1)
+    assert all(dtype == np.float32 for dtype, _ in results)
+
+
+def test_unsupported_storage_dtype():
+    with pytest.raises(TypeError):
+        ImageStack.from_numpy(uint16_data(), storage_dtype=np.int32)
@@ -1,10 +1,10 @@
-from itertools import product
 from json import loads
 from typing import Dict, List, Optional, Sequence, Union
 
 import numpy as np
 import pandas as pd
 import xarray as xr
+from skimage import img_as_float32
 
 from starfish.core.expression_matrix.expression_matrix import ExpressionMatrix
 from starfish.core.types import (
@@ -17,7 +17,7 @@ from starfish.core.types import (
     SpotAttributes,
     STARFISH_EXTRAS_KEY
 )
-from starfish.core.util.dtype import preserve_float_range
+from starfish.core.util.dtype import preserve_float_range, STORAGE_DTYPES
 from .overlap import (
     find_overlaps_of_xarrays,
     OVERLAP_STRATEGY_MAP,
@@ -402,39 +402,35 @@ class IntensityTable(xr.DataArray):
                                          Axes.Y: (ymin, ymax),
                                          Axes.X: (xmin, xmax)})
 
-        data = cropped_stack.xarray.transpose(
-            Axes.ZPLANE.value,
-            Axes.Y.value,
-            Axes.X.value,
-            Axes.CH.value,
-            Axes.ROUND.value,
-        )
-
-        # (pixels, ch, round)
-        intensity_data = data.values.reshape(
+        data = cropped_stack.xarray
+        # a (z, y, x, ch, round) view of the data, which is copied once into (pixels, ch, round).
+        transposed_axes = [
+            data.dims.index(axis.value)
+            for axis in (Axes.ZPLANE, Axes.Y, Axes.X, Axes.CH, Axes.ROUND)
+        ]
+        intensity_data = np.transpose(data.values, transposed_axes).reshape(
             -1, image_stack.num_chs, image_stack.num_rounds)
+        if intensity_data.dtype in STORAGE_DTYPES:
+            # ImageStacks that store their data in a native dtype present it as float32.
+            intensity_data = img_as_float32(intensity_data)
+
+        # IntensityTable pixel coordinates, in the same order as the pixels
+        z_labels = np.asarray(cropped_stack.axis_labels(Axes.ZPLANE))
+        z, y, x = np.indices((len(z_labels), ymax - ymin, xmax - xmin)).reshape(3, -1)
+        n_pixels = intensity_data.shape[0]
+
+        coords = {
+            Axes.ZPLANE.value: (Features.AXIS, z_labels[z]),
+            Axes.Y.value: (Features.AXIS, y + ymin),
+            Axes.X.value: (Features.AXIS, x + xmin),
+            Features.SPOT_RADIUS: (Features.AXIS, np.full(n_pixels, fill_value=0.5)),
+            Features.AXIS: np.arange(n_pixels),
+            Axes.CH.value: np.array(image_stack.axis_labels(Axes.CH)),
+            Axes.ROUND.value: np.array(image_stack.axis_labels(Axes.ROUND)),
+        }
+        dims = (Features.AXIS, Axes.CH.value, Axes.ROUND.value)
 
-        # IntensityTable pixel coordinates
-        z = image_stack.axis_labels(Axes.ZPLANE)
-        y = np.arange(ymin, ymax)
-        x = np.arange(xmin, xmax)
-
-        feature_attribute_data = pd.DataFrame(
-            data=np.array(list(product(z, y, x))),
-            columns=['z', 'y', 'x']
-        )
-        feature_attribute_data[Features.SPOT_RADIUS] = np.full(
-            feature_attribute_data.shape[0], fill_value=0.5
-        )
-
-        pixel_coordinates = SpotAttributes(feature_attribute_data)
-
-        return IntensityTable.from_spot_data(
-            intensity_data,
-            pixel_coordinates,
-            image_stack.axis_labels(Axes.CH),
-            image_stack.axis_labels(Axes.ROUND),
-        )
+        return cls(intensity_data, coords, dims)
 
     @staticmethod
     def _process_overlaps(
@@ -3,6 +3,7 @@ Tests for IntensityTable.from_image_stack method
 """
 
 import numpy as np
+from skimage import img_as_float32
 
 from starfish import ImageStack
 from starfish.core.imagestack.test import test_labeled_indices
@@ -10,7 +11,7 @@ from starfish.core.test.factories import (
     codebook_intensities_image_for_single_synthetic_spot,
     synthetic_spot_pass_through_stack,
 )
-from starfish.core.types import Axes
+from starfish.core.types import Axes, Features
 from ..intensity_table import IntensityTable
 
 
@@ -66,3 +67,21 @@ def test_from_imagestack_labeled_indices():
         intensity_table[Axes.CH.value], np.array(test_labeled_indices.CH_LABELS))
     assert np.array_equal(
         intensity_table[Axes.ROUND.value], np.array(test_labeled_indices.ROUND_LABELS))
+
+
+def test_pixel_coordinates_match_intensities():
+    """
+    Every feature's coordinates should locate the pixel whose trace it holds, including when the
+    ImageStack is cropped and when it stores its data as uint16.
+    """
+    r, c, z, y, x = 2, 3, 4, 5, 6
+    data = np.random.randint(0, 1000, size=(r, c, z, y, x)).astype(np.uint16)
+    image_stack = ImageStack.from_numpy(data, storage_dtype=np.uint16)
+    intensities = IntensityTable.from_image_stack(image_stack, crop_z=1, crop_y=1)
+
+    assert intensities.sizes[Features.AXIS] == (z - 2) * (y - 2) * x
+    assert intensities.dtype == np.float32
+    zs, ys, xs = (
+        intensities[axis.value].values for axis in (Axes.ZPLANE, Axes.Y, Axes.X))
+    expected = img_as_float32(data)[:, :, zs, ys, xs].transpose(2, 1, 0)
+    assert np.array_equal(intensities.values, expected)
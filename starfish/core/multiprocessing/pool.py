@@ -1,11 +1,17 @@
+import atexit
+import multiprocessing
 import multiprocessing.pool as mp
 import os
-from typing import Callable, Iterable, Optional
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional
+
+from starfish.core.config import StarfishConfig
 
 
 class Pool:
-    """Wrapper class for multiprocessing pool. If n_processes=1 just use map on main
-    thread for debugging purposes """
+    """Wrapper class for multiprocessing pool. If n_processes=1, or the pool is created within
+    :py:func:`single_process_pools`, just use map on the calling thread."""
 
     def __init__(
             self,
@@ -15,29 +21,141 @@ class Pool:
             *args, **kwargs):
         self.initializer = initializer
         self.initargs = initargs or []
-        if processes == 1 or os.name == "nt":
+        self._owns_pool = True
+        if processes == 1 or os.name == "nt" or _single_process.enabled:
             self.pool = None
         else:
             self.pool = mp.Pool(processes, self.initializer, self.initargs, *args, **kwargs)
 
-    def map(self, func, iterable, chunksize=None):
+    @classmethod
+    def shared(cls, processes: Optional[int]=None) -> "Pool":
+        """Returns a Pool that uses the process-wide persistent pool, if it is enabled by the
+        ``multiprocessing.persistent_pool`` configuration value and `processes` matches its size.
+        Otherwise, returns a new Pool with `processes` workers.
+
+        The persistent pool is created on first use, and its workers are reused across calls until
+        :py:func:`shutdown_shared_pool` is called.  Because the workers outlive any one call, they
+        cannot be handed per-call state through an initializer.  For this reason, ImageStack
+        operations only use the persistent pool when their data is backed by memory-mapped files
+        (``imagestack.backing`` is ``memmap``), and start a new pool for every call otherwise.
+        Exiting the context of a shared Pool does not terminate the persistent pool.
+
+        The persistent pool may be requested from multiple threads; it is created only once.
+        Within :py:func:`single_process_pools`, the persistent pool is used only if it has already
+        been started.
+
+        The workers of the persistent pool are started from a fresh server process ("forkserver",
+        or "spawn" where that is unavailable) rather than forked from the calling process.  Forked
+        workers would inherit the memory-mapped buffers that exist when the pool is started, and
+        keep their memory mapped until the pool is shut down.  Functions submitted to the
+        persistent pool must therefore be importable by the workers.
+        """
+        config = StarfishConfig()
+        if (
+                not config.persistent_pool
+                or processes == 1
+                or os.name == "nt"
+                or (processes is not None and processes != config.pool_processes)
+        ):
+            return cls(processes=processes)
+
+        persistent_pool = _get_persistent_pool(config.pool_processes)
+        if persistent_pool is None:
+            return cls(processes=1)
+
+        # start without a pool of its own, then attach the persistent one.
+        pool = cls(processes=1)
+        pool.pool = persistent_pool
+        pool._owns_pool = False
+        return pool
+
+    @property
+    def processes(self) -> int:
+        """The number of processes that run tasks submitted to this pool."""
         if self.pool is None:
+            return 1
+        return self.pool._processes  # type: ignore
+
+    def _initialize(self):
+        if self.initializer is not None:
             self.initializer(*self.initargs)
+
+    def map(self, func, iterable, chunksize=None):
+        if self.pool is None:
+            self._initialize()
             return map(func, iterable)
         return self.pool.map(func, iterable, chunksize)
 
     def imap(self, func, iterable, chunksize=1):
         if self.pool is None:
-            self.initializer(*self.initargs)
+            self._initialize()
             return map(func, iterable)
         return self.pool.imap(func, iterable, chunksize)
 
     def __enter__(self, *args, **kwargs):
-        if self.pool is None:
+        if self.pool is None or not self._owns_pool:
             return self
         return self.pool.__enter__(*args, **kwargs)
 
     def __exit__(self, *args, **kwargs):
-        if self.pool is None:
+        if self.pool is None or not self._owns_pool:
             return None
         return self.pool.__exit__(*args, **kwargs)
+
+
+_persistent_pool: Optional[mp.Pool] = None
+_persistent_pool_pid: Optional[int] = None
+_persistent_pool_lock = threading.Lock()
+
+
+class _SingleProcessState(threading.local):
+    enabled = False
+
+
+_single_process = _SingleProcessState()
+
+
+@contextmanager
+def single_process_pools() -> Iterator[None]:
+    """Within this context, Pools created by the current thread run their tasks on the calling
+    thread instead of starting worker processes, and the persistent pool is not started.  Use this
+    on threads other than the main thread, as forking a process that is running other threads can
+    deadlock the child."""
+    previous = _single_process.enabled
+    _single_process.enabled = True
+    try:
+        yield
+    finally:
+        _single_process.enabled = previous
+
+
+def _get_persistent_pool(processes: Optional[int]) -> Optional[mp.Pool]:
+    global _persistent_pool, _persistent_pool_pid
+    with _persistent_pool_lock:
+        # a pool inherited across a fork belongs to the parent process, and cannot be used here.
+        if _persistent_pool is None or _persistent_pool_pid != os.getpid():
+            if _single_process.enabled:
+                return None
+            _persistent_pool = _persistent_pool_context().Pool(processes)
+            _persistent_pool_pid = os.getpid()
+        return _persistent_pool
+
+
+def _persistent_pool_context():
+    # workers started by the fork server do not inherit the mappings of the calling process.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+@atexit.register
+def shutdown_shared_pool() -> None:
+    """Terminates the process-wide persistent pool, if one was started.  A new one is started the
+    next time a shared Pool is requested."""
+    global _persistent_pool, _persistent_pool_pid
+    with _persistent_pool_lock:
+        if _persistent_pool is not None and _persistent_pool_pid == os.getpid():
+            _persistent_pool.terminate()
+            _persistent_pool.join()
+        _persistent_pool = None
+        _persistent_pool_pid = None
@@ -25,17 +25,25 @@ example of how this might be used would be:
   data = range(10)
   with multiprocessing.Pool(initializer=SharedMemory.initalizer, initargs=(array,)) as pool:
     pool.map(worker, data)
+
+The payload is stored per thread, so that pools that run their tasks on the calling thread (see
+starfish.core.multiprocessing.pool.Pool) can be used by several threads at once.
 """
+import threading
 from typing import Any
 
 
+class _Payload(threading.local):
+    value: Any = None
+
+
 class SharedMemory:
-    _payload = None
+    _payload = _Payload()
 
     @staticmethod
     def initializer(payload: Any) -> None:
-        SharedMemory._payload = payload
+        SharedMemory._payload.value = payload
 
     @staticmethod
     def get_payload() -> Any:
-        return SharedMemory._payload
+        return SharedMemory._payload.value
@@ -7,7 +7,9 @@ maintained.
 import copy
 import ctypes
 import multiprocessing
+import os
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 # Even though we import multiprocessing, mypy can't find the Array class.  To avoid sprinkling
 # ignore markers all over the file, we explicitly import the symbol and put the ignore marker here.
@@ -15,10 +17,13 @@ from multiprocessing import Array as mp_array  # type: ignore
 from typing import Any, Callable, Tuple
 
 import numpy as np
+import pytest
 import xarray as xr
 
 from starfish import ImageStack
+from starfish.core.config import environ
 from starfish.core.imagestack import _mp_dataarray
+from ..pool import Pool, shutdown_shared_pool
 from ..shmem import SharedMemory
 
 
@@ -129,7 +134,7 @@ def test_imagestack_deepcopy(nitems: int=10) -> None:
     imagestack = ImageStack.from_numpy(source)
     imagestack_copy = copy.deepcopy(imagestack)
     _start_process_to_test_shmem(
-        array_holder=imagestack_copy._data._backing_mp_array,
+        array_holder=imagestack_copy._data._backing,
         decoder=partial(_decode_imagestack_array_to_numpy_array, shape, dtype),
         nitems=nitems)
     for ix in range(nitems):
@@ -143,6 +148,29 @@ def _decode_imagestack_array_to_numpy_array(
     return unshaped_np_array.reshape(shape)
 
 
+def test_imagestack_memmap_backing(nitems: int=10) -> None:
+    """
+    Instantiate an :py:class:`ImageStack` backed by a memory-mapped buffer and deepcopy it.  Worker
+    processes attach to the copy's buffer by name and write to it.  Writes in the worker process
+    should be visible in the parent process in the copy but not the original.
+    """
+    shape = (nitems, 3, 4, 5, 6)
+    source = np.zeros(shape, dtype=np.float32)
+    with environ(IMAGESTACK_BACKING="memmap"):
+        imagestack = ImageStack.from_numpy(source)
+    imagestack_copy = copy.deepcopy(imagestack)
+    memmap_handle = imagestack_copy._data.memmap_handle
+    assert memmap_handle is not None
+    assert memmap_handle != imagestack._data.memmap_handle
+    _start_process_to_test_shmem(
+        array_holder=memmap_handle,
+        decoder=_mp_dataarray.MemmapHandle.attach,
+        nitems=nitems)
+    for ix in range(nitems):
+        assert (imagestack.xarray[ix] == 0).all()
+        assert np.allclose(imagestack_copy.xarray[ix], ix)
+
+
 def test_imagestack_xarray_deepcopy(nitems: int=10) -> None:
     """
     Instantiate an :py:class:`ImageStack` and deepcopy the xarray directly.  This should work, but
@@ -200,3 +228,102 @@ def _start_process_to_test_shmem(
     with multiprocessing.Pool(
             initializer=SharedMemory.initializer, initargs=(array_holder,)) as pool:
         pool.map(bound_func, vals)
+
+
+def _worker_pid(_: int) -> int:
+    return os.getpid()
+
+
+def test_persistent_pool() -> None:
+    """
+    Request the shared pool twice with the persistent pool enabled.  The same worker processes
+    should serve both calls until the pool is shut down.
+    """
+    with environ(MULTIPROCESSING_PERSISTENT_POOL="true", MULTIPROCESSING_PROCESSES="2"):
+        try:
+            with Pool.shared() as pool:
+                first_pids = set(pool.map(_worker_pid, range(20)))
+            with Pool.shared(processes=2) as pool:
+                second_pids = set(pool.map(_worker_pid, range(20)))
+            assert os.getpid() not in first_pids
+            assert first_pids | second_pids <= set(
+                process.pid for process in pool.pool._pool)  # type: ignore
+        finally:
+            shutdown_shared_pool()
+
+        with Pool.shared() as pool:
+            third_pids = set(pool.map(_worker_pid, range(20)))
+        shutdown_shared_pool()
+    assert third_pids.isdisjoint(first_pids | second_pids)
+
+
+def test_persistent_pool_from_threads() -> None:
+    """
+    Request the shared pool from several threads at once.  Only one persistent pool should be
+    created.
+    """
+    with environ(MULTIPROCESSING_PERSISTENT_POOL="true", MULTIPROCESSING_PROCESSES="2"):
+        try:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                pools = list(executor.map(lambda _: Pool.shared().pool, range(8)))
+            assert all(pool is pools[0] for pool in pools)
+        finally:
+            shutdown_shared_pool()
+
+
+def _sum_memmap(memmap_handle: _mp_dataarray.MemmapHandle) -> float:
+    return float(memmap_handle.attach().sum())
+
+
+def _maps_file(path: str) -> bool:
+    with open(f"/proc/{os.getpid()}/maps") as maps:
+        return path in maps.read()
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="requires /proc/<pid>/maps")
+def test_memmap_not_retained_by_workers() -> None:
+    """
+    Attach to a memory-mapped buffer from the workers of the persistent pool.  Once the tasks
+    finish, the workers should no longer map the buffer, so that it is freed when released by the
+    parent process.  The buffer is created after the workers are started, so they cannot inherit
+    its mapping from the parent process.
+    """
+    with environ(MULTIPROCESSING_PERSISTENT_POOL="true", MULTIPROCESSING_PROCESSES="2"):
+        try:
+            with Pool.shared() as pool:
+                pool.map(_worker_pid, range(8))
+                buffer = _mp_dataarray.MemmapBuffer((10, 10), np.float32)
+                assert not any(pool.map(_maps_file, [buffer.handle.path] * 8))
+                assert pool.map(_sum_memmap, [buffer.handle] * 8) == [0.0] * 8
+                assert not any(pool.map(_maps_file, [buffer.handle.path] * 8))
+        finally:
+            shutdown_shared_pool()
+
+
+def _halve(array: np.ndarray) -> np.ndarray:
+    return array / 2
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="requires /proc/<pid>/maps")
+def test_persistent_pool_started_by_apply() -> None:
+    """
+    Create a memory-mapped ImageStack, then start the persistent pool by applying a function to it.
+    The workers should not inherit the mapping of the ImageStack, which existed before they were
+    started, so that its memory is freed when the ImageStack is released.
+    """
+    with environ(
+            IMAGESTACK_BACKING="memmap",
+            MULTIPROCESSING_PERSISTENT_POOL="true",
+            MULTIPROCESSING_PROCESSES="2"):
+        try:
+            stack = ImageStack.from_numpy(np.ones((2, 2, 2, 10, 10), dtype=np.float32))
+            output = stack.apply(_halve)
+            assert np.allclose(output.xarray, 0.5)
+
+            stack_handle, output_handle = stack._data.memmap_handle, output._data.memmap_handle
+            assert stack_handle is not None and output_handle is not None
+            paths = [stack_handle.path, output_handle.path]
+            with Pool.shared() as pool:
+                assert not any(pool.map(_maps_file, paths * 4))
+        finally:
+            shutdown_shared_pool()
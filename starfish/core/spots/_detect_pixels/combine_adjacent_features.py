@@ -1,15 +1,12 @@
-from functools import partial
-from typing import Dict, List, NamedTuple, Optional, Tuple
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import pandas as pd
+import xarray as xr
+from scipy.sparse import csr_matrix
 from skimage.measure import label, regionprops
-from skimage.measure._regionprops import _RegionProperties
-from tqdm import tqdm
 
-from starfish.core.config import StarfishConfig
 from starfish.core.intensity_table.intensity_table import IntensityTable
-from starfish.core.multiprocessing.pool import Pool
 from starfish.core.types import Axes, Features, Number, SpotAttributes
 
 
@@ -26,17 +23,20 @@ class TargetsMap:
         Creates an invertible mapping between string names of Codebook targets and integer IDs
         that can be interpreted by skimage.measure to decode an image.
 
+        The mapping is backed by an array of the sorted targets, indexed by integer ID, and a hash
+        index over that array, so that encoding and decoding arrays of targets are each a single
+        vectorized operation.
+
         Parameters
         ----------
         targets : np.ndarray
             array of string target IDs
 
         """
-        unique_targets = set(targets) - {'nan'}
-        sorted_targets = sorted(unique_targets)
-        self._int_to_target = dict(zip(range(1, np.iinfo(np.int).max), sorted_targets))
-        self._int_to_target[0] = 'nan'
-        self._target_to_int = {v: k for (k, v) in self._int_to_target.items()}
+        unique_targets = pd.unique(np.asarray(targets, dtype=object))
+        sorted_targets = np.sort(unique_targets[unique_targets != 'nan'])
+        self._int_to_target = np.concatenate([np.array(['nan'], dtype=object), sorted_targets])
+        self._target_to_int = pd.Index(self._int_to_target)
 
     def targets_as_int(self, targets: np.ndarray) -> np.ndarray:
         """Transform an array of targets into their integer representation.
@@ -52,7 +52,10 @@ class TargetsMap:
             array of targets represented by their integer IDs
 
         """
-        return np.array([self._target_to_int[v] for v in targets])
+        int_targets = self._target_to_int.get_indexer(np.asarray(targets, dtype=object))
+        if np.any(int_targets == -1):
+            raise KeyError(np.asarray(targets)[int_targets == -1][0])
+        return int_targets
 
     def targets_as_str(self, targets: np.ndarray) -> np.ndarray:
         """Transform an array of integer IDs into their corresponding string target names.
@@ -64,11 +67,11 @@ class TargetsMap:
 
         Returns
         -------
-        np.ndarray['U']
-            array of unicode-encoded target names
+        np.ndarray
+            array of target names
 
         """
-        return np.array([self._int_to_target[v] for v in targets])
+        return self._int_to_target[np.asarray(targets)]
 
     def target_as_str(self, integer_target: int) -> np.ndarray:
         return self._int_to_target[integer_target]
@@ -149,7 +152,7 @@ class CombineAdjacentFeatures:
     def _calculate_mean_pixel_traces(
             label_image: np.ndarray,
             intensities: IntensityTable,
-    ) -> IntensityTable:
+    ) -> xr.DataArray:
         """
         For all pixels that contribute to a connected component, calculate the mean value for
         each (ch, round), producing an average "trace" of a feature across the imaging experiment
@@ -163,140 +166,109 @@ class CombineAdjacentFeatures:
 
         Returns
         -------
-        IntensityTable :
-            an IntensityTable where the number of features equals the number of connected components
+        xr.DataArray :
+            an array where the number of features equals the number of connected components
             and the intensities of each each feature is its mean trace.
 
         """
-
-        import xarray as xr
+        # only the pixels that belong to a connected component are read.  the background, label 0,
+        # is never copied.
         pixel_labels = label_image.reshape(-1)
-
-        # Use a pandas groupby approach-based approach, because it is much faster than xarray
-
-        # If needed, it is possible to be even faster than pandas:
-        # https://stackoverflow.com/questions/51975512/\
-        # faster-alternative-to-perform-pandas-groupby-operation
-
-        # stack intensities
-        stacked = intensities.stack(traces=(Axes.CH.value, Axes.ROUND.value))
-
-        # drop into pandas to use their faster groupby
-        traces: pd.DataFrame = pd.DataFrame(
-            stacked.values,
-            index=pixel_labels,
-            columns=stacked.traces.to_index()
-        )
-
-        #
-        distances: pd.Series = pd.Series(
-            stacked[Features.DISTANCE].values, index=pixel_labels
+        labeled = np.flatnonzero(pixel_labels)
+
+        traces = intensities.transpose(Features.AXIS, Axes.CH.value, Axes.ROUND.value).values
+        traces = traces.reshape(traces.shape[0], -1)[labeled]
+
+        return CombineAdjacentFeatures._mean_traces_by_label(
+            pixel_labels[labeled],
+            traces,
+            intensities[Features.DISTANCE].values[labeled],
+            int(label_image.max()),
+            intensities[Axes.CH.value].values,
+            intensities[Axes.ROUND.value].values,
         )
 
-        grouped = traces.groupby(level=0)
-        pd_mean_pixel_traces = grouped.mean()
-
-        grouped = distances.groupby(level=0)
-        pd_mean_distances = grouped.mean()
-
-        pd_xarray = xr.DataArray(
-            pd_mean_pixel_traces,
-            dims=(Features.AXIS, 'traces'),
-            coords=dict(
-                traces=('traces', pd_mean_pixel_traces.columns),
-                distance=(Features.AXIS, pd_mean_distances),
-                features=(Features.AXIS, pd_mean_pixel_traces.index)
-            )
-        )
-        mean_pixel_traces = pd_xarray.unstack('traces')
-
-        # the 0th pixel trace corresponds to background. If present, drop it.
-        try:
-            mean_pixel_traces = mean_pixel_traces.drop(0, dim=Features.AXIS)
-        except KeyError:
-            pass
-
-        return mean_pixel_traces
-
     @staticmethod
-    def _single_spot_attributes(
-            spot_property: _RegionProperties,
-            decoded_image: np.ndarray,
-            target_map: TargetsMap,
-            min_area: Number,
-            max_area: Number,
-    ) -> Tuple[Dict[str, int], int]:
+    def _mean_traces_by_label(
+            labels: np.ndarray,
+            traces: np.ndarray,
+            distances: np.ndarray,
+            n_labels: int,
+            channel_index: Union[Sequence, np.ndarray],
+            round_index: Union[Sequence, np.ndarray],
+    ) -> xr.DataArray:
         """
-        Calculate starfish SpotAttributes from the RegionProperties of a connected component
-        feature.
+        Calculate the mean trace and distance of each connected component from the traces of only
+        the pixels that belong to a component.
 
         Parameters
         ----------
-        spot_property: _RegionProperties
-            Properties of the connected component. Output of skimage.measure.regionprops
-        decoded_image : np.ndarray
-            Image whose pixels correspond to the targets that the given position in the ImageStack
-            decodes to.
-        target_map : TargetsMap
-            Unique mapping between string target names and int target IDs.
-        min_area :
-            Combined features with area below this value are marked as failing filters
-        max_area : Number
-            Combined features with area above this value are marked as failing filters
+        labels : np.ndarray
+            1 dimensional array of the (non-zero) label of each pixel
+        traces : np.ndarray
+            array of shape (n_pixels, n_channel * n_round) containing the trace of each pixel,
+            linearized with rounds varying fastest
+        distances : np.ndarray
+            1 dimensional array of the distance of each pixel to its nearest code
+        n_labels : int
+            the largest label.  Labels that contain no pixels are omitted from the result.
+        channel_index : Sequence
+            the channel labels of the traces
+        round_index : Sequence
+            the round labels of the traces
 
         Returns
         -------
-        Dict[str, Number] :
-            spot attribute dictionary for this connected component, containing the x, y, z position,
-            target name (str) and feature radius.
-        int :
-            1 if spot passes size filters, zero otherwise.
+        xr.DataArray :
+            an array of shape (n_labels, n_channel, n_round) containing the mean trace of each
+            connected component, indexed by label along the features axis.
 
         """
-        # because of the above skimage issue, we need to support both 2d and 3d properties
-        if len(spot_property.centroid) == 3:
-            spot_attrs = {
-                'z': int(spot_property.centroid[0]),
-                'y': int(spot_property.centroid[1]),
-                'x': int(spot_property.centroid[2])
-            }
-        else:  # data is 2d
-            spot_attrs = {
-                'z': 0,
-                'y': int(spot_property.centroid[0]),
-                'x': int(spot_property.centroid[1])
-            }
-
-        # we're back to 3d or fake-3d here
-        target_index = decoded_image[spot_attrs['z'], spot_attrs['y'], spot_attrs['x']]
-        spot_attrs[Features.TARGET] = target_map.target_as_str(target_index)
-        spot_attrs[Features.SPOT_RADIUS] = spot_property.equivalent_diameter / 2
-
-        # filter intensities for which radius is too small
-        passes_area_filter = 1 if min_area <= spot_property.area < max_area else 0
-        return spot_attrs, passes_area_filter
+        # sum the traces of each label with a sparse product against a (labels, pixels) indicator.
+        indicator = csr_matrix(
+            (np.ones(len(labels)), (labels - 1, np.arange(len(labels)))),
+            shape=(n_labels, len(labels)),
+        )
+        counts = np.bincount(labels - 1, minlength=n_labels)
+        present = np.flatnonzero(counts)
+        counts = counts[present]
+        mean_traces = (indicator @ traces)[present] / counts[:, None]
+        mean_distances = np.bincount(
+            labels - 1, weights=distances, minlength=n_labels)[present] / counts
+
+        return xr.DataArray(
+            mean_traces.astype(traces.dtype).reshape(
+                len(present), len(channel_index), len(round_index)),
+            dims=(Features.AXIS, Axes.CH.value, Axes.ROUND.value),
+            coords={
+                Features.AXIS: present + 1,
+                Axes.CH.value: channel_index,
+                Axes.ROUND.value: round_index,
+                Features.DISTANCE: (Features.AXIS, mean_distances),
+            },
+        )
 
     def _create_spot_attributes(
             self,
-            region_properties: List[_RegionProperties],
+            label_image: np.ndarray,
             decoded_image: np.ndarray,
             target_map: TargetsMap,
-            n_processes: Optional[int]=None
     ) -> Tuple[SpotAttributes, np.ndarray]:
         """
+        Calculate starfish SpotAttributes for every connected component of label_image at once,
+        using per-label reductions over the labeled pixels.  The results are equivalent to those of
+        the centroid, area, and equivalent diameter of skimage.measure.regionprops applied to the
+        squeezed label image.
 
         Parameters
         ----------
-        region_properties : List[_RegionProperties]
-            Properties of the each connected component. Output of skimage.measure.regionprops
+        label_image : np.ndarray
+            (z, y, x) image where all pixels of a connected component share the same integer ID
         decoded_image : np.ndarray
             Image whose pixels correspond to the targets that the given position in the ImageStack
             decodes to.
         target_map : TargetsMap
             Unique mapping between string target names and int target IDs.
-        n_processes : Optional[int]=None
-            number of processes to devote to measuring spot properties. If None, defaults to the
-            result of os.nproc()
 
         Returns
         -------
@@ -307,24 +279,34 @@ class CombineAdjacentFeatures:
             An array with length equal to the number of features. If zero, indicates that a feature
             has failed area filters.
         """
-        pool = Pool(processes=n_processes)
-        mapfunc = pool.map
-        applyfunc = partial(
-            self._single_spot_attributes,
-            decoded_image=decoded_image,
-            target_map=target_map,
-            min_area=self._min_area,
-            max_area=self._max_area
+        n_labels = int(label_image.max())
+        pixel_coordinates = np.nonzero(label_image)
+        pixel_labels = label_image[pixel_coordinates]
+
+        area = np.bincount(pixel_labels, minlength=n_labels + 1)[1:]
+        # centroids are truncated to the pixel that contains them.
+        z, y, x = (
+            (np.bincount(pixel_labels, weights=coordinates, minlength=n_labels + 1)[1:]
+             / area).astype(int)
+            for coordinates in pixel_coordinates
         )
 
-        iterable = tqdm(region_properties, disable=(not StarfishConfig().verbose))
-        results = mapfunc(applyfunc, iterable)
-        spot_attrs, passes_area_filter = zip(*results)
+        # regionprops is applied to the squeezed label image, which is 2d for a single zplane.
+        if np.squeeze(label_image).ndim == 3:
+            equivalent_diameter = (6 * area / np.pi) ** (1 / 3)
+        else:
+            equivalent_diameter = np.sqrt(4 * area / np.pi)
 
-        # update passes filter
-        passes_filter = np.array(passes_area_filter, dtype=np.bool)
+        spot_attributes = SpotAttributes(pd.DataFrame({
+            Axes.ZPLANE.value: z,
+            Axes.Y.value: y,
+            Axes.X.value: x,
+            Features.TARGET: target_map.targets_as_str(decoded_image[z, y, x]),
+            Features.SPOT_RADIUS: equivalent_diameter / 2,
+        }))
 
-        spot_attributes = SpotAttributes(pd.DataFrame.from_records(spot_attrs))
+        # filter intensities for which radius is too small
+        passes_filter = np.logical_and(self._min_area <= area, area < self._max_area)
         return spot_attributes, passes_filter
 
     def run(
@@ -340,7 +322,8 @@ class CombineAdjacentFeatures:
         intensities : IntensityTable
             Pixel intensities of an imaging experiment
         n_processes : Optional[int]
-            Number of parallel processes to devote to calculating the filter
+            Unused.  Spot attributes are computed in a single vectorized pass; this parameter is
+            retained for compatibility.
 
         Returns
         -------
@@ -375,21 +358,86 @@ class CombineAdjacentFeatures:
         # label the decoded image to extract connected component features
         label_image: np.ndarray = label(decoded_image, connectivity=self._connectivity)
 
-        # calculate properties of each feature
-        props: List = regionprops(np.squeeze(label_image))
-
         # calculate mean intensities across the pixels of each feature
         mean_pixel_traces = self._calculate_mean_pixel_traces(
             label_image,
             intensities,
         )
 
+        return self._combine_labeled_features(
+            decoded_image, label_image, mean_pixel_traces, target_map)
+
+    def run_on_decoded_image(
+            self,
+            decoded_image: np.ndarray,
+            target_map: TargetsMap,
+            foreground_traces: np.ndarray,
+            foreground_distances: np.ndarray,
+            channel_index: Sequence,
+            round_index: Sequence,
+    ) -> Tuple[IntensityTable, ConnectedComponentDecodingResult]:
+        """
+        Execute the combine_adjacent_features method on an image of pixels that have already been
+        decoded, rather than on an IntensityTable containing every pixel.  Only the traces of the
+        decoded (non-zero) pixels are required.
+
+        Parameters
+        ----------
+        decoded_image : np.ndarray
+            (z, y, x) image whose pixels are the integer IDs of the targets they decode to, or zero
+            for pixels that do not decode to a target
+        target_map : TargetsMap
+            Mapping between string target names and the integer target IDs of decoded_image
+        foreground_traces : np.ndarray
+            array of shape (n_decoded_pixels, n_channel * n_round) containing the normalized traces
+            of the non-zero pixels of decoded_image, in C order, with rounds varying fastest
+        foreground_distances : np.ndarray
+            the distance from each non-zero pixel of decoded_image to its nearest code, in C order
+        channel_index : Sequence
+            the channel labels of the traces
+        round_index : Sequence
+            the round labels of the traces
+
+        Returns
+        -------
+        IntensityTable :
+            Table whose features comprise sets of adjacent pixels that decoded to the same target
+        ConnectedComponentDecodingResult :
+            NamedTuple containing the region properties, label image, and decoded image, as
+            returned by :py:meth:`run`
+
+        """
+        label_image: np.ndarray = label(decoded_image, connectivity=self._connectivity)
+
+        mean_pixel_traces = self._mean_traces_by_label(
+            label_image[decoded_image != 0],
+            foreground_traces,
+            foreground_distances,
+            int(label_image.max()),
+            channel_index,
+            round_index,
+        )
+
+        return self._combine_labeled_features(
+            decoded_image, label_image, mean_pixel_traces, target_map)
+
+    def _combine_labeled_features(
+            self,
+            decoded_image: np.ndarray,
+            label_image: np.ndarray,
+            mean_pixel_traces: xr.DataArray,
+            target_map: TargetsMap,
+    ) -> Tuple[IntensityTable, ConnectedComponentDecodingResult]:
+        """Measure the connected components of label_image and build the IntensityTable of their
+        mean traces."""
+        # calculate properties of each feature
+        props: List = regionprops(np.squeeze(label_image))
+
         # Create SpotAttributes and determine feature filtering outcomes
         spot_attributes, passes_filter = self._create_spot_attributes(
-            props,
+            label_image,
             decoded_image,
             target_map,
-            n_processes=n_processes
         )
 
         # augment the SpotAttributes with filtering results and distances from nearest codes
@@ -7,9 +7,17 @@ from starfish.core.imagestack.imagestack import ImageStack
 from starfish.core.intensity_table.intensity_table import IntensityTable
 from starfish.core.intensity_table.intensity_table_coordinates import \
     transfer_physical_coords_from_imagestack_to_intensity_table
+from starfish.core.types import Axes, Features
 from starfish.core.util import click
 from ._base import DetectPixelsAlgorithmBase
-from .combine_adjacent_features import CombineAdjacentFeatures, ConnectedComponentDecodingResult
+from .combine_adjacent_features import (
+    CombineAdjacentFeatures,
+    ConnectedComponentDecodingResult,
+    TargetsMap,
+)
+
+# the approximate number of pixels decoded at once when streaming.
+_PIXELS_PER_BLOCK = 2 ** 16
 
 
 class PixelSpotDecoder(DetectPixelsAlgorithmBase):
@@ -33,10 +41,16 @@ class PixelSpotDecoder(DetectPixelsAlgorithmBase):
     norm_order : int
         order of L_p norm to apply to intensities and codes when using metric_decode to pair
         each intensities to its closest target (default = 2)
+    streaming : bool
+        if True, the image is decoded in blocks of pixels directly into an image of targets, and
+        only the pixels that decode to a target are retained, rather than constructing an
+        IntensityTable containing every pixel.  This substantially reduces the memory required to
+        decode large fields of view, and produces the same spots (default = False).
     """
     def __init__(
             self, codebook: Codebook, metric: str, distance_threshold: float,
-            magnitude_threshold: int, min_area: int, max_area: int, norm_order: int = 2
+            magnitude_threshold: int, min_area: int, max_area: int, norm_order: int = 2,
+            streaming: bool = False,
     ) -> None:
 
         self.codebook = codebook
@@ -46,6 +60,7 @@ class PixelSpotDecoder(DetectPixelsAlgorithmBase):
         self.min_area = min_area
         self.max_area = max_area
         self.norm_order = norm_order
+        self.streaming = streaming
 
     def run(
             self,
@@ -60,8 +75,7 @@ class PixelSpotDecoder(DetectPixelsAlgorithmBase):
         primary_image : ImageStack
             ImageStack containing spots
         n_processes : Optional[int]
-            The number of processes to use for CombineAdjacentFeatures.
-             If None, uses the output of os.cpu_count() (default = None).
+            Unused.  Retained for compatibility with other pixel detectors (default = None).
 
         Returns
         -------
@@ -71,26 +85,90 @@ class PixelSpotDecoder(DetectPixelsAlgorithmBase):
             Results of connected component labeling
 
         """
-        pixel_intensities = IntensityTable.from_image_stack(primary_image)
-        decoded_intensities = self.codebook.decode_metric(
-            pixel_intensities,
-            max_distance=self.distance_threshold,
-            min_intensity=self.magnitude_threshold,
-            norm_order=self.norm_order,
-            metric=self.metric
-        )
         caf = CombineAdjacentFeatures(
             min_area=self.min_area,
             max_area=self.max_area,
             mask_filtered_features=True
         )
-        decoded_spots, image_decoding_results = caf.run(intensities=decoded_intensities,
-                                                        n_processes=n_processes)
+        if self.streaming:
+            decoded_spots, image_decoding_results = self._decode_streaming(
+                primary_image, caf)
+        else:
+            pixel_intensities = IntensityTable.from_image_stack(primary_image)
+            decoded_intensities = self.codebook.decode_metric(
+                pixel_intensities,
+                max_distance=self.distance_threshold,
+                min_intensity=self.magnitude_threshold,
+                norm_order=self.norm_order,
+                metric=self.metric
+            )
+            decoded_spots, image_decoding_results = caf.run(intensities=decoded_intensities,
+                                                            n_processes=n_processes)
 
         transfer_physical_coords_from_imagestack_to_intensity_table(image_stack=primary_image,
                                                                     intensity_table=decoded_spots)
         return decoded_spots, image_decoding_results
 
+    def _decode_streaming(
+            self,
+            primary_image: ImageStack,
+            caf: CombineAdjacentFeatures,
+    ) -> Tuple[IntensityTable, ConnectedComponentDecodingResult]:
+        """Decode the pixels of primary_image a block of rows at a time into an image of targets,
+        keeping the traces and distances of only the pixels that decode to a target, then combine
+        adjacent pixels into spots.
+
+        Like :py:meth:`CombineAdjacentFeatures.run`, the integer IDs of decoded_image are assigned
+        from the targets nearest to any pixel, so both paths label the same image identically."""
+        codebook_targets = self.codebook[Features.TARGET].values
+
+        n_round, n_ch, n_z, height, width = primary_image.raw_shape
+        # pixels are first labeled with the index of their code plus one, or zero if they do not
+        # decode to a target.
+        code_image = np.zeros((n_z, height, width), dtype=np.int64)
+        is_nearest_code = np.zeros(len(codebook_targets), dtype=bool)
+        foreground_traces = []
+        foreground_distances = []
+
+        rows_per_block = max(1, _PIXELS_PER_BLOCK // width)
+        for z_index, zplane in enumerate(primary_image.axis_labels(Axes.ZPLANE)):
+            # (round, ch, y, x)
+            plane, _ = primary_image.get_slice({Axes.ZPLANE: zplane})
+            for y_start in range(0, height, rows_per_block):
+                block = plane[:, :, y_start:y_start + rows_per_block]
+                # linearize each pixel's trace with rounds varying fastest, as the codes are.
+                linear_features = block.transpose(2, 3, 1, 0).reshape(-1, n_ch * n_round)
+                decoded = self.codebook._decode_linear_features(
+                    linear_features,
+                    max_distance=self.distance_threshold,
+                    min_intensity=self.magnitude_threshold,
+                    norm_order=self.norm_order,
+                    metric=self.metric,
+                )
+                norm_features, distances, code_indices, passes_filters = decoded
+                is_nearest_code[code_indices] = True
+
+                code_labels = np.where(passes_filters, code_indices + 1, 0)
+                code_image[z_index, y_start:y_start + rows_per_block] = code_labels.reshape(
+                    -1, width)
+                foreground_traces.append(norm_features[passes_filters])
+                foreground_distances.append(distances[passes_filters])
+
+        target_map = TargetsMap(codebook_targets[is_nearest_code])
+        code_to_int_target = np.zeros(len(codebook_targets) + 1, dtype=np.int64)
+        code_to_int_target[1:][is_nearest_code] = target_map.targets_as_int(
+            codebook_targets[is_nearest_code])
+        decoded_image = code_to_int_target[code_image]
+
+        return caf.run_on_decoded_image(
+            decoded_image,
+            target_map,
+            np.concatenate(foreground_traces),
+            np.concatenate(foreground_distances),
+            primary_image.axis_labels(Axes.CH),
+            primary_image.axis_labels(Axes.ROUND),
+        )
+
     @staticmethod
     @click.command("PixelSpotDecoder")
     @click.option("--metric", type=str, default='euclidean')
@@ -115,9 +193,14 @@ class PixelSpotDecoder(DetectPixelsAlgorithmBase):
         help="order of L_p norm to apply to intensities "
         "and codes when using metric_decode to pair each intensities to its closest target"
     )
+    @click.option(
+        "--streaming", is_flag=True,
+        help="decode the image in blocks of pixels to reduce memory usage"
+    )
     @click.pass_context
     def _cli(
-        ctx, metric, distance_threshold, magnitude_threshold, min_area, max_area, norm_order
+        ctx, metric, distance_threshold, magnitude_threshold, min_area, max_area, norm_order,
+        streaming
     ):
         codebook = ctx.obj["codebook"]
         instance = PixelSpotDecoder(
@@ -128,5 +211,6 @@ class PixelSpotDecoder(DetectPixelsAlgorithmBase):
             min_area=min_area,
             max_area=max_area,
             norm_order=norm_order,
+            streaming=streaming,
         )
         ctx.obj["component"]._cli_run(ctx, instance)
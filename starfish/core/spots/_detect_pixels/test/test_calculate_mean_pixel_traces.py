@@ -80,3 +80,35 @@ def test_calculate_mean_pixel_traces():
 
     # no values should be filtered, as all spots decoded
     assert np.all(passes_filter)
+
+
+def test_calculate_mean_pixel_traces_with_background():
+    """
+    Verify that background pixels are excluded from the mean traces, that labels without pixels
+    are omitted, and that each mean trace and distance matches the mean over its pixels.
+    """
+    np.random.seed(0)
+    data = np.random.rand(2, 3, 1, 6, 7).astype(np.float32)
+    image_stack = ImageStack.from_numpy(data)
+    intensity_table = IntensityTable.from_image_stack(image_stack)
+    distances = np.random.rand(intensity_table.shape[0])
+    intensity_table[Features.DISTANCE] = (Features.AXIS, distances)
+
+    label_image = np.random.choice([0, 1, 2, 4], size=(1, 6, 7))
+    mean_pixel_traces = CombineAdjacentFeatures._calculate_mean_pixel_traces(
+        label_image,
+        intensity_table,
+    )
+
+    assert np.array_equal(mean_pixel_traces[Features.AXIS].values, [1, 2, 4])
+    pixel_labels = label_image.reshape(-1)
+    for label_id in (1, 2, 4):
+        pixels = pixel_labels == label_id
+        assert np.allclose(
+            mean_pixel_traces.sel({Features.AXIS: label_id}).values,
+            intensity_table.values[pixels].mean(axis=0),
+        )
+        assert np.isclose(
+            mean_pixel_traces[Features.DISTANCE].sel({Features.AXIS: label_id}),
+            distances[pixels].mean(),
+        )
@@ -3,7 +3,8 @@ Tests for CombineAdjacentFeatures._create_spot_attributes method
 """
 
 import numpy as np
-from skimage.measure import regionprops
+import pytest
+from skimage.measure import label, regionprops
 
 from starfish.core.spots._detect_pixels.combine_adjacent_features import (
     CombineAdjacentFeatures, TargetsMap
@@ -20,11 +21,10 @@ def test_create_spot_attributes():
     """
     # make some fixtures
     intensity_table, label_image, decoded_image = labeled_intensities_factory()
-    region_properties = regionprops(np.squeeze(label_image))
     target_map = TargetsMap(np.array(list('abcdef')))
     caf = CombineAdjacentFeatures(min_area=1, max_area=3, connectivity=2)
     spot_attributes, passes_filters = caf._create_spot_attributes(
-        region_properties, decoded_image, target_map
+        label_image, decoded_image, target_map
     )
 
     assert isinstance(spot_attributes, SpotAttributes)
@@ -42,3 +42,31 @@ def test_create_spot_attributes():
     # starts at np.nan, then counts sequentially from 1. Thus, 2 should map to b, and from there
     # the values are sequential. f=6 is not present.
     assert np.array_equal(spot_attributes.data[Features.TARGET].values, list('edcb'))
+
+
+@pytest.mark.parametrize("n_z", [1, 4])
+def test_create_spot_attributes_matches_regionprops(n_z):
+    """
+    Verify that the vectorized spot attributes match those measured by skimage's regionprops, for
+    both volumes and single z-planes.
+    """
+    np.random.seed(0)
+    decoded_image = np.random.randint(0, 4, size=(n_z, 30, 40))
+    label_image = label(decoded_image, connectivity=2)
+    target_map = TargetsMap(np.array(list('abc')))
+    caf = CombineAdjacentFeatures(min_area=2, max_area=6, connectivity=2)
+    spot_attributes, passes_filters = caf._create_spot_attributes(
+        label_image, decoded_image, target_map
+    )
+
+    region_properties = regionprops(np.squeeze(label_image))
+    assert len(region_properties) == spot_attributes.data.shape[0]
+    for spot_property, (_, spot), passes in zip(
+            region_properties, spot_attributes.data.iterrows(), passes_filters):
+        centroid = [int(c) for c in spot_property.centroid]
+        if n_z == 1:
+            centroid = [0] + centroid
+        assert [spot[Axes.ZPLANE], spot[Axes.Y], spot[Axes.X]] == centroid
+        assert np.isclose(spot[Features.SPOT_RADIUS], spot_property.equivalent_diameter / 2)
+        assert spot[Features.TARGET] == target_map.target_as_str(decoded_image[tuple(centroid)])
+        assert passes == (2 <= spot_property.area < 6)
@@ -0,0 +1,99 @@
+"""
+Tests for PixelSpotDecoder
+"""
+
+import numpy as np
+import pytest
+
+from starfish import Codebook, ImageStack
+from starfish.core.spots._detect_pixels import pixel_spot_decoder
+from starfish.core.spots._detect_pixels.pixel_spot_decoder import PixelSpotDecoder
+from starfish.core.types import Axes, Features
+
+
+def decodable_image_factory() -> ImageStack:
+    """
+    Create a (2 round, 2 channel, 2 z, 20 y, 30 x) ImageStack containing square spots that each
+    match a code of codebook_factory, some of which are adjacent, and some dim pixels.
+    """
+    data = np.zeros((2, 2, 2, 20, 30), dtype=np.float32)
+    # (round, ch) of the "on" entries of each code.
+    codes = [((0, 0), (1, 1)), ((0, 1), (1, 0)), ((0, 0), (1, 0))]
+    spots = [(0, 2, 2, 0), (0, 10, 5, 1), (1, 4, 20, 2), (1, 4, 23, 0), (1, 15, 26, 1)]
+    for z, y, x, code in spots:
+        for r, c in codes[code]:
+            data[r, c, z, y:y + 3, x:x + 3] = 0.5
+    data[:, :, 0, 18, 0] = 0.001
+    return ImageStack.from_numpy(data)
+
+
+def codebook_factory(extra_codes=()) -> Codebook:
+    codebook_array = [
+        {
+            Features.CODEWORD: [
+                {Axes.ROUND.value: r, Axes.CH.value: c, Features.CODE_VALUE: 1}
+                for r, c in code
+            ],
+            Features.TARGET: target
+        }
+        for code, target in (
+            (((0, 0), (1, 1)), 'GENE_A'),
+            (((0, 1), (1, 0)), 'GENE_B'),
+            (((0, 0), (1, 0)), 'GENE_C'),
+        ) + tuple(extra_codes)
+    ]
+    return Codebook.from_code_array(codebook_array)
+
+
+@pytest.mark.parametrize("pixels_per_block", [2 ** 16, 64])
+def test_streaming_decode_matches_intensity_table_decode(monkeypatch, pixels_per_block):
+    """
+    Verify that decoding an ImageStack in blocks of pixels produces the same spots and label image
+    as decoding an IntensityTable containing every pixel, whether each block contains entire
+    z-planes or only a few rows of them.
+    """
+    monkeypatch.setattr(pixel_spot_decoder, "_PIXELS_PER_BLOCK", pixels_per_block)
+    image_stack = decodable_image_factory()
+    decoders = [
+        PixelSpotDecoder(
+            codebook=codebook_factory(), metric='euclidean', distance_threshold=0.5176,
+            magnitude_threshold=0.1, min_area=2, max_area=np.inf, streaming=streaming,
+        )
+        for streaming in (False, True)
+    ]
+    (expected, expected_results), (spots, results) = (
+        decoder.run(image_stack, n_processes=1) for decoder in decoders)
+
+    assert spots.sizes[Features.AXIS] == 5
+    assert np.array_equal(spots[Features.TARGET].values, expected[Features.TARGET].values)
+    assert np.allclose(spots.values, expected.values)
+    assert np.allclose(spots[Features.DISTANCE].values, expected[Features.DISTANCE].values)
+    for coord in (Axes.ZPLANE.value, Axes.Y.value, Axes.X.value, Features.SPOT_RADIUS):
+        assert np.array_equal(spots[coord].values, expected[coord].values)
+    assert np.array_equal(results.label_image, expected_results.label_image)
+
+
+def test_streaming_decode_labels_decoded_image_like_intensity_table_decode():
+    """
+    Verify that the decoded image has the same integer target IDs whether or not the ImageStack is
+    decoded in blocks of pixels, when the codebook contains a target that no pixel decodes to.
+    The unused target sorts before the others, so it would shift their IDs if it were mapped.
+    """
+    image_stack = decodable_image_factory()
+    codebook = codebook_factory(extra_codes=[(((0, 1), (1, 1)), 'GENE_0')])
+    decoders = [
+        PixelSpotDecoder(
+            codebook=codebook, metric='euclidean', distance_threshold=0.5176,
+            magnitude_threshold=0.1, min_area=2, max_area=np.inf, streaming=streaming,
+        )
+        for streaming in (False, True)
+    ]
+    (expected, expected_results), (spots, results) = (
+        decoder.run(image_stack, n_processes=1) for decoder in decoders)
+
+    assert np.array_equal(results.decoded_image, expected_results.decoded_image)
+    assert np.array_equal(results.label_image, expected_results.label_image)
+    assert np.array_equal(spots[Features.TARGET].values, expected[Features.TARGET].values)
+    assert np.allclose(spots.values, expected.values)
+    for coord in (Axes.ZPLANE.value, Axes.Y.value, Axes.X.value, Features.SPOT_RADIUS):
+        assert np.array_equal(spots[coord].values, expected[coord].values)
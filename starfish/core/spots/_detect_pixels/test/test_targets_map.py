@@ -3,6 +3,7 @@ Tests for starfish.spots._detect_spots.combine_adjacent_features.TargetsMap
 """
 
 import numpy as np
+import pytest
 
 from starfish.core.spots._detect_pixels.combine_adjacent_features import TargetsMap
 
@@ -17,3 +18,15 @@ def test_targets_map():
     decoded = target_map.targets_as_str(encoded)
 
     assert np.array_equal(decoded, targets)
+
+
+def test_targets_map_nan_and_unknown_targets():
+    """Test that 'nan' maps to the background ID 0, and that unknown targets are rejected"""
+    target_map = TargetsMap(np.array(['b', 'nan', 'a', 'b']))
+
+    assert np.array_equal(target_map.targets_as_int(np.array(['nan', 'a', 'b', 'a'])), [0, 1, 2, 1])
+    assert np.array_equal(target_map.targets_as_str(np.array([2, 0, 1])), ['b', 'nan', 'a'])
+    assert target_map.target_as_str(1) == 'a'
+
+    with pytest.raises(KeyError):
+        target_map.targets_as_int(np.array(['a', 'c']))
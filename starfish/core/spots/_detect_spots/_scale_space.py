@@ -0,0 +1,89 @@
+"""
+A cache of the scale-space cubes that BlobDetector searches for blobs, so that the expensive cube is
+computed once per image and reused when only the threshold or overlap of the detection changes.
+The scale-space stages of blob detection are in starfish.core.compat.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+import numpy as np
+
+from starfish.core.compat import ScaleSpace
+
+
+class ScaleSpaceCache:
+    """Keeps the most recently computed scale-space cubes, keyed by the contents of the image they
+    were computed from and the parameters of the scale space.  The cache may be used from multiple
+    threads.  Cubes are computed outside the lock, so two threads that miss on the same image may
+    both compute its cube.
+
+    Parameters
+    ----------
+    max_bytes : int
+        The maximum total size of the cached cubes.  When this is exceeded, the least recently used
+        cubes are discarded.  A cube larger than max_bytes is computed but never cached.
+    """
+    def __init__(self, max_bytes: int) -> None:
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self._max_bytes = max_bytes
+        self._nbytes = 0
+        self._resident: "OrderedDict[Hashable, ScaleSpace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._resident)
+
+    def __getstate__(self):
+        # cached cubes are not sent to worker processes
+        state = self.__dict__.copy()
+        state["_nbytes"] = 0
+        state["_resident"] = OrderedDict()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """The total size of the cached cubes."""
+        return self._nbytes
+
+    def get(
+            self,
+            image: np.ndarray,
+            parameters: Hashable,
+            compute: Callable[[np.ndarray], ScaleSpace],
+    ) -> ScaleSpace:
+        """Return the scale space of image for parameters, calling compute(image) if it is not
+        cached.  The returned cube should be treated as read-only as it may be shared with later
+        callers."""
+        image = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(image.view(np.uint8), digest_size=16).digest()
+        key = (digest, image.shape, image.dtype.str, parameters)
+
+        with self._lock:
+            scale_space = self._resident.get(key)
+            if scale_space is not None:
+                self._resident.move_to_end(key)
+                return scale_space
+
+        scale_space = compute(image)
+        if scale_space.cube.nbytes > self._max_bytes:
+            return scale_space
+
+        with self._lock:
+            # another thread may have cached the same cube while this one computed it.
+            if key not in self._resident:
+                self._resident[key] = scale_space
+                self._nbytes += scale_space.cube.nbytes
+            self._resident.move_to_end(key)
+            while self._nbytes > self._max_bytes:
+                _, evicted = self._resident.popitem(last=False)
+                self._nbytes -= evicted.cube.nbytes
+            return self._resident.get(key, scale_space)
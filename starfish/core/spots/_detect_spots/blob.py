@@ -1,15 +1,22 @@
-from typing import Optional, Tuple, Union
+from typing import Hashable, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 import xarray as xr
 from skimage.feature import blob_dog, blob_doh, blob_log
 
+from starfish.core.compat import (
+    blobs_from_scale_space,
+    dog_scale_space,
+    log_scale_space,
+    SCALE_SPACE_STAGES_SUPPORTED,
+)
 from starfish.core.imagestack.imagestack import ImageStack
 from starfish.core.intensity_table.intensity_table import IntensityTable
 from starfish.core.types import Axes, Features, Number, SpotAttributes
 from starfish.core.util import click
 from ._base import DetectSpotsAlgorithmBase
+from ._scale_space import ScaleSpaceCache
 from .detect import detect_spots, measure_spot_intensity
 
 blob_detectors = {
@@ -18,6 +25,16 @@ blob_detectors = {
     'blob_log': blob_log
 }
 
+scale_space_methods = {
+    'blob_dog': dog_scale_space,
+    'blob_log': log_scale_space,
+}
+
+
+def _hashable_sigma(sigma) -> Hashable:
+    # sigmas may be given per dimension as lists, which are not hashable.
+    return sigma if np.isscalar(sigma) else tuple(sigma)
+
 
 class BlobDetector(DetectSpotsAlgorithmBase):
     """
@@ -29,10 +46,11 @@ class BlobDetector(DetectSpotsAlgorithmBase):
     ----------
     min_sigma : float
         The minimum standard deviation for Gaussian Kernel. Keep this low to
-        detect smaller blobs.
+        detect smaller blobs. May be given per (z, y, x) dimension, in which case the radius of
+        each spot is the mean of its per-dimension sigmas.
     max_sigma : float
         The maximum standard deviation for Gaussian Kernel. Keep this high to
-        detect larger blobs.
+        detect larger blobs. May be given per (z, y, x) dimension.
     num_sigma : int
         The number of intermediate values of standard deviations to consider
         between `min_sigma` and `max_sigma`.
@@ -47,11 +65,25 @@ class BlobDetector(DetectSpotsAlgorithmBase):
         name of the function used to calculate the intensity for each identified spot area
     detector_method: str ['blob_dog', 'blob_doh', 'blob_log']
         name of the type of detection method used from skimage.feature, default: blob_log
+    scale_space_cache_size : Optional[int]
+        If provided, the scale-space cube computed for each image is cached, and only peak
+        extraction is repeated when the same image is searched again with a different threshold
+        or overlap. The cached cubes are bounded to this many bytes, discarding the least recently
+        used. Only supported for blob_dog and blob_log, and with scikit-image 0.15. The cache only
+        persists in the process that calls image_to_spots, so it is only useful with
+        n_processes=1 or when finding spots in a reference image. (default None, caching disabled)
 
     Notes
     -----
     see also: http://scikit-image.org/docs/dev/auto_examples/features_detection/plot_blob.html
 
+    The scale-space cache is kept by the BlobDetector in the process that runs image_to_spots. It
+    is emptied whenever the BlobDetector is sent to a worker process, and is not returned from the
+    workers. With the default n_processes, each image is searched in a worker process and the cache
+    is never reused; parameter sweeps benefit from it only when spots are found with n_processes=1
+    or in a reference image. The cache may be shared by threads, such as those started by
+    Experiment.process_fovs.
+
     """
 
     def __init__(
@@ -63,7 +95,8 @@ class BlobDetector(DetectSpotsAlgorithmBase):
             overlap: float = 0.5,
             measurement_type='max',
             is_volume: bool = True,
-            detector_method: str = 'blob_log'
+            detector_method: str = 'blob_log',
+            scale_space_cache_size: Optional[int] = None,
     ) -> None:
 
         self.min_sigma = min_sigma
@@ -78,6 +111,38 @@ class BlobDetector(DetectSpotsAlgorithmBase):
         except ValueError:
             raise ValueError("Detector method must be one of {blob_log, blob_dog, blob_doh}")
 
+        self.detector_method_name = detector_method
+        self._scale_space_cache: Optional[ScaleSpaceCache] = None
+        if scale_space_cache_size is not None:
+            if detector_method not in scale_space_methods:
+                raise ValueError(
+                    f"scale_space_cache_size is only supported for detector methods "
+                    f"{list(scale_space_methods.keys())}")
+            if not SCALE_SPACE_STAGES_SUPPORTED:
+                raise ValueError(
+                    "scale_space_cache_size is not supported with the installed version of "
+                    "scikit-image")
+            self._scale_space_cache = ScaleSpaceCache(scale_space_cache_size)
+
+    def _detect_blobs_from_cached_scale_space(self, data_image: np.ndarray) -> np.ndarray:
+        """find blobs like self.detector_method, reusing the cached scale space of data_image"""
+        assert self._scale_space_cache is not None
+        scale_space_method = scale_space_methods[self.detector_method_name]
+
+        # num_sigma is passed to the detector method in the same position as image_to_spots passes
+        # it, which is sigma_ratio for blob_dog
+        def compute(image):
+            return scale_space_method(image, self.min_sigma, self.max_sigma, self.num_sigma)
+
+        parameters: Tuple[Hashable, ...] = (
+            self.detector_method_name,
+            _hashable_sigma(self.min_sigma),
+            _hashable_sigma(self.max_sigma),
+            self.num_sigma,
+        )
+        scale_space = self._scale_space_cache.get(data_image, parameters, compute)
+        return blobs_from_scale_space(scale_space, self.threshold, self.overlap)
+
     def image_to_spots(self, data_image: Union[np.ndarray, xr.DataArray]) -> SpotAttributes:
         """
         Find spots using a gaussian blob finding algorithm
@@ -94,18 +159,26 @@ class BlobDetector(DetectSpotsAlgorithmBase):
 
         """
 
-        fitted_blobs_array: np.ndarray = self.detector_method(
-            data_image,
-            self.min_sigma,
-            self.max_sigma,
-            self.num_sigma,
-            self.threshold,
-            self.overlap
-        )
+        if self._scale_space_cache is not None:
+            fitted_blobs_array = self._detect_blobs_from_cached_scale_space(np.asarray(data_image))
+        else:
+            fitted_blobs_array = self.detector_method(
+                data_image,
+                self.min_sigma,
+                self.max_sigma,
+                self.num_sigma,
+                self.threshold,
+                self.overlap
+            )
 
         if fitted_blobs_array.shape[0] == 0:
             return SpotAttributes.empty(extra_fields=['intensity', 'spot_id'])
 
+        # collapse radius if sigma is non-scalar
+        if not all(np.isscalar(s) for s in (self.min_sigma, self.max_sigma)):
+            fitted_blobs_array = np.column_stack(
+                [fitted_blobs_array[:, :3], np.mean(fitted_blobs_array[:, -3:], axis=1)])
+
         # create the SpotAttributes Table
         columns = [Axes.ZPLANE.value, Axes.Y.value, Axes.X.value, Features.SPOT_RADIUS]
         fitted_blobs = pd.DataFrame(data=fitted_blobs_array, columns=columns)
@@ -13,6 +13,104 @@ from starfish.core.intensity_table.intensity_table_coordinates import \
 from starfish.core.types import Axes, Features, Number, SpotAttributes
 
 
+# measurement functions that _measure_spot_windows can apply to all spots at once
+_WINDOW_MEASUREMENT_FUNCTIONS = (np.max, np.mean, np.sum)
+
+# maximum number of pixels _measure_spot_windows gathers at once
+_WINDOW_BLOCK_SIZE = 2 ** 22
+
+
+def _add_spot_bounding_boxes(
+        spots: SpotAttributes,
+        shape: Sequence[int],
+        radius_is_gyration: bool,
+) -> np.ndarray:
+    """add the (z, y, x) bounds of each spot's bounding box to spots and return the integer radius
+    of each box"""
+    if radius_is_gyration:
+        radius = np.ceil(spots.data[Features.SPOT_RADIUS]).astype(int) + 1  # round up
+    else:
+        radius = spots.data[Features.SPOT_RADIUS].astype(int)  # truncate down to nearest integer
+    for v, max_size in zip(['z', 'y', 'x'], shape):
+        # numpy does exclusive max indexing, so need to subtract 1 from min to get centered box
+        spots.data[f'{v}_min'] = np.clip(spots.data[v] - (radius - 1), 0, None)
+        spots.data[f'{v}_max'] = np.clip(spots.data[v] + radius, None, max_size)
+    return np.asarray(radius)
+
+
+def _measure_spot_windows(
+        volumes: np.ndarray,
+        spots: SpotAttributes,
+        radius: np.ndarray,
+        measurement_function: Callable[[Sequence], Number],
+) -> Optional[np.ndarray]:
+    """
+    Measure the intensity of every spot in every volume at once by gathering a window of pixels
+    around each spot center, for the measurement functions in _WINDOW_MEASUREMENT_FUNCTIONS.
+
+    Each window is clipped to the volume the same way _add_spot_bounding_boxes clips bounding
+    boxes. Returns None if measurement_function is not supported or if any bounding box is not a
+    non-empty window around the spot's center, in which case spots must be measured one at a time.
+
+    Parameters
+    ----------
+    volumes : np.ndarray
+        (..., z, y, x) array of volumes in which to measure intensities
+    spots : SpotAttributes
+        SpotAttributes table containing coordinates and bounding boxes of spots
+    radius : np.ndarray
+        integer radius of each spot's bounding box
+    measurement_function : Callable[[Sequence], Number])
+        Function to apply over the spot volumes to identify the intensity
+
+    Returns
+    -------
+    Optional[np.ndarray] :
+        (..., n_spots) array of the intensity of each spot in each volume
+    """
+    if not any(measurement_function is fn for fn in _WINDOW_MEASUREMENT_FUNCTIONS):
+        return None
+
+    axes = ['z', 'y', 'x']
+    shape = np.array(volumes.shape[-3:])
+    centers = np.floor(spots.data[axes].values).astype(int)
+    mins = spots.data[[f'{v}_min' for v in axes]].values.astype(int)
+    maxs = spots.data[[f'{v}_max' for v in axes]].values.astype(int)
+    if not (
+            np.array_equal(np.clip(centers - (radius[:, None] - 1), 0, None), mins)
+            and np.array_equal(np.clip(centers + radius[:, None], None, shape), maxs)
+            and np.all(mins < maxs)
+    ):
+        return None
+
+    n_volumes = int(np.prod(volumes.shape[:-3]))
+    dtype = volumes.dtype if measurement_function is np.max else np.float64
+    intensities = np.empty(volumes.shape[:-3] + (len(centers),), dtype=dtype)
+    for spot_radius in np.unique(radius):
+        # offsets of the window around each center, excluding those that can never be in bounds
+        offsets = [
+            np.arange(max(1 - spot_radius, 1 - size), min(spot_radius, size)) for size in shape]
+        window = np.stack(np.meshgrid(*offsets, indexing='ij'), axis=-1).reshape(-1, 3)
+        spot_indices = np.flatnonzero(radius == spot_radius)
+        block_size = max(1, _WINDOW_BLOCK_SIZE // (len(window) * n_volumes))
+        for start in range(0, len(spot_indices), block_size):
+            block = spot_indices[start:start + block_size]
+            coords = centers[block, None, :] + window
+            in_bounds = np.all((coords >= 0) & (coords < shape), axis=-1)
+            # out of bounds pixels are clipped to the edge of the bounding box, which leaves the
+            # max unchanged, and are masked out of the sum and mean
+            coords = np.clip(coords, 0, shape - 1)
+            values = volumes[..., coords[..., 0], coords[..., 1], coords[..., 2]]
+            if measurement_function is np.max:
+                intensities[..., block] = values.max(axis=-1)
+            else:
+                sums = np.where(in_bounds, values, 0).sum(axis=-1, dtype=np.float64)
+                if measurement_function is np.mean:
+                    sums /= in_bounds.sum(axis=-1)
+                intensities[..., block] = sums
+    return intensities
+
+
 def measure_spot_intensity(
         image: Union[np.ndarray, xr.DataArray],
         spots: SpotAttributes,
@@ -35,6 +133,11 @@ def measure_spot_intensity(
         In this case, the spot's bounding box is rounded up instead of down when measuring
         intensity. (default False)
 
+    Notes
+    -----
+    np.max, np.mean, and np.sum are applied to all spots at once. Other measurement functions are
+    applied to each spot in turn.
+
     Returns
     -------
     pd.Series :
@@ -50,14 +153,10 @@ def measure_spot_intensity(
         ]
         return measurement_function(data)
 
-    if radius_is_gyration:
-        radius = np.ceil(spots.data[Features.SPOT_RADIUS]).astype(int) + 1  # round up
-    else:
-        radius = spots.data[Features.SPOT_RADIUS].astype(int)  # truncate down to nearest integer
-    for v, max_size in zip(['z', 'y', 'x'], image.shape):
-        # numpy does exclusive max indexing, so need to subtract 1 from min to get centered box
-        spots.data[f'{v}_min'] = np.clip(spots.data[v] - (radius - 1), 0, None)
-        spots.data[f'{v}_max'] = np.clip(spots.data[v] + radius, None, max_size)
+    radius = _add_spot_bounding_boxes(spots, image.shape, radius_is_gyration)
+    intensities = _measure_spot_windows(np.asarray(image), spots, radius, measurement_function)
+    if intensities is not None:
+        return pd.Series(intensities, index=spots.data.index)
     return spots.data[['z_min', 'z_max', 'y_min', 'y_max', 'x_min', 'x_max']].astype(int).apply(
         fn,
         axis=1
@@ -108,6 +207,24 @@ def measure_spot_intensities(
     if intensity_table.sizes[Features.AXIS] == 0:
         return intensity_table
 
+    # if the measurement function allows it, measure every channel of a round at once.  get_slice
+    # presents each round as float32 like the per-slice path below, so only one round of the stack
+    # is copied at a time.
+    if any(measurement_function is fn for fn in _WINDOW_MEASUREMENT_FUNCTIONS):
+        for round_index, r in enumerate(round_values):
+            volumes, axes = data_image.get_slice({Axes.ROUND: r})
+            volumes = np.moveaxis(volumes, axes.index(Axes.CH), 0)
+            if round_index == 0:
+                radius = _add_spot_bounding_boxes(
+                    spot_attributes, volumes.shape[-3:], radius_is_gyration)
+            intensities = _measure_spot_windows(
+                volumes, spot_attributes, radius, measurement_function)
+            if intensities is None:
+                break
+            intensity_table.values[:, :, round_index] = intensities.T
+        else:
+            return intensity_table
+
     # fill the intensity table
     indices = product(ch_values, round_values)
     for c, r in indices:
@@ -153,12 +270,16 @@ def concatenate_spot_attributes_to_intensities(
         SpotAttributes(features_coordinates), ch_values, round_values,
     )
 
-    i = 0
-    for attrs, inds in spot_attributes:
-        for _, row in attrs.data.iterrows():
-            selector = dict(features=i, c=inds[Axes.CH], r=inds[Axes.ROUND])
-            intensity_table.loc[selector] = row['intensity']
-            i += 1
+    # each spot occupies its own feature, so the (feature, ch, round) position of every intensity
+    # is known up front and the table can be filled in one scatter
+    n_spots = [sa.data.shape[0] for sa, _ in spot_attributes]
+    ch_indices = np.repeat(
+        np.searchsorted(ch_values, [inds[Axes.CH] for _, inds in spot_attributes]), n_spots)
+    round_indices = np.repeat(
+        np.searchsorted(round_values, [inds[Axes.ROUND] for _, inds in spot_attributes]), n_spots)
+    feature_indices = np.arange(len(ch_indices))
+    intensity_table.values[feature_indices, ch_indices, round_indices] = \
+        all_spots['intensity'].values
 
     return intensity_table
 
@@ -225,7 +346,7 @@ def detect_spots(data_stack: ImageStack,
             reference_image = reference_image.max_proj(*reference_image_max_projection_axes)
             data_image = reference_image._squeezed_numpy(*reference_image_max_projection_axes)
         else:
-            data_image = reference_image.xarray
+            data_image = reference_image._float32_xarray()
         reference_spot_locations = spot_finding_method(data_image, **spot_finding_kwargs)
         intensity_table = measure_spot_intensities(
             data_image=data_stack,
@@ -6,8 +6,6 @@ import xarray as xr
 from scipy.ndimage import label
 from skimage.feature import peak_local_max
 from skimage.measure import regionprops
-from sympy import Line, Point
-from tqdm import tqdm
 
 from starfish.core.config import StarfishConfig
 from starfish.core.imagestack.imagestack import ImageStack
@@ -97,42 +95,36 @@ class LocalMaxPeakFinder(DetectSpotsAlgorithmBase):
         # thresholds to search over
         thresholds = np.linspace(img.min(), img.max(), num=100)
 
-        # number of spots detected at each threshold
-        spot_counts = []
-
-        # where we stop our threshold search
-        stop_threshold = None
-
         if self.verbose and StarfishConfig().verbose:
-            threshold_iter = tqdm(thresholds)
             print('Determining optimal threshold ...')
-        else:
-            threshold_iter = thresholds
-
-        for stop_index, threshold in enumerate(threshold_iter):
-            spots = peak_local_max(
-                img,
-                min_distance=self.min_distance,
-                threshold_abs=threshold,
-                exclude_border=False,
-                indices=True,
-                num_peaks=np.inf,
-                footprint=None,
-                labels=None
-            )
-
-            # stop spot finding when the number of detected spots falls below min_num_spots_detected
-            if len(spots) <= self.min_num_spots_detected:
-                stop_threshold = threshold
-                if self.verbose:
-                    print(f'Stopping early at threshold={threshold}. Number of spots fell below: '
-                          f'{self.min_num_spots_detected}')
-                break
-            else:
-                spot_counts.append(len(spots))
 
-        if stop_threshold is None:
-            stop_threshold = thresholds.max()
+        # the peaks found at any threshold are exactly the peaks found at the lowest threshold whose
+        # values exceed it, so the local maxima only need to be found once
+        peaks = peak_local_max(
+            img,
+            min_distance=self.min_distance,
+            threshold_abs=thresholds[0],
+            exclude_border=False,
+            indices=True,
+            num_peaks=np.inf,
+            footprint=None,
+            labels=None
+        )
+        peak_values = np.sort(img[tuple(peaks.T)])
+
+        # number of spots detected at each threshold
+        all_spot_counts = len(peak_values) - np.searchsorted(peak_values, thresholds, side='right')
+
+        # stop spot finding when the number of detected spots falls below min_num_spots_detected
+        below_min = np.flatnonzero(all_spot_counts <= self.min_num_spots_detected)
+        if len(below_min):
+            stop_index = below_min[0]
+            if self.verbose:
+                print(f'Stopping early at threshold={thresholds[stop_index]}. Number of spots fell '
+                      f'below: {self.min_num_spots_detected}')
+        else:
+            stop_index = len(thresholds) - 1
+        spot_counts = all_spot_counts.tolist()
 
         if len(thresholds > 1):
             thresholds = thresholds[:stop_index]
@@ -159,19 +151,20 @@ class LocalMaxPeakFinder(DetectSpotsAlgorithmBase):
 
         if len(thresholds) > 1:
 
-            distances = []
-
             # create a line whose end points are the threshold and and corresponding gradient value
             # for spot_counts corresponding to the threshold
-            start_point = Point(thresholds[0], grad[0])
-            end_point = Point(thresholds[-1], grad[-1])
-            line = Line(start_point, end_point)
+            points = np.stack([thresholds, grad], axis=1).astype(float)
+            start_point, end_point = points[0], points[-1]
+            direction = end_point - start_point
+            offsets = points - start_point
 
             # calculate the distance between all points and the line
-            for k in range(len(thresholds)):
-                p = Point(thresholds[k], grad[k])
-                dst = line.distance(p)
-                distances.append(dst.evalf())
+            length = np.hypot(*direction)
+            if length > 0:
+                distances = np.abs(
+                    direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / length
+            else:
+                distances = np.hypot(offsets[:, 0], offsets[:, 1])
 
             # remove the end points
             thresholds = thresholds[1:-1]
@@ -180,8 +173,8 @@ class LocalMaxPeakFinder(DetectSpotsAlgorithmBase):
             # select the threshold that has the maximum distance from the line
             # if stringency is passed, select a threshold that is n steps higher, where n is the
             # value of stringency
-            if distances:
-                thr_idx = np.argmax(np.array(distances))
+            if len(distances):
+                thr_idx = np.argmax(distances)
 
                 if thr_idx + self.stringency < len(thresholds):
                     selected_thr = thresholds[thr_idx + self.stringency]
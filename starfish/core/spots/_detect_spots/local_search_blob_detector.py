@@ -13,8 +13,9 @@ import numpy as np
 import pandas as pd
 import xarray as xr
 from click import Choice
-from sklearn.neighbors import NearestNeighbors
+from scipy.spatial import cKDTree
 
+from starfish.core.codebook.codebook import Codebook
 from starfish.core.compat import blob_dog, blob_log
 from starfish.core.image._filter.util import determine_axes_to_group_by
 from starfish.core.imagestack.imagestack import ImageStack
@@ -23,6 +24,7 @@ from starfish.core.intensity_table.intensity_table_coordinates import \
     transfer_physical_coords_from_imagestack_to_intensity_table
 from starfish.core.types import Axes, Features, Number, SpotAttributes
 from starfish.core.util import click
+from starfish.core.util.click.indirectparams import CodebookParamType
 from ._base import DetectSpotsAlgorithmBase
 
 blob_detectors = {
@@ -30,6 +32,18 @@ blob_detectors = {
     'blob_log': blob_log
 }
 
+# spots detected in a single (z, y, x) volume, as returned by detection workers
+_SPOT_DTYPE = np.dtype([
+    ('intensity', np.float64),
+    (Axes.ZPLANE.value, np.int32),
+    (Axes.Y.value, np.int32),
+    (Axes.X.value, np.int32),
+    (Features.SPOT_RADIUS, np.float64),
+])
+
+# spots detected in all the channels of a round, labeled by the channel they were detected in
+_ROUND_SPOT_DTYPE = np.dtype(_SPOT_DTYPE.descr + [(Axes.CH.value, np.int32)])
+
 
 class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
     """
@@ -60,6 +74,13 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
     anchor_round : int
         The imaging round against which other rounds will be checked for spots in the same
         approximate pixel location.
+    max_candidates : int
+        Number of spots within search_radius considered as matches in each round other than the
+        anchor round. Unless a codebook is provided, the nearest spot is selected. (default 1)
+    codebook : Optional[Codebook]
+        If provided, the candidates matched to each anchor spot are selected so that the channel
+        of the spot in each round agrees with as many rounds of a single one-hot code as possible.
+        Ties are broken by the total distance to the selected spots. (default None)
     detector_kwargs : Dict[str, Any]
         Additional keyword arguments to pass to the detector_method.
 
@@ -75,6 +96,8 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
             exclude_border: Optional[int]=None,
             search_radius: int=3,
             anchor_round: int=1,
+            max_candidates: int=1,
+            codebook: Optional[Codebook]=None,
             **detector_kwargs,
     ) -> None:
 
@@ -85,13 +108,15 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
         self.exclude_border = exclude_border
         self.search_radius = search_radius
         self.anchor_round = anchor_round
+        self.max_candidates = max_candidates
+        self.codebook = codebook
         self.detector_kwargs = detector_kwargs
         try:
             self.detector_method = blob_detectors[detector_method]
         except ValueError:
             raise ValueError(f"Detector method must be one of {list(blob_detectors.keys())}")
 
-    def _spot_finder(self, data: xr.DataArray) -> pd.DataFrame:
+    def _spot_finder(self, data: xr.DataArray) -> np.ndarray:
         """Find spots in a data volume.
 
         Parameters
@@ -101,8 +126,10 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
 
         Returns
         -------
-        pd.DataFrame
-            DataFrame wrapping the output of skimage blob_log or blob_dog with named outputs.
+        np.ndarray
+            Structured array of _SPOT_DTYPE wrapping the output of skimage blob_log or blob_dog
+            with named fields. Structured arrays are much cheaper than DataFrames to return from
+            worker processes.
 
         """
 
@@ -116,6 +143,8 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
             **self.detector_kwargs
         )
 
+        spot_data = np.zeros(results.shape[0], dtype=_SPOT_DTYPE)
+
         # if spots were detected
         if results.shape[0]:
 
@@ -123,35 +152,16 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
             z_inds = results[:, 0].astype(int)
             y_inds = results[:, 1].astype(int)
             x_inds = results[:, 2].astype(int)
-            intensities = data.values[tuple([z_inds, y_inds, x_inds])]
+            spot_data['intensity'] = data.values[tuple([z_inds, y_inds, x_inds])]
+            spot_data[Axes.ZPLANE.value] = z_inds
+            spot_data[Axes.Y.value] = y_inds
+            spot_data[Axes.X.value] = x_inds
 
             # collapse radius if sigma is non-scalar
             if all(np.isscalar(s) for s in (self.min_sigma, self.max_sigma)):
-                radius = results[:, 3]
+                spot_data[Features.SPOT_RADIUS] = results[:, 3]
             else:
-                radius = np.mean(results[:, -3:], axis=1)
-
-            # construct dataframe
-            spot_data = pd.DataFrame(
-                data={
-                    "intensity": intensities,
-                    Axes.ZPLANE: z_inds,
-                    Axes.Y: y_inds,
-                    Axes.X: x_inds,
-                    Features.SPOT_RADIUS: radius
-                }
-            )
-
-        else:
-            spot_data = pd.DataFrame(
-                data=np.array(
-                    [],
-                    dtype=[
-                        ('intensity', float), ('z', int), ('y', int), ('x', int),
-                        (Features.SPOT_RADIUS, float)
-                    ]
-                )
-            )
+                spot_data[Features.SPOT_RADIUS] = np.mean(results[:, -3:], axis=1)
 
         return spot_data
 
@@ -171,8 +181,8 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
         Returns
         -------
         Dict[Tuple[int, int], np.ndarray]
-            Dictionary mapping (round, channel) pairs to a spot table generated by skimage blob_log
-            or blob_dog.
+            Dictionary mapping (round, channel) pairs to a structured array of the spots generated
+            by skimage blob_log or blob_dog.
 
         """
         # find spots in each (r, c) volume
@@ -193,49 +203,155 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
 
     @staticmethod
     def _merge_spots_by_round(
-        spot_results: Dict[Tuple[int, int], pd.DataFrame]
-    ) -> Dict[int, pd.DataFrame]:
-        """Merge DataFrames containing spots from different channels into one DataFrame per round.
+        spot_results: Dict[Tuple[int, int], np.ndarray]
+    ) -> Dict[int, np.ndarray]:
+        """Merge arrays containing spots from different channels into one array per round.
 
-        Executed on the output of
         Parameters
         ----------
-        spot_results : Dict[Tuple[int, int], pd.DataFrame]
+        spot_results : Dict[Tuple[int, int], np.ndarray]
             Output of _find_spots. Dictionary mapping (round, channel) volumes to the spots detected
             in them.
 
         Returns
         -------
-        Dict[int, pd.DataFrame]
-            Dictionary mapping round volumes to the spots detected in them. Contains an additional
-            column labeled by Axes.CH which identifies the channel in which a given spot was
-            detected.
+        Dict[int, np.ndarray]
+            Dictionary mapping round volumes to a structured array of _ROUND_SPOT_DTYPE of the
+            spots detected in them. Contains an additional field labeled by Axes.CH which
+            identifies the channel in which a given spot was detected.
 
         """
 
-        # add channel information to each table and add it to round_data
         round_data: Mapping[int, List] = defaultdict(list)
-        for (r, c), df in spot_results.items():
-            df[Axes.CH.value] = np.full(df.shape[0], c)
-            round_data[r].append(df)
-
-        # create one dataframe per round
-        round_dataframes = {
-            k: pd.concat(v, axis=0).reset_index().drop('index', axis=1)
-            for k, v in round_data.items()
+        for (r, c), spots in spot_results.items():
+            round_data[r].append((c, spots))
+
+        # create one array per round, labeling each spot with its channel
+        round_spots = {}
+        for r, channel_spots in round_data.items():
+            merged = np.empty(sum(len(spots) for _, spots in channel_spots), _ROUND_SPOT_DTYPE)
+            start = 0
+            for c, spots in channel_spots:
+                block = merged[start:start + len(spots)]
+                for field in _SPOT_DTYPE.names:
+                    block[field] = spots[field]
+                block[Axes.CH.value] = c
+                start += len(spots)
+            round_spots[r] = merged
+
+        return round_spots
+
+    @staticmethod
+    def _build_spatial_indices(round_spots: Dict[int, np.ndarray]) -> Dict[int, cKDTree]:
+        """Build a spatial index over the (z, y, x) coordinates of the spots in each round.
+
+        Parameters
+        ----------
+        round_spots : Dict[int, np.ndarray]
+            Output from _merge_spots_by_round, contains mapping of image volumes from each round to
+            all the spots detected in them.
+
+        Returns
+        -------
+        Dict[int, cKDTree]
+            Dictionary mapping each round to a KD-tree over the spots detected in it.
+
+        """
+        return {
+            r: cKDTree(np.stack(
+                [spots[axis.value] for axis in (Axes.ZPLANE, Axes.Y, Axes.X)], axis=1
+            ).astype(float))
+            for r, spots in round_spots.items()
         }
 
-        return round_dataframes
+    @staticmethod
+    def _select_candidates_by_codebook(
+        codebook: Codebook,
+        anchor_round: int,
+        anchor_channels: np.ndarray,
+        query_rounds: Sequence[int],
+        candidate_channels: np.ndarray,
+        candidate_distances: np.ndarray,
+    ) -> np.ndarray:
+        """Select the candidate matches of each anchor spot that best agree with a single code.
+
+        For each code, the nearest candidate whose channel matches the code is selected in each
+        round. Each anchor spot is assigned the code that matches the most rounds, with ties broken
+        by the total distance to the selected candidates. In rounds that the assigned code does not
+        match, the nearest candidate is selected.
+
+        Parameters
+        ----------
+        codebook : Codebook
+            One-hot codebook; the expected channel of each round is the channel with the largest
+            value in that round.
+        anchor_round : int
+            The imaging round the local search was seeded from.
+        anchor_channels : np.ndarray
+            (n_spots,) channel of each anchor spot.
+        query_rounds : Sequence[int]
+            The rounds, other than the anchor round, in which candidates were found.
+        candidate_channels : np.ndarray
+            (n_spots, n_query_rounds, max_candidates) channel of each candidate, sorted by
+            increasing distance. -1 where there is no candidate.
+        candidate_distances : np.ndarray
+            (n_spots, n_query_rounds, max_candidates) distance to each candidate, np.inf where
+            there is no candidate.
+
+        Returns
+        -------
+        np.ndarray
+            (n_spots, n_query_rounds) position of the selected candidate in each round.
+
+        """
+        codebook_rounds = list(codebook[Axes.ROUND.value].values)
+        missing_rounds = set(query_rounds).union({anchor_round}) - set(codebook_rounds)
+        if missing_rounds:
+            raise ValueError(f"rounds {sorted(missing_rounds)} are not present in the codebook")
+        code_channels = codebook[Axes.CH.value].values[
+            codebook.transpose(Features.TARGET, Axes.ROUND.value, Axes.CH.value).values.argmax(
+                axis=2)
+        ]
+        query_round_positions = [codebook_rounds.index(r) for r in query_rounds]
+        anchor_round_position = codebook_rounds.index(anchor_round)
+
+        n_spots = candidate_channels.shape[0]
+        best_scores = np.full(n_spots, -1)
+        best_distances = np.full(n_spots, np.inf)
+        selected = np.zeros(candidate_channels.shape[:2], dtype=int)
+        for code in code_channels:
+            matches = candidate_channels == code[query_round_positions][None, :, None]
+            has_match = matches.any(axis=2)
+            # candidates are sorted by distance, so the first match is the nearest
+            nearest_match = matches.argmax(axis=2)
+            scores = (
+                has_match.sum(axis=1) + (anchor_channels == code[anchor_round_position]))
+            match_distances = np.take_along_axis(
+                candidate_distances, nearest_match[..., None], axis=2)[..., 0]
+            distances = np.where(has_match, match_distances, 0).sum(axis=1)
+
+            better = (scores > best_scores) | (
+                (scores == best_scores) & (distances < best_distances))
+            best_scores[better] = scores[better]
+            best_distances[better] = distances[better]
+            selected[better] = np.where(has_match, nearest_match, 0)[better]
+
+        return selected
 
     @staticmethod
     def _match_spots(
-        round_dataframes: Dict[int, pd.DataFrame], search_radius: int, anchor_round: int
+        round_spots: Dict[int, np.ndarray],
+        search_radius: int,
+        anchor_round: int,
+        max_candidates: int=1,
+        codebook: Optional[Codebook]=None,
+        spatial_indices: Optional[Mapping[int, cKDTree]]=None,
     ) -> Tuple[pd.DataFrame, pd.DataFrame]:
-        """ For each spot in anchor round, find the closest spot within search_radius in all rounds.
+        """ For each spot in anchor round, find a matching spot within search_radius in all rounds.
 
         Parameters
         ----------
-        round_dataframes : Dict[int, pd.DataFrame]
+        round_spots : Dict[int, np.ndarray]
             Output from _merge_spots_by_round, contains mapping of image volumes from each round to
             all the spots detected in them.
         search_radius : int
@@ -243,53 +359,85 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
             a round subsequent to the anchor round.
         anchor_round : int
             The imaging round to seed the local search from.
+        max_candidates : int
+            Number of spots within search_radius to consider as matches in each round. (default 1)
+        codebook : Optional[Codebook]
+            If provided, candidates are selected with _select_candidates_by_codebook. Otherwise the
+            nearest candidate is selected. (default None)
+        spatial_indices : Optional[Mapping[int, cKDTree]]
+            Output from _build_spatial_indices. Built from round_spots if not provided.
 
         Returns
         -------
         pd.DataFrame
-            Spots x rounds dataframe containing the distances to the nearest spot. np.nan if
+            Spots x rounds dataframe containing the distances to the matching spot. np.nan if
             no spot is detected within search radius
         pd.DataFrame
-            Spots x rounds dataframe containing the indices of the nearest spot to the
-            corresponding round_dataframe. np.nan if no spot is detected within search radius.
+            Spots x rounds dataframe containing the indices of the matching spot in the
+            corresponding array of round_spots. -1 if no spot is detected within search radius.
 
         """
-        reference_df = round_dataframes[anchor_round]
-        reference_coordinates = reference_df[[Axes.ZPLANE, Axes.Y, Axes.X]]
+        if spatial_indices is None:
+            spatial_indices = LocalSearchBlobDetector._build_spatial_indices(round_spots)
+
+        reference_spots = round_spots[anchor_round]
+        reference_coordinates = spatial_indices[anchor_round].data
+        n_spots = reference_spots.shape[0]
+        query_rounds = sorted(set(round_spots.keys()) - {anchor_round, })
+
+        # find up to max_candidates spots within search_radius of each anchor spot in each round,
+        # sorted by increasing distance
+        candidate_shape = (n_spots, len(query_rounds), max_candidates)
+        candidate_distances = np.full(candidate_shape, np.inf)
+        candidate_indices = np.full(candidate_shape, -1, dtype=np.int32)
+        candidate_channels = np.full(candidate_shape, -1)
+        for i, r in enumerate(query_rounds):
+            tree = spatial_indices[r]
+            if tree.n == 0 or n_spots == 0:
+                continue
+            distances, indices = tree.query(
+                reference_coordinates, k=max_candidates, distance_upper_bound=search_radius)
+            distances = distances.reshape(n_spots, max_candidates)
+            indices = indices.reshape(n_spots, max_candidates)
+            found = np.isfinite(distances)
+            candidate_distances[:, i] = distances
+            candidate_indices[:, i] = np.where(found, indices, -1)
+            candidate_channels[:, i] = np.where(
+                found, round_spots[r][Axes.CH.value][np.where(found, indices, 0)], -1)
+
+        if codebook is not None:
+            selected = LocalSearchBlobDetector._select_candidates_by_codebook(
+                codebook, anchor_round, reference_spots[Axes.CH.value], query_rounds,
+                candidate_channels, candidate_distances)
+        else:
+            selected = np.zeros((n_spots, len(query_rounds)), dtype=int)
+        selected_distances = np.take_along_axis(
+            candidate_distances, selected[..., None], axis=2)[..., 0]
+        selected_indices = np.take_along_axis(
+            candidate_indices, selected[..., None], axis=2)[..., 0]
 
         dist = pd.DataFrame(
-            data=np.zeros((reference_df.shape[0], len(round_dataframes)), dtype=float),
-            columns=list(round_dataframes.keys())
+            data=np.zeros((n_spots, len(round_spots)), dtype=float),
+            columns=list(round_spots.keys())
         )
         ind = pd.DataFrame(
-            data=np.zeros((reference_df.shape[0], len(round_dataframes)), dtype=np.int32),
-            columns=list(round_dataframes.keys())
+            data=np.zeros((n_spots, len(round_spots)), dtype=np.int32),
+            columns=list(round_spots.keys())
         )
 
         # fill data for anchor round; every spot is a perfect match to itself.
-        ind[anchor_round] = np.arange(reference_df.shape[0], dtype=np.int32)
-
-        # get spots matching across rounds
-        for r in sorted(set(round_dataframes.keys()) - {anchor_round, }):
-            query_df = round_dataframes[r]
-            query_coordinates = query_df[[Axes.ZPLANE, Axes.Y, Axes.X]]
-
-            # Build the classifier; chose NN over radius neighbors because data structures are
-            # amenable to vectorization, which improves execution time.
-            # TODO ambrosejcarr use n_neighbors > 1 to break ties, enable codebook-based finding
-            #      use additional axes in dist, ind to retain vectorization.
-            nn = NearestNeighbors(n_neighbors=1)
-            nn.fit(query_coordinates)
+        ind[anchor_round] = np.arange(n_spots, dtype=np.int32)
 
-            distances, indices = nn.kneighbors(reference_coordinates)
-            dist[r] = distances
-            ind[r] = indices
+        selected_distances[~np.isfinite(selected_distances)] = np.nan
+        for i, r in enumerate(query_rounds):
+            dist[r] = selected_distances[:, i]
+            ind[r] = selected_indices[:, i]
 
         return dist, ind
 
     @staticmethod
     def _build_intensity_table(
-        round_dataframes: Dict[int, pd.DataFrame],
+        round_spots: Dict[int, np.ndarray],
         dist: pd.DataFrame,
         ind: pd.DataFrame,
         channels: Sequence[int],
@@ -301,7 +449,7 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
 
         Parameters
         ----------
-        round_dataframes : Dict[int, pd.DataFrame]
+        round_spots : Dict[int, np.ndarray]
             Output from _merge_spots_by_round, contains mapping of image volumes from each round to
             all the spots detected in them.
         dist, ind : pd.DataFrame
@@ -317,16 +465,16 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
 
         """
 
-        anchor_df = round_dataframes[anchor_round]
+        anchor_spots = round_spots[anchor_round]
 
         # create empty IntensityTable filled with np.nan
         data = np.full((dist.shape[0], len(channels), len(rounds)), fill_value=np.nan)
         dims = (Features.AXIS, Axes.CH.value, Axes.ROUND.value)
         coords = {
-            Features.SPOT_RADIUS: (Features.AXIS, anchor_df[Features.SPOT_RADIUS]),
-            Axes.ZPLANE.value: (Features.AXIS, anchor_df[Axes.ZPLANE]),
-            Axes.Y.value: (Features.AXIS, anchor_df[Axes.Y]),
-            Axes.X.value: (Features.AXIS, anchor_df[Axes.X]),
+            Features.SPOT_RADIUS: (Features.AXIS, anchor_spots[Features.SPOT_RADIUS]),
+            Axes.ZPLANE.value: (Features.AXIS, anchor_spots[Axes.ZPLANE.value]),
+            Axes.Y.value: (Features.AXIS, anchor_spots[Axes.Y.value]),
+            Axes.X.value: (Features.AXIS, anchor_spots[Axes.X.value]),
             Axes.ROUND.value: (Axes.ROUND.value, rounds),
             Axes.CH.value: (Axes.CH.value, channels)
         }
@@ -335,19 +483,15 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
         # fill IntensityTable
         for r in rounds:
 
-            # get intensity data and indices
-            spot_indices = ind[r]
-            intensity_data = round_dataframes[r].loc[spot_indices, 'intensity']
-            channel_index = round_dataframes[r].loc[spot_indices, Axes.CH]
-            round_index = np.full(ind.shape[0], fill_value=r, dtype=int)
-            feature_index = np.arange(ind.shape[0], dtype=int)
-
             # mask spots that are outside the search radius
-            mask = np.asarray(dist[r] < search_radius)  # indices need not match
-            feature_index = feature_index[mask]
-            channel_index = channel_index[mask]
-            round_index = round_index[mask]
-            intensity_data = intensity_data[mask]
+            mask = np.asarray(dist[r] < search_radius)
+
+            # get intensity data and indices
+            spot_indices = np.asarray(ind[r])[mask]
+            intensity_data = round_spots[r]['intensity'][spot_indices]
+            channel_index = round_spots[r][Axes.CH.value][spot_indices]
+            round_index = np.full(spot_indices.shape[0], fill_value=r, dtype=int)
+            feature_index = np.arange(ind.shape[0], dtype=int)[mask]
 
             # need numpy indexing to set values in vectorized manner
             intensity_table.values[feature_index, channel_index, round_index] = intensity_data
@@ -398,9 +542,13 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
 
         per_round_spot_results = self._merge_spots_by_round(per_tile_spot_results)
 
+        spatial_indices = self._build_spatial_indices(per_round_spot_results)
+
         distances, indices = self._match_spots(
             per_round_spot_results,
-            search_radius=self.search_radius, anchor_round=self.anchor_round
+            search_radius=self.search_radius, anchor_round=self.anchor_round,
+            max_candidates=self.max_candidates, codebook=self.codebook,
+            spatial_indices=spatial_indices,
         )
 
         # TODO implement consensus seeding (SeqFISH)
@@ -430,6 +578,9 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
         "--min-sigma", default=4, type=int, help="Minimum spot size (in standard deviation).")
     @click.option(
         "--max-sigma", default=6, type=int, help="Maximum spot size (in standard deviation).")
+    @click.option(
+        "--num-sigma", default=20, type=int,
+        help="Number of sigmas to try between min-sigma and max-sigma.")
     @click.option(
         "--threshold", default=.01, type=float, help="Dots threshold.")
     @click.option(
@@ -441,12 +592,21 @@ class LocalSearchBlobDetector(DetectSpotsAlgorithmBase):
     @click.option(
         "--search-radius", default=3, type=int,
         help="Number of pixels over which to search for spots in other image tiles.")
+    @click.option(
+        "--max-candidates", default=1, type=int,
+        help="Number of spots within the search radius considered in each round when matching "
+             "spots to codes.")
+    @click.option(
+        "--codebook", default=None, type=CodebookParamType,
+        help="One-hot codebook used to select among the candidates of each round.")
     @click.pass_context
     def _cli(
-        ctx, min_sigma, max_sigma, threshold, overlap, show, detector_method, search_radius
+        ctx, min_sigma, max_sigma, num_sigma, threshold, overlap, detector_method, search_radius,
+        max_candidates, codebook
     ) -> None:
         instance = LocalSearchBlobDetector(
-            min_sigma, max_sigma, threshold, overlap,
-            detector_method=detector_method, search_radius=search_radius
+            min_sigma, max_sigma, num_sigma, threshold,
+            detector_method=detector_method, search_radius=search_radius,
+            max_candidates=max_candidates, codebook=codebook, overlap=overlap
         )
         ctx.obj["component"]._cli_run(ctx, instance)
@@ -1,8 +1,11 @@
 import numpy as np
 from scipy.ndimage.filters import gaussian_filter
 
-from starfish import ImageStack
-from starfish.core.spots._detect_spots.local_search_blob_detector import LocalSearchBlobDetector
+from starfish import Codebook, ImageStack
+from starfish.core.spots._detect_spots.local_search_blob_detector import (
+    _SPOT_DTYPE,
+    LocalSearchBlobDetector,
+)
 from starfish.core.types import Axes
 
 
@@ -152,3 +155,49 @@ def test_local_search_blob_detector_multiple_neighbors():
     assert np.all(intensity_table[Axes.ZPLANE.value] == (5, 5))
     assert np.all(intensity_table[Axes.Y.value] == (40, 20))
     assert np.all(intensity_table[Axes.X.value] == (20, 40))
+
+
+def ambiguous_round_spots():
+    """the anchor spot in round 0 has two candidates in round 1, the nearest in the wrong channel"""
+    spots = {
+        (0, 0): np.array([(1., 5, 20, 20, 1.)], dtype=_SPOT_DTYPE),
+        (1, 0): np.array([(2., 5, 21, 20, 1.)], dtype=_SPOT_DTYPE),
+        (1, 1): np.array([(3., 5, 20, 22, 1.)], dtype=_SPOT_DTYPE),
+    }
+    return LocalSearchBlobDetector._merge_spots_by_round(spots)
+
+
+def test_local_search_blob_detector_merges_spots_by_round():
+    round_spots = ambiguous_round_spots()
+
+    assert sorted(round_spots.keys()) == [0, 1]
+    assert np.all(round_spots[0][Axes.CH.value] == [0])
+    assert np.all(round_spots[1][Axes.CH.value] == [0, 1])
+    assert np.all(round_spots[1]['intensity'] == [2., 3.])
+    assert np.all(round_spots[1][Axes.X.value] == [20, 22])
+
+
+def test_local_search_blob_detector_selects_nearest_candidate():
+    dist, ind = LocalSearchBlobDetector._match_spots(
+        ambiguous_round_spots(), search_radius=3, anchor_round=0, max_candidates=2)
+    assert np.all(dist[1] == [1])
+    assert np.all(ind[1] == [0])
+
+    # candidates outside the search radius are not matched
+    dist, ind = LocalSearchBlobDetector._match_spots(
+        ambiguous_round_spots(), search_radius=1, anchor_round=0, max_candidates=2)
+    assert np.all(dist[1].isnull())
+    assert np.all(ind[1] == [-1])
+
+
+def test_local_search_blob_detector_selects_candidates_matching_codebook():
+    data = np.zeros((1, 2, 2), dtype=np.uint8)
+    data[0, 0, 0] = 1  # round 0, channel 0
+    data[0, 1, 1] = 1  # round 1, channel 1
+    codebook = Codebook.from_numpy(['target'], n_channel=2, n_round=2, data=data)
+
+    dist, ind = LocalSearchBlobDetector._match_spots(
+        ambiguous_round_spots(), search_radius=3, anchor_round=0, max_candidates=2,
+        codebook=codebook)
+    assert np.all(dist[1] == [2])
+    assert np.all(ind[1] == [1])
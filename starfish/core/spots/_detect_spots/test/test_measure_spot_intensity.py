@@ -0,0 +1,96 @@
+"""
+Tests for measuring spot intensities in detect.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from starfish import ImageStack
+from starfish.core.spots._detect_spots import detect
+from starfish.core.types import Axes, Features, SpotAttributes
+
+
+def spot_attributes_factory(n_spots: int, shape) -> SpotAttributes:
+    """create spots with random radii at random locations, including the edges of the volume"""
+    np.random.seed(0)
+    data = pd.DataFrame({
+        axis.value: np.random.randint(0, size, n_spots)
+        for axis, size in zip((Axes.ZPLANE, Axes.Y, Axes.X), shape)
+    })
+    data[Features.SPOT_RADIUS] = np.random.uniform(1, 5, n_spots)
+    return SpotAttributes(data)
+
+
+@pytest.mark.parametrize("measurement_function", [np.max, np.mean, np.sum])
+@pytest.mark.parametrize("radius_is_gyration", [False, True])
+def test_measure_spot_intensities_matches_per_spot_measurement(
+        monkeypatch, measurement_function, radius_is_gyration):
+    """
+    Verify that measuring every spot in every (ch, round) at once produces the same intensities as
+    measuring each spot in turn, including when spots must be measured in several blocks.
+    """
+    monkeypatch.setattr(detect, "_WINDOW_BLOCK_SIZE", 500)
+    data = np.random.rand(2, 3, 4, 20, 30).astype(np.float32)
+    image_stack = ImageStack.from_numpy(data)
+    spots = spot_attributes_factory(100, data.shape[2:])
+
+    intensity_table = detect.measure_spot_intensities(
+        image_stack, spots, measurement_function, radius_is_gyration=radius_is_gyration)
+
+    for r in range(data.shape[0]):
+        for c in range(data.shape[1]):
+            # wrapping the measurement function causes each spot to be measured in turn
+            expected = detect.measure_spot_intensity(
+                data[r, c], spots, lambda array: measurement_function(array),
+                radius_is_gyration=radius_is_gyration)
+            intensities = detect.measure_spot_intensity(
+                data[r, c], spots, measurement_function, radius_is_gyration=radius_is_gyration)
+            assert np.allclose(intensities, expected)
+            assert np.allclose(intensity_table.sel(c=c, r=r).values, expected)
+
+
+def test_concatenate_spot_attributes_to_intensities():
+    """
+    Verify that each spot's intensity is placed in its own feature at the (ch, round) of the spot
+    attributes it came from, and is zero in every other (ch, round).
+    """
+    shape = (4, 20, 30)
+    spot_attributes = []
+    for r, c in [(1, 2), (0, 0), (1, 0)]:
+        spots = spot_attributes_factory(5, shape)
+        spots.data['intensity'] = np.random.rand(5)
+        spots.data['spot_id'] = np.arange(5)
+        spot_attributes.append((spots, {Axes.ROUND: r, Axes.CH: c}))
+
+    intensity_table = detect.concatenate_spot_attributes_to_intensities(spot_attributes)
+
+    assert intensity_table.sizes[Features.AXIS] == 15
+    assert list(intensity_table[Axes.CH.value].values) == [0, 2]
+    assert list(intensity_table[Axes.ROUND.value].values) == [0, 1]
+    i = 0
+    for spots, inds in spot_attributes:
+        for intensity in spots.data['intensity']:
+            feature = intensity_table[i]
+            assert feature.sel(c=inds[Axes.CH], r=inds[Axes.ROUND]).values == intensity
+            assert np.count_nonzero(feature.values) == 1
+            i += 1
+
+
+@pytest.mark.parametrize("measurement_function", [np.max, np.mean])
+def test_measure_spot_intensities_with_uint16_storage(measurement_function):
+    """
+    Verify that measuring every spot at once in an ImageStack that stores its data as uint16
+    produces the same float32-scaled intensities as measuring each spot in turn.
+    """
+    data = np.random.rand(2, 3, 4, 20, 30).astype(np.float32)
+    image_stack = ImageStack.from_numpy(data, storage_dtype=np.uint16)
+    spots = spot_attributes_factory(50, data.shape[2:])
+
+    intensity_table = detect.measure_spot_intensities(image_stack, spots, measurement_function)
+    # wrapping the measurement function causes each spot to be measured in turn
+    expected_table = detect.measure_spot_intensities(
+        image_stack, spots, lambda array: measurement_function(array))
+
+    assert np.allclose(intensity_table.values, expected_table.values)
+    assert intensity_table.values.max() <= 1
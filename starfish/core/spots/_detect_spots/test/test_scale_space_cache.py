@@ -0,0 +1,115 @@
+"""
+Tests for reusing scale-space cubes across BlobDetector runs
+"""
+
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from scipy.ndimage.filters import gaussian_filter
+
+from starfish.core.compat import log_scale_space, SCALE_SPACE_STAGES_SUPPORTED
+from .._scale_space import ScaleSpaceCache
+from ..blob import BlobDetector
+
+pytestmark = pytest.mark.skipif(
+    not SCALE_SPACE_STAGES_SUPPORTED,
+    reason="scale-space stages are not supported with the installed scikit-image")
+
+
+def blobs_image() -> np.ndarray:
+    """create a (z, y, x) volume containing blobs of varying intensity"""
+    image = np.zeros((5, 40, 40), dtype=np.float32)
+    image[2, 10, 10] = 1
+    image[2, 10, 30] = 2
+    image[2, 30, 10] = 3
+    image[2, 30, 30] = 4
+    return gaussian_filter(image, (0.5, 1.5, 1.5))
+
+
+@pytest.mark.parametrize("detector_method, num_sigma", [("blob_log", 5), ("blob_dog", 1.6)])
+def test_cached_scale_space_matches_detector_method(detector_method, num_sigma):
+    """
+    Verify that detecting spots from a cached scale space finds the same spots as the detector
+    method, and that changing the threshold reuses the cached scale space.
+    """
+    image = blobs_image()
+    detector = BlobDetector(
+        min_sigma=1, max_sigma=3, num_sigma=num_sigma, threshold=0,
+        detector_method=detector_method)
+    cached_detector = BlobDetector(
+        min_sigma=1, max_sigma=3, num_sigma=num_sigma, threshold=0,
+        detector_method=detector_method, scale_space_cache_size=2 ** 30)
+
+    for threshold in (0.01, 0.05, 0.1):
+        detector.threshold = threshold
+        cached_detector.threshold = threshold
+        expected = detector.image_to_spots(image)
+        spots = cached_detector.image_to_spots(image)
+        assert spots.data.equals(expected.data)
+        assert len(cached_detector._scale_space_cache) == 1
+
+
+def test_cached_scale_space_with_sigma_per_dimension():
+    """Verify that sigmas given per dimension as lists can be used with the cache."""
+    image = blobs_image()
+    detector = BlobDetector(
+        min_sigma=[1, 1, 1], max_sigma=[2, 3, 3], num_sigma=5, threshold=0.01)
+    cached_detector = BlobDetector(
+        min_sigma=[1, 1, 1], max_sigma=[2, 3, 3], num_sigma=5, threshold=0.01,
+        scale_space_cache_size=2 ** 30)
+
+    spots = cached_detector.image_to_spots(image)
+    assert spots.data.shape[0] > 0
+    assert spots.data.equals(detector.image_to_spots(image).data)
+    assert len(cached_detector._scale_space_cache) == 1
+
+
+def test_scale_space_cache_is_bounded():
+    image = blobs_image()
+    cube_nbytes = log_scale_space(image, 1, 3, 5).cube.nbytes
+    cache = ScaleSpaceCache(max_bytes=2 * cube_nbytes)
+
+    for i in range(3):
+        cache.get(image * (i + 1), "log", lambda array: log_scale_space(array, 1, 3, 5))
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * cube_nbytes
+
+    # cubes larger than the cache are not cached
+    small_cache = ScaleSpaceCache(max_bytes=cube_nbytes - 1)
+    small_cache.get(image, "log", lambda array: log_scale_space(array, 1, 3, 5))
+    assert len(small_cache) == 0
+
+
+def test_scale_space_cache_from_threads():
+    """Verify that the cache stays consistent when images are looked up from several threads."""
+    image = blobs_image()
+    cube_nbytes = log_scale_space(image, 1, 3, 5).cube.nbytes
+    cache = ScaleSpaceCache(max_bytes=2 * cube_nbytes)
+
+    def lookup(i):
+        return cache.get(image * (i % 3 + 1), "log", lambda array: log_scale_space(array, 1, 3, 5))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lookup, range(12)))
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * cube_nbytes
+
+
+def test_scale_space_cache_is_emptied_by_pickling():
+    image = blobs_image()
+    cache = ScaleSpaceCache(max_bytes=2 ** 30)
+    cache.get(image, "log", lambda array: log_scale_space(array, 1, 3, 5))
+
+    unpickled = pickle.loads(pickle.dumps(cache))
+    assert len(unpickled) == 0 and unpickled.nbytes == 0
+    unpickled.get(image, "log", lambda array: log_scale_space(array, 1, 3, 5))
+    assert len(unpickled) == 1
+
+
+def test_scale_space_cache_requires_supported_detector_method():
+    with pytest.raises(ValueError):
+        BlobDetector(
+            min_sigma=1, max_sigma=3, num_sigma=5, threshold=0, detector_method="blob_doh",
+            scale_space_cache_size=2 ** 30)
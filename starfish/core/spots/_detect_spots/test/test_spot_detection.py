@@ -132,6 +132,33 @@ def test_spot_detection_with_reference_image_from_max_projection(
     empty_intensity_table = call_detect_spots(EMPTY_IMAGESTACK)
     assert empty_intensity_table.sizes[Features.AXIS] == 0
 
+def test_spot_detection_with_uint16_reference_image():
+    """
+    Verify that a reference image stored as uint16 is presented to the spot finder as float32, so
+    that float thresholds find the same spots as in the float32 image.
+    """
+    spot_detector = BlobDetector(min_sigma=1, max_sigma=4, num_sigma=5, threshold=0.01)
+    uint16_stack = ImageStack.from_numpy(
+        ONE_HOT_IMAGESTACK.xarray.values, storage_dtype=np.uint16)
+
+    intensity_tables = [
+        detect_spots(
+            data_stack=stack,
+            spot_finding_method=spot_detector.image_to_spots,
+            reference_image=stack,
+            reference_image_max_projection_axes=(Axes.ROUND, Axes.CH),
+            measurement_function=np.max,
+            n_processes=1,
+        )
+        for stack in (ONE_HOT_IMAGESTACK, uint16_stack)
+    ]
+    expected, intensity_table = intensity_tables
+    assert intensity_table.sizes[Features.AXIS] == expected.sizes[Features.AXIS] == 2
+    for coord in (Axes.ZPLANE.value, Axes.Y.value, Axes.X.value, Features.SPOT_RADIUS):
+        assert np.array_equal(intensity_table[coord].values, expected[coord].values)
+    assert np.allclose(intensity_table.values, expected.values, atol=1e-4)
+
+
 @pytest.mark.parametrize(*test_parameters)
 def test_spot_finding_no_reference_image(
         data_stack: ImageStack,
@@ -208,3 +235,43 @@ def test_spot_detection_with_image_with_labeled_axes():
 
     data_stack = _make_labeled_image()
     call_detect_spots(data_stack)
+
+
+def test_local_max_spot_counts_match_peak_finding_at_each_threshold():
+    """
+    Verify that the spot counts LocalMaxPeakFinder derives from a single peak search match the
+    number of peaks found by searching at each threshold in turn.
+    """
+    from skimage.feature import peak_local_max
+
+    np.random.seed(0)
+    img = np.random.rand(1, 50, 50).astype(np.float32)
+    spot_detector = LocalMaxPeakFinder(
+        min_distance=2, stringency=0, min_obj_area=0, max_obj_area=np.inf,
+        min_num_spots_detected=3, verbose=False,
+    )
+    thresholds, spot_counts = spot_detector._compute_num_spots_per_threshold(img)
+
+    assert len(thresholds) == len(spot_counts) > 0
+    for threshold, spot_count in zip(thresholds, spot_counts):
+        peaks = peak_local_max(
+            img, min_distance=2, threshold_abs=threshold, exclude_border=False, indices=True,
+            num_peaks=np.inf, footprint=None, labels=None)
+        assert len(peaks) == spot_count
+    assert spot_count > 3
+
+
+@pytest.mark.parametrize("stringency, expected_threshold", [(0, 4), (2, 6)])
+def test_local_max_selects_threshold_furthest_from_gradient_line(stringency, expected_threshold):
+    """
+    Verify that the threshold whose spot count gradient is furthest from the line joining the
+    gradient's end points is selected, offset by stringency.
+    """
+    thresholds = np.arange(10, dtype=float)
+    spot_counts = [100, 60, 30, 15, 13, 11, 9, 7, 5, 3]
+    spot_detector = LocalMaxPeakFinder(
+        min_distance=2, stringency=stringency, min_obj_area=0, max_obj_area=np.inf,
+        verbose=False,
+    )
+    threshold = spot_detector._select_optimal_threshold(thresholds, spot_counts)
+    assert threshold == expected_threshold
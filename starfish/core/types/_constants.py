@@ -34,7 +34,7 @@ LOG = "log"
 """
 This is name of the provenance log attribute stored on the IntensityTable
 """
-CORE_DEPENDENCIES = {'numpy', 'scikit-image', 'pandas', 'scikit-learn', 'scipy', 'xarray', 'sympy'}
+CORE_DEPENDENCIES = {'numpy', 'scikit-image', 'pandas', 'scikit-learn', 'scipy', 'xarray'}
 """
 The set of dependencies whose versions are are logged for each starfish session
 """
@@ -72,6 +72,9 @@ class Features:
     CODE_VALUE = 'v'
     SPOT_RADIUS = 'radius'
     DISTANCE = 'distance'
+    RUNNER_UP_TARGET = 'runner_up_target'
+    RUNNER_UP_DISTANCE = 'runner_up_distance'
+    DISTANCE_MARGIN = 'distance_margin'
     PASSES_THRESHOLDS = 'passes_thresholds'
     CELL_ID = 'cell_id'
     SPOT_ID = 'spot_id'
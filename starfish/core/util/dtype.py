@@ -2,6 +2,14 @@ from typing import Union
 
 import numpy as np
 import xarray as xr
+from skimage import img_as_float32, img_as_uint
+
+STORAGE_DTYPES = (np.dtype(np.float32), np.dtype(np.float16), np.dtype(np.uint16))
+"""
+The dtypes an ImageStack can store its data in.  Regardless of the storage dtype, ImageStack
+presents its data as float32 in the range [0, 1].
+"""
+
 
 def preserve_float_range(
         array: Union[xr.DataArray, np.ndarray],
@@ -40,3 +48,33 @@ def preserve_float_range(
         else:
             data[data > 1] = 1
     return array.astype(np.float32)
+
+
+def convert_to_storage_dtype(array: np.ndarray, dtype) -> np.ndarray:
+    """
+    Convert image data to one of the :py:data:`STORAGE_DTYPES`, using the same scaling conventions
+    as :py:func:`skimage.img_as_float32`.  If the array is already of the requested dtype, it is
+    returned without a copy.
+
+    Parameters
+    ----------
+    array : np.ndarray
+        Image data of any dtype supported by skimage.
+    dtype :
+        The storage dtype to convert to.
+
+    Returns
+    -------
+    np.ndarray :
+        The image data in the requested dtype.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in STORAGE_DTYPES:
+        raise TypeError(
+            f"ImageStack data cannot be stored as {dtype}.  Supported storage dtypes are "
+            f"{', '.join(str(storage_dtype) for storage_dtype in STORAGE_DTYPES)}.")
+    if array.dtype == dtype:
+        return array
+    if dtype == np.uint16:
+        return img_as_uint(array)
+    return img_as_float32(array).astype(dtype, copy=False)